@@ -1,23 +1,72 @@
 import argparse
 import os
 import sqlite3
-from typing import List, Generator, Tuple, Dict
+import sys
+from contextlib import nullcontext
+from itertools import chain
+from multiprocessing import Pool
+from typing import Any, List, Generator, Optional, Tuple, Dict, Union
 
 from tqdm import tqdm
 
 from src.call_log_extractor import builder as call_log_builder
+from src.call_log_extractor.resolver import (
+    all_call_counts_resolver,
+    all_call_jids_resolver,
+    all_call_watermarks_resolver,
+)
 from src.chat_extractor import builder as chat_builder
+from src.chat_extractor.resolver import (
+    all_chat_message_counts_resolver,
+    all_chats_resolver,
+    all_chat_watermarks_resolver,
+    chat_delta_bounds_resolver,
+    filtered_chats_resolver,
+)
+from src.common import ContactDirectory, contact_resolver, contact_to_str
 from src.contact_extractor import builder as contact_builder
-from src.exports.call_log_to_txt_formatted import call_log_to_txt_formatted
-from src.exports.chat_to_txt_formatted import chat_to_txt_formatted
+from src.exports.call_log_to_txt_formatted import call_log_summaries_to_txt_formatted, call_log_to_txt_formatted
+from src.exports.chat_to_txt_formatted import append_chat_to_txt_formatted, chat_to_txt_formatted
 from src.exports.contacts_to_txt_formatted import contacts_to_txt_formatted
-from src.exports.to_json import call_log_to_json, chat_to_json
-from src.exports.to_txt_raw import call_log_to_txt_raw, chat_to_txt_raw
-from src.models import Chat, CallLog, Contact
+from src.exports.timestamps import TimestampFormatter
+from src.exports.to_json import call_log_summaries_to_json, call_log_to_json, chat_to_json
+from src.exports.to_ndjson import (
+    append_chat_to_ndjson,
+    call_log_summaries_to_ndjson,
+    call_log_to_ndjson,
+    chat_to_ndjson,
+)
+from src.exports.archive import ArchiveWriter
+from src.exports.output import (
+    COMPRESSION_EXTENSIONS,
+    CompressedFileOpener,
+    OutputOpener,
+    UnchangedFileSkipper,
+    hash_outputs,
+    open_file,
+    use_output_opener,
+)
+from src.exports.to_sqlite import SqliteExport
+from src.exports.to_txt_raw import call_log_summaries_to_txt_raw, call_log_to_txt_raw, chat_to_txt_raw
+from src.contacts_cache import cached_contacts
+from src.export_manifest import ExportManifest
+from src.msgdb_cache import database_fingerprint, file_fingerprint, indexed_copy, without_stat
+from src.models import Chat, CallLog, Contact, GroupName
+from src.phone_number_index import PhoneNumberIndex
+from src.pipeline import ExportPipeline
 
 CALL_LOGS_DIR = "/call_logs"
+CALL_LOG_SUMMARY_FILE = "/call_log_summary"
 CHAT_DIR = "/chats"
 CONTACTS_FIlE = "/contacts.txt"
+MSGDB_CACHE_DIR = "/.msgdb_cache"
+CONTACTS_CACHE_DIR = "/.contacts_cache"
+SQLITE_FILE = "/whatsapp.db"
+ARCHIVE_FILE = "/whatsapp"
+EXPORT_MANIFEST_FILE = "/.export_manifest.json"
+
+# State of an export worker process, set once by `init_export_worker`.
+export_worker: Dict[str, Any] = {}
 
 
 def create_db_connection(file_path: str) -> Tuple[sqlite3.Connection, sqlite3.Cursor]:
@@ -50,101 +99,724 @@ def close_db_connections(databases: List[sqlite3.Connection]) -> None:
 
 def load_call_logs(
         msgdb_cursor: sqlite3.Cursor,
-        output_call_logs_directory: str,
+        output_call_logs_directory: Optional[str],
         phone_numbers: List[str],
-        contacts: Dict[str, List[Contact]]
+        contacts: Dict[str, List[Contact]],
+        phone_number_index: Optional[PhoneNumberIndex] = None,
+        jid_row_ids: Optional[List[int]] = None
 ) -> [Generator[CallLog, None, None]]:
-    if not os.path.exists(output_call_logs_directory):
+    if output_call_logs_directory and not os.path.exists(output_call_logs_directory):
         os.makedirs(output_call_logs_directory)
+    if jid_row_ids is not None:
+        return call_log_builder.build_call_logs_for_jid_row_ids(msgdb_cursor, contacts, jid_row_ids)
     if not phone_numbers:
         return call_log_builder.build_all_call_logs(msgdb_cursor, contacts)
     else:
-        return [
-            call_log_builder.build_call_log_for_given_id_or_phone_number(
-                msgdb_cursor, contacts, phone_number=phone_number
-            ) for phone_number in phone_numbers
-        ]
+        return call_log_builder.build_call_logs_for_phone_numbers(
+            msgdb_cursor, contacts, phone_numbers, phone_number_index or PhoneNumberIndex.build(msgdb_cursor)
+        )
 
 
 def load_chats(
         msgdb_cursor: sqlite3.Cursor,
-        output_chat_directory: str,
+        output_chat_directory: Optional[str],
         phone_numbers: List[str],
-        contacts: Dict[str, List[Contact]]
+        contacts: Dict[str, List[Contact]],
+        columnar: bool = False,
+        phone_number_index: Optional[PhoneNumberIndex] = None,
+        chat_row_ids: Optional[List[int]] = None
 ) -> [Generator[Chat, None, None]]:
-    if not os.path.exists(output_chat_directory):
+    if output_chat_directory and not os.path.exists(output_chat_directory):
         os.makedirs(output_chat_directory)
+    if chat_row_ids is not None:
+        return chat_builder.build_chats_for_chat_ids(msgdb_cursor, contacts, chat_row_ids, stream=True, columnar=columnar)
+    if not phone_numbers:
+        return chat_builder.build_all_chats(msgdb_cursor, contacts, stream=True, columnar=columnar)
+    else:
+        return chat_builder.build_chats_for_phone_numbers(
+            msgdb_cursor, contacts, phone_numbers, phone_number_index or PhoneNumberIndex.build(msgdb_cursor),
+            stream=True, columnar=columnar
+        )
+
+
+def stale_call_log_ids(
+        msgdb_cursor: sqlite3.Cursor,
+        phone_numbers: List[str],
+        manifest: ExportManifest,
+        phone_number_index: Optional[PhoneNumberIndex] = None
+) -> List[int]:
+    """Select the call logs that changed since they were last exported, with a single aggregate over the calls.
+
+    Args:
+        msgdb_cursor (sqlite3.Cursor): The cursor for the 'msgdb' database.
+        phone_numbers (List[str]): Phone numbers to export, empty means all.
+        manifest (ExportManifest): Manifest of the output directory.
+        phone_number_index (Optional[PhoneNumberIndex]): Index used to look up the phone numbers. Defaults to None.
+
+    Returns:
+        List[int]: jid_row_ids of the call logs to export, in export order.
+    """
+    watermarks = {
+        jid_row_id: (max_call_id, call_count)
+        for jid_row_id, max_call_id, call_count in all_call_watermarks_resolver(msgdb_cursor)
+    }
     if not phone_numbers:
-        return chat_builder.build_all_chats(msgdb_cursor, contacts)
+        jid_row_ids = list(watermarks)
     else:
-        return [
-            chat_builder.build_chat_for_given_id_or_phone_number(
-                msgdb_cursor, contacts, phone_number=phone_number
-            ) for phone_number in phone_numbers
-        ]
+        jid_row_ids = [ids[0] for ids in map(phone_number_index.jid_row_ids, phone_numbers) if ids]
+    return manifest.stale("call_logs", jid_row_ids, watermarks)
 
 
-def export_call_log(call_log: CallLog, folder: str, output_style: str) -> None:
+def stale_chat_ids(
+        msgdb_cursor: sqlite3.Cursor,
+        phone_numbers: List[str],
+        manifest: ExportManifest,
+        phone_number_index: Optional[PhoneNumberIndex] = None
+) -> List[int]:
+    """Select the chats that changed since they were last exported, with a single aggregate over the messages.
+
+    Args:
+        msgdb_cursor (sqlite3.Cursor): The cursor for the 'msgdb' database.
+        phone_numbers (List[str]): Phone numbers to export, empty means all.
+        manifest (ExportManifest): Manifest of the output directory.
+        phone_number_index (Optional[PhoneNumberIndex]): Index used to look up the phone numbers. Defaults to None.
+
+    Returns:
+        List[int]: IDs of the chats to export, in export order.
+    """
+    watermarks = {
+        chat_id: (max_message_id, message_count)
+        for chat_id, max_message_id, message_count in all_chat_watermarks_resolver(msgdb_cursor)
+    }
+    if not phone_numbers:
+        chat_ids = list(watermarks)
+    else:
+        phone_number_index.load_filter(msgdb_cursor, phone_numbers)
+        chat_ids = [chat_id for chat_id, _ in filtered_chats_resolver(msgdb_cursor)]
+    return manifest.stale("chats", chat_ids, watermarks)
+
+
+def append_chat_deltas(
+        msgdb_cursor: sqlite3.Cursor,
+        contacts: Dict[str, List[Contact]],
+        chat_row_ids: List[int],
+        manifest: ExportManifest,
+        output_style: str,
+        timestamps: Optional[TimestampFormatter] = None
+) -> List[int]:
+    """Append the new messages of the chats that only gained messages since their last export to their files.
+
+    A chat qualifies if its earlier messages are unchanged and all new messages, those after the last exported
+    message._id, are displayed after them. Replies to earlier messages are resolved by their key_id. The other
+    chats are left to be exported as a whole.
+
+    Args:
+        msgdb_cursor (sqlite3.Cursor): The cursor for the 'msgdb' database.
+        contacts (Dict[str, List[Contact]]): Dict of all contacts and jid as key.
+        chat_row_ids (List[int]): IDs of the stale chats, as selected by `stale_chat_ids`.
+        manifest (ExportManifest): Manifest of the output directory, in which the appended chats are recorded.
+        output_style (str): Either 'formatted_txt' or 'ndjson'.
+        timestamps (Optional[TimestampFormatter]): Formatter of the timestamps. Defaults to None, UTC.
+
+    Returns:
+        List[int]: IDs of the chats that have to be exported as a whole, in the given order.
+    """
+    remaining_chat_row_ids = []
+    for chat_row_id in chat_row_ids:
+        earlier_export = manifest.appendable("chats", chat_row_id)
+        if earlier_export is not None:
+            max_message_id, message_count, file_path = earlier_export
+            max_message_id = max_message_id or 0
+            earlier_count, max_earlier_sort_id, min_new_sort_id = chat_delta_bounds_resolver(
+                msgdb_cursor, chat_row_id, max_message_id
+            )
+            # ties of the sort_id are ordered by message._id, so the new messages come last
+            if earlier_count == message_count and (
+                    max_earlier_sort_id is None or (min_new_sort_id is not None and min_new_sort_id >= max_earlier_sort_id)
+            ):
+                chat, replied_messages = chat_builder.build_chat_delta(
+                    msgdb_cursor, contacts, chat_row_id, max_message_id
+                )
+                if output_style == "formatted_txt":
+                    appended = append_chat_to_txt_formatted(
+                        chat, file_path, replied_messages, message_count > 0, contacts, timestamps
+                    )
+                else:
+                    appended = append_chat_to_ndjson(chat, file_path)
+                if appended:
+                    manifest.record("chats", chat_row_id, {file_path: file_fingerprint(file_path)["sha256"]})
+                    continue
+        remaining_chat_row_ids.append(chat_row_id)
+    return remaining_chat_row_ids
+
+
+def export_call_log(
+        call_log: CallLog,
+        folder: str,
+        output_style: str,
+        contacts: Optional[ContactDirectory] = None,
+        timestamps: Optional[TimestampFormatter] = None
+) -> None:
     if call_log.calls:
         if output_style == "raw_txt":
             call_log_to_txt_raw(call_log=call_log, folder=folder)
         elif output_style == "formatted_txt":
-            call_log_to_txt_formatted(call_log=call_log, folder=folder)
+            call_log_to_txt_formatted(call_log=call_log, folder=folder, contacts=contacts, timestamps=timestamps)
         elif output_style == "json":
             call_log_to_json(call_log=call_log, folder=folder)
+        elif output_style == "compact_json":
+            call_log_to_json(call_log=call_log, folder=folder, compact=True)
+        elif output_style == "ndjson":
+            call_log_to_ndjson(call_log=call_log, folder=folder)
         else:
             raise AssertionError("Invalid 'call_log formatting' requested")
 
 
-def export_chat(chat: Chat, folder: str, output_style: str) -> None:
+def export_call_log_summary(
+        msgdb_cursor: sqlite3.Cursor,
+        contacts: Dict[str, List[Contact]],
+        phone_numbers: List[str],
+        output_style: str,
+        file_name: str,
+        phone_number_index: Optional[PhoneNumberIndex] = None
+) -> None:
+    call_log_summaries = call_log_builder.build_call_log_summaries(msgdb_cursor, contacts, phone_numbers, phone_number_index)
+    if output_style == "raw_txt":
+        call_log_summaries_to_txt_raw(call_log_summaries=call_log_summaries, file_name=file_name + "-raw.txt")
+    elif output_style == "formatted_txt":
+        call_log_summaries_to_txt_formatted(call_log_summaries=call_log_summaries, file_name=file_name + ".txt")
+    elif output_style == "json":
+        call_log_summaries_to_json(call_log_summaries=call_log_summaries, file_name=file_name + ".json")
+    elif output_style == "compact_json":
+        call_log_summaries_to_json(call_log_summaries=call_log_summaries, file_name=file_name + ".json", compact=True)
+    elif output_style == "ndjson":
+        call_log_summaries_to_ndjson(call_log_summaries=call_log_summaries, file_name=file_name + ".ndjson")
+    else:
+        raise AssertionError("Invalid 'call_log_summary formatting' requested")
+
+
+def export_chat(
+        chat: Chat,
+        folder: str,
+        output_style: str,
+        contacts: Optional[ContactDirectory] = None,
+        timestamps: Optional[TimestampFormatter] = None
+) -> None:
     if output_style == "raw_txt":
         chat_to_txt_raw(chat=chat, folder=folder)
     elif output_style == "formatted_txt":
-        chat_to_txt_formatted(chat=chat, folder=folder)
+        chat_to_txt_formatted(chat=chat, folder=folder, contacts=contacts, timestamps=timestamps)
     elif output_style == "json":
         chat_to_json(chat=chat, folder=folder)
+    elif output_style == "compact_json":
+        chat_to_json(chat=chat, folder=folder, compact=True)
+    elif output_style == "ndjson":
+        chat_to_ndjson(chat=chat, folder=folder)
     else:
         raise AssertionError("Invalid 'chat formatting' requested")
 
 
-def main(
+def init_export_worker(
         msgdb_path: str,
-        wadb_path: str,
-        output_dir: str,
+        contacts: Dict[str, List[Contact]],
+        output_style: str,
+        columnar: bool = False,
+        output_opener: OutputOpener = open_file,
+        timestamps: Optional[TimestampFormatter] = None,
+        hashed: bool = False
+) -> None:
+    """Open the worker's own read-only msgdb connection and keep the contacts for all of its tasks.
+
+    Args:
+        msgdb_path (str): Path to 'msgstore.db' file.
+        contacts (Dict[str, List[Contact]]): Dict of all contacts and jid as key.
+        output_style (str): Style in which the chats and call logs are exported.
+        columnar (bool): Hold the messages of every chat in a MessageBatch. Defaults to False.
+        output_opener (OutputOpener): Opener of the exported files. Defaults to open_file.
+        timestamps (Optional[TimestampFormatter]): Formatter of the timestamps. Defaults to None, UTC.
+        hashed (bool): Hash the files of every task for the export manifest. Defaults to False.
+    """
+    export_worker["msgdb"], export_worker["msgdb_cursor"] = create_db_connection(msgdb_path)
+    export_worker["contacts"] = contacts
+    export_worker["output_style"] = output_style
+    export_worker["columnar"] = columnar
+    export_worker["output_opener"] = output_opener
+    export_worker["timestamps"] = timestamps
+    export_worker["hashed"] = hashed
+
+
+def export_chat_task(task: Tuple[List[int], str]) -> List[Tuple[int, Optional[Dict[str, str]]]]:
+    chat_row_ids, folder = task
+    results = []
+    # the chats of a task share a file, so they are written one after the other, in the order of a serial export
+    for chat_row_id in chat_row_ids:
+        chat = chat_builder.build_chat_for_given_id_or_phone_number(
+            export_worker["msgdb_cursor"], export_worker["contacts"], chat_row_id=chat_row_id, stream=True,
+            columnar=export_worker["columnar"]
+        )
+        with use_output_opener(export_worker["output_opener"]), \
+                hash_outputs() if export_worker["hashed"] else nullcontext() as hashes:
+            export_chat(
+                chat=chat, folder=folder, output_style=export_worker["output_style"],
+                contacts=export_worker["contacts"], timestamps=export_worker["timestamps"]
+            )
+        results.append((chat_row_id, hashes))
+    return results
+
+
+def export_call_log_task(task: Tuple[List[int], str]) -> List[Tuple[int, Optional[Dict[str, str]]]]:
+    jid_row_ids, folder = task
+    results = []
+    # the call logs of a task share a file, so they are written one after the other, in the order of a serial export
+    for jid_row_id in jid_row_ids:
+        call_log = call_log_builder.build_call_log_for_given_id_or_phone_number(
+            export_worker["msgdb_cursor"], export_worker["contacts"], jid_row_id=jid_row_id
+        )
+        with use_output_opener(export_worker["output_opener"]), \
+                hash_outputs() if export_worker["hashed"] else nullcontext() as hashes:
+            export_call_log(
+                call_log=call_log, folder=folder, output_style=export_worker["output_style"],
+                contacts=export_worker["contacts"], timestamps=export_worker["timestamps"]
+            )
+        results.append((jid_row_id, hashes))
+    return results
+
+
+def title_file_key(title: Union[Contact, GroupName, None]) -> str:
+    """Get the part of the file name of a chat or call log its title decides, the same for titles sharing a file.
+
+    Args:
+        title (Union[Contact, GroupName, None]): Title of the chat or caller of the call log.
+
+    Returns:
+        str: Title as it is written into the file name, case-folded for case-insensitive file systems.
+    """
+    if isinstance(title, Contact):
+        title_details = contact_to_str(title)
+    elif isinstance(title, GroupName):
+        title_details = f"{title.name}"
+    else:
+        title_details = ""
+    return title_details.replace("/", "_").casefold()
+
+
+def group_by_file(row_ids: List[int], file_keys: Dict[int, str], sizes: Dict[int, int]) -> List[List[int]]:
+    """Group the chats or call logs that are written to the same file, to export every group with a single task.
+
+    Args:
+        row_ids (List[int]): IDs of the chats or jids of the call logs, in the order of a serial export.
+        file_keys (Dict[int, str]): Key of the file of every chat or call log, see `title_file_key`.
+        sizes (Dict[int, int]): Number of messages or calls by ID. IDs without a size count as 0.
+
+    Returns:
+        List[List[int]]: The groups, each in the given order, the largest first and otherwise in the given order.
+    """
+    groups: Dict[str, List[int]] = {}
+    for row_id in row_ids:
+        groups.setdefault(file_keys.get(row_id, ""), []).append(row_id)
+    return sorted(groups.values(), key=lambda group: -sum(sizes.get(row_id, 0) for row_id in group))
+
+
+def export_in_parallel(
+        msgdb_path: str,
+        msgdb_cursor: sqlite3.Cursor,
+        contacts: Dict[str, List[Contact]],
         conversation_types: List[str],
         phone_numbers: List[str],
-        output_style: str
+        output_style: str,
+        output_call_logs_directory: str,
+        output_chat_directory: str,
+        workers: int,
+        columnar: bool = False,
+        phone_number_index: Optional[PhoneNumberIndex] = None,
+        output_opener: OutputOpener = open_file,
+        timestamps: Optional[TimestampFormatter] = None,
+        manifest: Optional[ExportManifest] = None,
+        jid_row_ids: Optional[List[int]] = None,
+        chat_row_ids: Optional[List[int]] = None
 ) -> None:
-    if output_style not in ("raw_txt", "formatted_txt", "json"):
-        raise AssertionError(f"Invalid formatting '{args.output_style}' requested")
+    """Export call logs and chats with a pool of worker processes.
 
-    wadb, wadb_cursor = create_db_connection(wadb_path)
-    try:
-        contacts = contact_builder.build_all_contacts(wadb_cursor)
-    finally:
-        close_db_connections([wadb])
-
-    msgdb, msgdb_cursor = create_db_connection(msgdb_path)
-    try:
-        output_call_logs_directory = output_dir + CALL_LOGS_DIR
-        output_chat_directory = output_dir + CHAT_DIR
-        output_contacts_file = output_dir + CONTACTS_FIlE
+    Every worker opens its own read-only connection and receives the contacts once. Chats and call logs are
+    scheduled largest first, so a single huge chat doesn't leave the other workers idle at the end. Filtered phone
+    numbers are resolved to chats and jids up front, in the order of the filter. Given `jid_row_ids` and
+    `chat_row_ids`, e.g. the stale ones of the manifest, are exported in their order instead. Chats or call logs
+    whose titles give the same file name are exported by a single task in the order of a serial export, so the
+    file ends up the same as with a serial export.
 
+    Args:
+        msgdb_path (str): Path to 'msgstore.db' file.
+        msgdb_cursor (sqlite3.Cursor): The cursor for the 'msgdb' database, used for scheduling.
+        contacts (Dict[str, List[Contact]]): Dict of all contacts and jid as key.
+        conversation_types (List[str]): Conversation types to export.
+        phone_numbers (List[str]): Phone numbers to export, empty means all.
+        output_style (str): Style in which the chats and call logs are exported.
+        output_call_logs_directory (str): Directory to write the call logs.
+        output_chat_directory (str): Directory to write the chats.
+        workers (int): Number of worker processes.
+        columnar (bool): Hold the messages of every chat in a MessageBatch. Defaults to False.
+        phone_number_index (Optional[PhoneNumberIndex]): Index used to look up the phone numbers. Defaults to None.
+        output_opener (OutputOpener): Opener of the exported files, passed to the workers. Defaults to open_file.
+        timestamps (Optional[TimestampFormatter]): Formatter of the timestamps. Defaults to None, UTC.
+        manifest (Optional[ExportManifest]): Manifest in which the exported files are recorded. Defaults to None.
+        jid_row_ids (Optional[List[int]]): jid_row_ids of the call logs to export. Defaults to None, all or the
+            filtered ones.
+        chat_row_ids (Optional[List[int]]): IDs of the chats to export. Defaults to None, all or the filtered ones.
+    """
+    with Pool(
+            processes=workers,
+            initializer=init_export_worker,
+            initargs=(msgdb_path, contacts, output_style, columnar, output_opener, timestamps, manifest is not None)
+    ) as pool:
         if "call_logs" in conversation_types:
-            call_logs = load_call_logs(msgdb_cursor, output_call_logs_directory, phone_numbers, contacts)
-            for call_log in tqdm(call_logs):
-                export_call_log(call_log=call_log, folder=output_call_logs_directory, output_style=output_style)
+            if not os.path.exists(output_call_logs_directory):
+                os.makedirs(output_call_logs_directory)
+            call_counts = {}
+            if jid_row_ids is None and not phone_numbers:
+                call_counts = dict(all_call_counts_resolver(msgdb_cursor))
+                # a serial export writes the call logs by jid_row_id
+                jid_row_ids = sorted(call_counts)
+            elif jid_row_ids is None:
+                jid_row_ids = [
+                    filtered_jid_row_ids[0]
+                    for filtered_jid_row_ids in map(phone_number_index.jid_row_ids, phone_numbers) if filtered_jid_row_ids
+                ]
+            file_keys = {
+                jid_row_id: title_file_key(contact_resolver(contacts=contacts, raw_string_jid=raw_string_jid))
+                for jid_row_id, raw_string_jid in all_call_jids_resolver(msgdb_cursor)
+            }
+            tasks = [
+                (group, output_call_logs_directory) for group in group_by_file(jid_row_ids, file_keys, call_counts)
+            ]
+            results = chain.from_iterable(pool.imap_unordered(export_call_log_task, tasks))
+            for jid_row_id, hashes in tqdm(results, total=len(jid_row_ids)):
+                if manifest:
+                    manifest.record("call_logs", jid_row_id, hashes)
 
         if "chats" in conversation_types:
-            chats = load_chats(msgdb_cursor, output_chat_directory, phone_numbers, contacts)
-            for chat in tqdm(chats):
-                export_chat(chat=chat, folder=output_chat_directory, output_style=output_style)
+            if not os.path.exists(output_chat_directory):
+                os.makedirs(output_chat_directory)
+            message_counts = {}
+            if chat_row_ids is None and not phone_numbers:
+                message_counts = dict(all_chat_message_counts_resolver(msgdb_cursor))
+                # a serial export writes the chats by chat_id
+                chat_row_ids = sorted(message_counts)
+            elif chat_row_ids is None:
+                phone_number_index.load_filter(msgdb_cursor, phone_numbers)
+                chat_row_ids = [chat_row_id for chat_row_id, _ in filtered_chats_resolver(msgdb_cursor)]
+            file_keys = {
+                chat_row_id: title_file_key(chat_builder.resolve_chat_title(contacts, raw_string_jid))
+                for chat_row_id, raw_string_jid in all_chats_resolver(msgdb_cursor)
+            }
+            tasks = [(group, output_chat_directory) for group in group_by_file(chat_row_ids, file_keys, message_counts)]
+            results = chain.from_iterable(pool.imap_unordered(export_chat_task, tasks))
+            for chat_row_id, hashes in tqdm(results, total=len(chat_row_ids)):
+                if manifest:
+                    manifest.record("chats", chat_row_id, hashes)
+
+
+def export_pipelined(
+        msgdb_path: str,
+        contacts: Dict[str, List[Contact]],
+        conversation_types: List[str],
+        phone_numbers: List[str],
+        output_style: str,
+        output_call_logs_directory: str,
+        output_chat_directory: str,
+        writer_threads: int,
+        columnar: bool = False,
+        phone_number_index: Optional[PhoneNumberIndex] = None,
+        timestamps: Optional[TimestampFormatter] = None,
+        manifest: Optional[ExportManifest] = None,
+        jid_row_ids: Optional[List[int]] = None,
+        chat_row_ids: Optional[List[int]] = None
+) -> None:
+    """Export call logs and chats with an `ExportPipeline` and print the time every stage spent waiting.
+
+    Args:
+        msgdb_path (str): Path to 'msgstore.db' file.
+        contacts (Dict[str, List[Contact]]): Dict of all contacts and jid as key.
+        conversation_types (List[str]): Conversation types to export.
+        phone_numbers (List[str]): Phone numbers to export, empty means all.
+        output_style (str): Style in which the chats and call logs are exported.
+        output_call_logs_directory (str): Directory to write the call logs.
+        output_chat_directory (str): Directory to write the chats.
+        writer_threads (int): Number of threads writing the exported files.
+        columnar (bool): Hold the messages of every chat in a MessageBatch. Defaults to False.
+        phone_number_index (Optional[PhoneNumberIndex]): Index used to look up the phone numbers. Defaults to None.
+        timestamps (Optional[TimestampFormatter]): Formatter of the timestamps. Defaults to None, UTC.
+        manifest (Optional[ExportManifest]): Manifest in which the exported files are recorded. Defaults to None.
+        jid_row_ids (Optional[List[int]]): jid_row_ids of the call logs to export. Defaults to None, all or the
+            filtered ones.
+        chat_row_ids (Optional[List[int]]): IDs of the chats to export. Defaults to None, all or the filtered ones.
+    """
+
+    def export_and_record(call_log: Optional[CallLog] = None, chat: Optional[Chat] = None) -> None:
+        # the files are hashed while they are rendered, the render stage runs on this thread only
+        with hash_outputs() if manifest else nullcontext() as hashes:
+            if call_log is not None:
+                export_call_log(
+                    call_log=call_log, folder=output_call_logs_directory, output_style=output_style, contacts=contacts,
+                    timestamps=timestamps
+                )
+            else:
+                export_chat(
+                    chat=chat, folder=output_chat_directory, output_style=output_style, contacts=contacts,
+                    timestamps=timestamps
+                )
+        if manifest:
+            if call_log is not None:
+                manifest.record("call_logs", call_log.jid_row_id, hashes)
+            else:
+                manifest.record("chats", chat.chat_id, hashes)
+
+    pipeline = ExportPipeline(msgdb_path, writer_threads=writer_threads)
+    if "call_logs" in conversation_types:
+        with tqdm() as progress_bar:
+            pipeline.run(
+                lambda cursor: load_call_logs(
+                    cursor, output_call_logs_directory, phone_numbers, contacts, phone_number_index, jid_row_ids
+                ),
+                lambda call_log: export_and_record(call_log=call_log),
+                progress_bar.update
+            )
+
+    if "chats" in conversation_types:
+        with tqdm() as progress_bar:
+            pipeline.run(
+                lambda cursor: load_chats(
+                    cursor, output_chat_directory, phone_numbers, contacts, columnar, phone_number_index, chat_row_ids
+                ),
+                lambda chat: export_and_record(chat=chat),
+                progress_bar.update
+            )
+    # next to the progress bars, so the report never ends up in redirected output
+    print(pipeline.report(), file=sys.stderr)
+
+
+def export_to_sqlite(
+        msgdb_cursor: sqlite3.Cursor,
+        contacts: Dict[str, List[Contact]],
+        conversation_types: List[str],
+        phone_numbers: List[str],
+        file_name: str,
+        columnar: bool = False,
+        phone_number_index: Optional[PhoneNumberIndex] = None
+) -> None:
+    """Export all conversation types into a single normalised SQLite database.
 
+    Args:
+        msgdb_cursor (sqlite3.Cursor): The cursor for the 'msgdb' database.
+        contacts (Dict[str, List[Contact]]): Dict of all contacts and jid as key.
+        conversation_types (List[str]): Conversation types to export.
+        phone_numbers (List[str]): Phone numbers to export, empty means all.
+        file_name (str): Path of the output database.
+        columnar (bool): Hold the messages of every chat in a MessageBatch. Defaults to False.
+        phone_number_index (Optional[PhoneNumberIndex]): Index used to look up the phone numbers. Defaults to None.
+    """
+    output_dir = os.path.dirname(file_name)
+    if output_dir and not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    export = SqliteExport(file_name)
+    try:
         if "contacts" in conversation_types:
-            contacts_to_txt_formatted(contacts=contacts, file_name=output_contacts_file)
+            export.add_contacts(contacts)
+        if "call_logs" in conversation_types:
+            for call_log in tqdm(load_call_logs(msgdb_cursor, None, phone_numbers, contacts, phone_number_index)):
+                export.add_call_log(call_log)
+        if "chats" in conversation_types:
+            for chat in tqdm(load_chats(msgdb_cursor, None, phone_numbers, contacts, columnar, phone_number_index)):
+                export.add_chat(chat)
+        if "call_log_summary" in conversation_types:
+            export.add_call_log_summaries(
+                call_log_builder.build_call_log_summaries(msgdb_cursor, contacts, phone_numbers, phone_number_index)
+            )
+    except BaseException:
+        export.abort()
+        raise
+    export.close()
+
+
+def main(
+        msgdb_path: str,
+        wadb_path: str,
+        output_dir: str,
+        conversation_types: List[str],
+        phone_numbers: List[str],
+        output_style: str,
+        indexed_msgdb: bool = False,
+        workers: int = 1,
+        pipeline: bool = False,
+        writer_threads: int = 4,
+        columnar: bool = False,
+        contacts_cache: bool = False,
+        compression: Optional[str] = None,
+        compression_level: Optional[int] = None,
+        archive: Optional[str] = None,
+        local_time: bool = False,
+        incremental: bool = False,
+        delta: bool = False,
+        skip_unchanged: bool = False
+) -> None:
+    if output_style not in ("raw_txt", "formatted_txt", "json", "compact_json", "ndjson", "sqlite"):
+        raise AssertionError(f"Invalid formatting '{args.output_style}' requested")
+    if archive and (workers > 1 or output_style == "sqlite"):
+        raise AssertionError("An archive can't be written by several workers or with the 'sqlite' output style")
+    # appending to the files of the last export and their stored hashes need its manifest
+    incremental = incremental or delta or skip_unchanged
+    if incremental and (archive or output_style == "sqlite"):
+        raise AssertionError("An incremental export can't write an archive or use the 'sqlite' output style")
+
+    if contacts_cache:
+        contacts = cached_contacts(wadb_path, output_dir + CONTACTS_CACHE_DIR)
+    else:
+        wadb, wadb_cursor = create_db_connection(wadb_path)
+        try:
+            contacts = contact_builder.build_all_contacts(wadb_cursor)
+        finally:
+            close_db_connections([wadb])
+
+    # shared by all exports, so every day of the timestamps is formatted once
+    timestamps = TimestampFormatter(local_timezone=local_time)
+
+    # every exporter opens its files through this opener
+    if archive:
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        if archive == "tar":
+            archive_extension = ".tar" + (COMPRESSION_EXTENSIONS[compression] if compression else "")
+        else:
+            archive_extension = ".zip"
+        output_opener = ArchiveWriter(
+            output_dir + ARCHIVE_FILE + archive_extension, archive, output_dir, compression, compression_level
+        )
+    elif compression:
+        output_opener = CompressedFileOpener(compression, compression_level)
+    else:
+        output_opener = open_file
+
+    # chats and call logs that are unchanged since the last run are skipped
+    manifest = None
+    if incremental:
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        extension = COMPRESSION_EXTENSIONS[compression] if compression else ""
+        manifest = ExportManifest.load(
+            output_dir + EXPORT_MANIFEST_FILE,
+            settings={
+                "output_style": output_style,
+                "compression": compression,
+                "compression_level": compression_level,
+                "local_time": local_time,
+                "wadb": without_stat(database_fingerprint(wadb_path)),
+            },
+            extension=extension,
+        )
+        if skip_unchanged:
+            # files that are rewritten with the same text keep their mtime
+            output_opener = UnchangedFileSkipper(output_opener, output_dir, manifest.stored_files(), extension)
+
+    if indexed_msgdb:
+        msgdb_path = indexed_copy(msgdb_path, output_dir + MSGDB_CACHE_DIR)
+
+    msgdb, msgdb_cursor = create_db_connection(msgdb_path)
+    try:
+        with use_output_opener(output_opener):
+            output_call_logs_directory = output_dir + CALL_LOGS_DIR
+            output_chat_directory = output_dir + CHAT_DIR
+            output_contacts_file = output_dir + CONTACTS_FIlE
+            output_call_log_summary_file = output_dir + CALL_LOG_SUMMARY_FILE
+            # built once, so every phone number of the filter is a few dictionary lookups
+            phone_number_index = PhoneNumberIndex.build(msgdb_cursor) if phone_numbers else None
+
+            if output_style == "sqlite":
+                # a single database is written by a single connection, so there are no workers or pipeline
+                export_to_sqlite(
+                    msgdb_cursor, contacts, conversation_types, phone_numbers, output_dir + SQLITE_FILE, columnar,
+                    phone_number_index
+                )
+                return
+
+            jid_row_ids = chat_row_ids = None
+            if manifest:
+                if "call_logs" in conversation_types:
+                    jid_row_ids = stale_call_log_ids(msgdb_cursor, phone_numbers, manifest, phone_number_index)
+                if "chats" in conversation_types:
+                    chat_row_ids = stale_chat_ids(msgdb_cursor, phone_numbers, manifest, phone_number_index)
+                    if delta and output_style in ("formatted_txt", "ndjson"):
+                        chat_row_ids = append_chat_deltas(
+                            msgdb_cursor, contacts, chat_row_ids, manifest, output_style, timestamps
+                        )
+
+            if workers > 1:
+                export_in_parallel(
+                    msgdb_path, msgdb_cursor, contacts, conversation_types, phone_numbers, output_style,
+                    output_call_logs_directory, output_chat_directory, workers, columnar, phone_number_index,
+                    output_opener, timestamps, manifest, jid_row_ids, chat_row_ids
+                )
+            elif pipeline:
+                export_pipelined(
+                    msgdb_path, contacts, conversation_types, phone_numbers, output_style,
+                    output_call_logs_directory, output_chat_directory, writer_threads, columnar, phone_number_index,
+                    timestamps, manifest, jid_row_ids, chat_row_ids
+                )
+            else:
+                if "call_logs" in conversation_types:
+                    call_logs = load_call_logs(
+                        msgdb_cursor, output_call_logs_directory, phone_numbers, contacts, phone_number_index,
+                        jid_row_ids
+                    )
+                    for call_log in tqdm(call_logs):
+                        with hash_outputs() if manifest else nullcontext() as hashes:
+                            export_call_log(
+                                call_log=call_log, folder=output_call_logs_directory, output_style=output_style,
+                                contacts=contacts, timestamps=timestamps
+                            )
+                        if manifest:
+                            manifest.record("call_logs", call_log.jid_row_id, hashes)
+
+                if "chats" in conversation_types:
+                    chats = load_chats(
+                        msgdb_cursor, output_chat_directory, phone_numbers, contacts, columnar, phone_number_index,
+                        chat_row_ids
+                    )
+                    for chat in tqdm(chats):
+                        with hash_outputs() if manifest else nullcontext() as hashes:
+                            export_chat(
+                                chat=chat, folder=output_chat_directory, output_style=output_style, contacts=contacts,
+                                timestamps=timestamps
+                            )
+                        if manifest:
+                            manifest.record("chats", chat.chat_id, hashes)
+
+            if "call_log_summary" in conversation_types:
+                if not os.path.exists(output_dir):
+                    os.makedirs(output_dir)
+                with hash_outputs() if manifest else nullcontext() as hashes:
+                    export_call_log_summary(
+                        msgdb_cursor, contacts, phone_numbers, output_style, output_call_log_summary_file,
+                        phone_number_index
+                    )
+                if manifest:
+                    manifest.record_files(hashes)
+
+            if "contacts" in conversation_types:
+                with hash_outputs() if manifest else nullcontext() as hashes:
+                    contacts_to_txt_formatted(contacts=contacts, file_name=output_contacts_file)
+                if manifest:
+                    manifest.record_files(hashes)
+
+            if manifest:
+                manifest.save(output_dir + EXPORT_MANIFEST_FILE)
 
     finally:
         close_db_connections([msgdb])
+        if archive:
+            output_opener.close()
+            # the directories of the chats and call logs are created while loading them, but stay empty
+            for directory in (output_dir + CALL_LOGS_DIR, output_dir + CHAT_DIR):
+                if os.path.isdir(directory) and not os.listdir(directory):
+                    os.rmdir(directory)
 
 
 if __name__ == "__main__":
@@ -161,16 +833,16 @@ if __name__ == "__main__":
     ap.add_argument(
         "--conversation_types",
         "-t",
-        choices=["call_logs", "chats", "contacts"],
+        choices=["call_logs", "call_log_summary", "chats", "contacts"],
         nargs="+",
         type=str,
         default=["call_logs", "chats", "contacts"],
-        help="Backup only call_logs, only chats, or both (by providing both)",
+        help="Backup only call_logs, only chats, or both (by providing both). 'call_log_summary' writes the call statistics of every contact to a single file",
     )
     ap.add_argument(
         "--output_style",
         "-s",
-        choices=["raw_txt", "formatted_txt", "json"],
+        choices=["raw_txt", "formatted_txt", "json", "compact_json", "ndjson", "sqlite"],
         type=str,
         default="formatted_txt",
         help="Style in which your parsed backup will be stored",
@@ -188,6 +860,77 @@ if __name__ == "__main__":
         default=[],
         help="Phone numbers (format: XXXXXXXXXXXX) of the chats and/or call logs that you want to extract from the database. Empty means all phone numbers",
     )
+    ap.add_argument(
+        "--indexed_msgdb",
+        action="store_true",
+        help="Work on an indexed copy of 'msgstore.db' that is cached in the output directory and reused while the backup is unchanged",
+    )
+    ap.add_argument(
+        "--workers",
+        "-w",
+        type=int,
+        default=1,
+        help="Number of processes exporting chats and call logs in parallel",
+    )
+    ap.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="Load, render and write chats and call logs in overlapping stages and report where they waited",
+    )
+    ap.add_argument(
+        "--writer_threads",
+        type=int,
+        default=4,
+        help="Number of threads writing the exported files with '--pipeline'",
+    )
+    ap.add_argument(
+        "--columnar",
+        action="store_true",
+        help="Hold the messages of every chat in compact columns instead of one object per message",
+    )
+    ap.add_argument(
+        "--contacts_cache",
+        action="store_true",
+        help="Cache the contacts of 'wa.db' in the output directory and reuse them while the file is unchanged",
+    )
+    ap.add_argument(
+        "--compress",
+        choices=["gzip", "bz2", "xz"],
+        default=None,
+        help="Compress every exported file while it is written, appending '.gz', '.bz2' or '.xz' to its name",
+    )
+    ap.add_argument(
+        "--compress_level",
+        type=int,
+        default=None,
+        help="Level of '--compress', 0-9 for gzip and xz and 1-9 for bz2. Defaults to the default of the compression",
+    )
+    ap.add_argument(
+        "--archive",
+        choices=["tar", "zip"],
+        default=None,
+        help="Write all exported files into a single 'whatsapp.tar' or 'whatsapp.zip' archive in the output directory, compressed with '--compress'",
+    )
+    ap.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only export the chats and call logs that changed since the last export into the output directory, as recorded in its '.export_manifest.json'",
+    )
+    ap.add_argument(
+        "--delta",
+        action="store_true",
+        help="With '--incremental', which it implies, append the new messages of chats that only gained messages to their 'formatted_txt' or 'ndjson' file instead of rewriting it",
+    )
+    ap.add_argument(
+        "--skip_unchanged",
+        action="store_true",
+        help="With '--incremental', which it implies, leave files whose content is the same as in the last export untouched, mtime included, instead of rewriting them",
+    )
+    ap.add_argument(
+        "--local_time",
+        action="store_true",
+        help="Show the times of messages and calls in the formatted txt style in the local timezone instead of UTC",
+    )
     args = ap.parse_args()
 
     main(
@@ -196,5 +939,18 @@ if __name__ == "__main__":
         output_dir=args.output_dir,
         conversation_types=args.conversation_types,
         phone_numbers=args.phone_number_filter,
-        output_style=args.output_style
+        output_style=args.output_style,
+        indexed_msgdb=args.indexed_msgdb,
+        workers=args.workers,
+        pipeline=args.pipeline,
+        writer_threads=args.writer_threads,
+        columnar=args.columnar,
+        contacts_cache=args.contacts_cache,
+        compression=args.compress,
+        compression_level=args.compress_level,
+        archive=args.archive,
+        local_time=args.local_time,
+        incremental=args.incremental,
+        delta=args.delta,
+        skip_unchanged=args.skip_unchanged
     )
@@ -1,10 +1,20 @@
 import sqlite3
-from itertools import chain
+from itertools import chain, groupby
+from operator import itemgetter
 from typing import Generator, Union, Dict, List
 
 from ..common import contact_resolver
-from ..models import Call, CallLog, Contact
-from .resolver import call_jid_resolver, call_resolver
+from ..models import Call, CallLog, CallLogSummary, Contact
+from ..phone_number_index import PhoneNumberIndex
+from .resolver import (
+    all_calls_resolver,
+    call_jid_resolver,
+    call_log_summary_resolver,
+    call_resolver,
+    call_result_counts_resolver,
+    filtered_calls_resolver,
+    jid_row_ids_filter_resolver,
+)
 
 
 def build_call_for_given_id(
@@ -32,6 +42,7 @@ def build_call_log_for_given_id_or_phone_number(
     contacts: Dict[str, List[Contact]],
     jid_row_id: int = None,
     phone_number: str = None,
+    phone_number_index: PhoneNumberIndex = None,
 ) -> Union[CallLog, None]:
     """Extract all call_logs (if available) for a given jid_row_id or phone_number.
 
@@ -40,6 +51,7 @@ def build_call_log_for_given_id_or_phone_number(
         contacts (Dict[str, List[Contact]]): Dict of all contacts and jid as key.
         jid_row_id (int, optional): jid of the call_log to extract. Defaults to None.
         phone_number (str, optional): Phone Number of the person you want to extract the call_logs of. Defaults to None.
+        phone_number_index (PhoneNumberIndex, optional): Index used to look up `phone_number`. Defaults to None.
 
     Returns:
         CallLog: CallLog object corresponding to the given jid_row_id or phone_number.
@@ -50,7 +62,7 @@ def build_call_log_for_given_id_or_phone_number(
         )
     elif phone_number:
         call_log, raw_string_jid = call_jid_resolver(
-            msgdb_cursor=msgdb_cursor, phone_number=phone_number
+            msgdb_cursor=msgdb_cursor, phone_number=phone_number, phone_number_index=phone_number_index
         )
     else:
         raise AssertionError("'jid_row_id' and 'phone_number' cannot both be None")
@@ -74,21 +86,140 @@ def build_all_call_logs(
 ) -> Generator[CallLog, None, None]:
     """Extract all call_logs in the msgdb database.
 
+    All calls are read with a single scan ordered by caller, which is split into CallLog objects while it streams,
+    so only the jids that actually have calls are visited.
+
     Args:
         msgdb_cursor (sqlite3.Cursor): 'msgdb' cursor.
         contacts (Dict[str, List[Contact]]): Dict of all contacts and jid as key.
 
     Returns:
-        A generator of CallLog objects
+        A generator of CallLog objects with at least one call, ordered by jid_row_id.
     """
-    # todo check: is it really necessary to scan entire jid table? it's probably used for more than just calls
-    query = "SELECT jid._id FROM 'jid'"
-    execution = msgdb_cursor.execute(query)
-    res_query = list(chain.from_iterable(execution.fetchall()))
+    for (jid_row_id, raw_string_jid), rows in groupby(all_calls_resolver(msgdb_cursor), key=itemgetter(0, 1)):
+        yield CallLog(
+            jid_row_id=jid_row_id,
+            caller_id=contact_resolver(contacts=contacts, raw_string_jid=raw_string_jid),
+            calls=[
+                Call(
+                    call_row_id=call_row_id,
+                    from_me=from_me,
+                    timestamp=timestamp,
+                    video_call=video_call,
+                    duration=duration,
+                    call_result=call_result,
+                )
+                for _, _, call_row_id, from_me, timestamp, video_call, duration, call_result in rows
+            ],
+        )
+
+
+def build_call_logs_for_phone_numbers(
+    msgdb_cursor: sqlite3.Cursor,
+    contacts: Dict[str, List[Contact]],
+    phone_numbers: List[str],
+    phone_number_index: PhoneNumberIndex,
+) -> Generator[CallLog, None, None]:
+    """Extract the call_logs of the given phone numbers.
+
+    The phone numbers are loaded into a temporary table that is joined against `jid` and `call_log`, so all calls are
+    read with a single query and streamed into CallLog objects.
+
+    Args:
+        msgdb_cursor (sqlite3.Cursor): 'msgdb' cursor.
+        contacts (Dict[str, List[Contact]]): Dict of all contacts and jid as key.
+        phone_numbers (List[str]): Phone numbers of the call_logs to extract.
+        phone_number_index (PhoneNumberIndex): Index used to look up the phone numbers.
+
+    Returns:
+        A generator of CallLog objects, in the order of the phone numbers. Phone numbers without a jid are skipped.
+    """
+    phone_number_index.load_filter(msgdb_cursor, phone_numbers)
+    return build_filtered_call_logs(msgdb_cursor, contacts)
+
+
+def build_call_logs_for_jid_row_ids(
+    msgdb_cursor: sqlite3.Cursor,
+    contacts: Dict[str, List[Contact]],
+    jid_row_ids: List[int],
+) -> Generator[CallLog, None, None]:
+    """Extract the call_logs of the given jids with a single query, the same way `build_call_logs_for_phone_numbers` does.
+
+    Args:
+        msgdb_cursor (sqlite3.Cursor): 'msgdb' cursor.
+        contacts (Dict[str, List[Contact]]): Dict of all contacts and jid as key.
+        jid_row_ids (List[int]): IDs of the jids of the call_logs to extract.
 
-    return (
-        build_call_log_for_given_id_or_phone_number(
-            msgdb_cursor=msgdb_cursor, contacts=contacts, jid_row_id=jid_row_id
+    Returns:
+        A generator of CallLog objects, in the order of the jids. IDs without a jid are skipped.
+    """
+    jid_row_ids_filter_resolver(msgdb_cursor, jid_row_ids)
+    return build_filtered_call_logs(msgdb_cursor, contacts)
+
+
+def build_filtered_call_logs(
+    msgdb_cursor: sqlite3.Cursor, contacts: Dict[str, List[Contact]]
+) -> Generator[CallLog, None, None]:
+    """Stream the calls of the jids in `temp.phone_number_filter` into CallLog objects.
+
+    Args:
+        msgdb_cursor (sqlite3.Cursor): 'msgdb' cursor.
+        contacts (Dict[str, List[Contact]]): Dict of all contacts and jid as key.
+
+    Returns:
+        A generator of CallLog objects, in the order of the filter.
+    """
+    for (_, jid_row_id, raw_string_jid), rows in groupby(filtered_calls_resolver(msgdb_cursor), key=itemgetter(0, 1, 2)):
+        yield CallLog(
+            jid_row_id=jid_row_id,
+            caller_id=contact_resolver(contacts=contacts, raw_string_jid=raw_string_jid),
+            calls=[
+                Call(
+                    call_row_id=call_row_id,
+                    from_me=from_me,
+                    timestamp=timestamp,
+                    video_call=video_call,
+                    duration=duration,
+                    call_result=call_result,
+                )
+                for _, _, _, call_row_id, from_me, timestamp, video_call, duration, call_result in rows
+                # a jid without calls has a single row without a call
+                if call_row_id is not None
+            ],
         )
-        for jid_row_id in sorted(res_query)
-    )
+
+
+def build_call_log_summaries(
+    msgdb_cursor: sqlite3.Cursor,
+    contacts: Dict[str, List[Contact]],
+    phone_numbers: List[str] = None,
+    phone_number_index: PhoneNumberIndex = None,
+) -> List[CallLogSummary]:
+    """Summarise the calls of every caller, aggregated inside SQLite without building the Call objects.
+
+    Args:
+        msgdb_cursor (sqlite3.Cursor): 'msgdb' cursor.
+        contacts (Dict[str, List[Contact]]): Dict of all contacts and jid as key.
+        phone_numbers (List[str], optional): Phone numbers of the callers to summarise. Defaults to None, which means all.
+        phone_number_index (PhoneNumberIndex, optional): Index used to look up `phone_numbers`. Defaults to None.
+
+    Returns:
+        List[CallLogSummary]: Summary of every caller with calls, the most called first.
+    """
+    summaries = call_log_summary_resolver(msgdb_cursor)
+    if phone_numbers:
+        jid_row_ids = {
+            call_jid_resolver(msgdb_cursor, phone_number=phone_number, phone_number_index=phone_number_index)[0].get("jid_row_id")
+            for phone_number in phone_numbers
+        }
+        summaries = [summary for summary in summaries if summary["jid_row_id"] in jid_row_ids]
+    call_results = call_result_counts_resolver(msgdb_cursor)
+
+    call_log_summaries = []
+    for summary in summaries:
+        raw_string_jid = summary.pop("raw_string_jid")
+        summary["caller_id"] = contact_resolver(contacts=contacts, raw_string_jid=raw_string_jid)
+        summary["call_results"] = call_results.get(summary["jid_row_id"], {})
+        call_log_summaries.append(CallLogSummary(**summary))
+    call_log_summaries.sort(key=lambda summary: (-summary.call_count, summary.jid_row_id))
+    return call_log_summaries
@@ -1,5 +1,10 @@
 import sqlite3
-from typing import Any, Dict, Tuple, Union
+from collections import defaultdict
+from itertools import chain, groupby
+from operator import itemgetter
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from src.phone_number_index import PhoneNumberIndex
 
 
 def call_resolver(msgdb_cursor: sqlite3.Cursor, call_row_id: int) -> Dict[str, Any] | None:
@@ -28,6 +33,7 @@ def call_jid_resolver(
     msgdb_cursor: sqlite3.Cursor,
     jid_row_id: Union[int, None] = None,
     phone_number: Union[str, None] = None,
+    phone_number_index: Union[PhoneNumberIndex, None] = None,
 ) -> Tuple[Dict[str, Any], str]:
     """Fetch jid data for a given jid_row_id from the msgdb for fetching call logs.
 
@@ -35,11 +41,19 @@ def call_jid_resolver(
         msgdb_cursor (sqlite3.Cursor): 'msgdb' cursor.
         jid_row_id (Union[int, None]): jid_row of the caller for which call data is retrieved. Defaults to None.
         phone_number (Union[str, None]): Phone number of the caller for which call data is retrieved. Defaults to None.
+        phone_number_index (Union[PhoneNumberIndex, None]): Index used to look up `phone_number` instead of a
+            `LIKE` scan of `jid`. Defaults to None.
 
     Returns:
         Dict[str, Any]: Dictionary containing 'jid_row_id' as key.
         str: 'raw_string_jid' of the person who sent the message.
     """
+    if phone_number and phone_number_index:
+        jid_row_ids = phone_number_index.jid_row_ids(phone_number)
+        if not jid_row_ids:
+            return {"jid_row_id": None}, None
+        jid_row_id = jid_row_ids[0]
+
     if jid_row_id:
         msgdb_query = """
         SELECT jid._id as jid_row_id, jid.raw_string as raw_string_jid
@@ -66,3 +80,193 @@ def call_jid_resolver(
     res = dict(zip([col[0] for col in execution.description], res_query))
     raw_string_jid = res.pop("raw_string_jid")
     return res, raw_string_jid
+
+
+def sort_groups(rows: Iterable[tuple], group_key: Callable[[tuple], Any], sort_key: Callable[[tuple], Any]) -> Iterator[tuple]:
+    """Sort every group of consecutive rows with the same `group_key` by `sort_key`, one group at a time.
+
+    The msgdb has no index on `call_log` that ends with `_id`, so the queries are only ordered by the indexed prefix
+    and the calls of every jid are sorted here, instead of sorting all calls in a temporary B-tree.
+
+    Args:
+        rows (Iterable[tuple]): Rows grouped by `group_key`.
+        group_key (Callable[[tuple], Any]): Key of the group of a row.
+        sort_key (Callable[[tuple], Any]): Key the rows of a group are sorted by.
+
+    Returns:
+        Iterator[tuple]: The rows, with every group sorted.
+    """
+    return chain.from_iterable(sorted(group, key=sort_key) for _, group in groupby(rows, key=group_key))
+
+
+def all_calls_resolver(msgdb_cursor: sqlite3.Cursor) -> Iterator[tuple]:
+    """Fetch every call in the msgdb, together with the jid of the caller, with a single scan.
+
+    The rows are streamed from a dedicated cursor, so `msgdb_cursor` stays free for other queries while they are consumed.
+
+    Args:
+        msgdb_cursor (sqlite3.Cursor): 'msgdb' cursor.
+
+    Returns:
+        Iterator[tuple]: ('jid_row_id', 'raw_string_jid', 'call_row_id', 'from_me', 'timestamp', 'video_call',
+            'duration', 'call_result') rows, ordered by jid_row_id and call_row_id.
+    """
+    msgdb_query = """
+    SELECT call_log.jid_row_id, jid.raw_string as raw_string_jid,
+           call_log._id as call_row_id, call_log.from_me, call_log.timestamp, call_log.video_call, call_log.duration, call_log.call_result
+    FROM 'call_log'
+    JOIN 'jid' ON call_log.jid_row_id=jid._id
+    ORDER BY call_log.jid_row_id
+    """
+    return sort_groups(msgdb_cursor.connection.cursor().execute(msgdb_query), itemgetter(0), itemgetter(2))
+
+
+def filtered_calls_resolver(msgdb_cursor: sqlite3.Cursor) -> Iterator[tuple]:
+    """Fetch the calls of the phone numbers in `temp.phone_number_filter` with a single query.
+
+    Every phone number selects its first matching jid, see `PhoneNumberIndex.load_filter`. The rows are streamed from a
+    dedicated cursor.
+
+    Args:
+        msgdb_cursor (sqlite3.Cursor): 'msgdb' cursor.
+
+    Returns:
+        Iterator[tuple]: ('position', 'jid_row_id', 'raw_string_jid', 'call_row_id', 'from_me', 'timestamp',
+            'video_call', 'duration', 'call_result') rows, ordered by the position of the phone number in the filter
+            and call_row_id. A jid without calls has a single row whose call columns are NULL.
+    """
+    msgdb_query = """
+    SELECT phone_number_filter.position, jid._id as jid_row_id, jid.raw_string as raw_string_jid,
+           call_log._id as call_row_id, call_log.from_me, call_log.timestamp, call_log.video_call, call_log.duration, call_log.call_result
+    FROM temp.phone_number_filter
+    JOIN 'jid' ON phone_number_filter.jid_row_id=jid._id
+    LEFT JOIN 'call_log' ON call_log.jid_row_id=jid._id
+    WHERE phone_number_filter.rank=0
+    ORDER BY phone_number_filter.position
+    """
+    return sort_groups(msgdb_cursor.connection.cursor().execute(msgdb_query), itemgetter(0), itemgetter(3))
+
+
+def jid_row_ids_filter_resolver(msgdb_cursor: sqlite3.Cursor, jid_row_ids: Iterable[int]) -> None:
+    """Load the given jids into the temporary table `phone_number_filter`, one jid per position.
+
+    `filtered_calls_resolver` then selects exactly the calls of these jids, in the given order.
+
+    Args:
+        msgdb_cursor (sqlite3.Cursor): 'msgdb' cursor.
+        jid_row_ids (Iterable[int]): IDs of the jids.
+    """
+    msgdb_cursor.execute("DROP TABLE IF EXISTS temp.phone_number_filter")
+    msgdb_cursor.execute(
+        "CREATE TEMP TABLE phone_number_filter (position INTEGER, rank INTEGER, jid_row_id INTEGER, PRIMARY KEY (position, rank))"
+    )
+    msgdb_cursor.executemany(
+        "INSERT INTO temp.phone_number_filter VALUES (?, 0, ?)", enumerate(jid_row_ids)
+    )
+
+
+def all_call_watermarks_resolver(msgdb_cursor: sqlite3.Cursor) -> List[Tuple[int, Optional[int], int]]:
+    """Fetch the highest call ID and the number of calls of every jid in the msgdb that has calls.
+
+    Args:
+        msgdb_cursor (sqlite3.Cursor): 'msgdb' cursor.
+
+    Returns:
+        List[Tuple[int, Optional[int], int]]: ('jid_row_id', max call ID, call count) rows ordered by 'jid_row_id'.
+    """
+    msgdb_query = """
+    SELECT call_log.jid_row_id, MAX(call_log._id) as max_call_id, COUNT(call_log._id) as call_count
+    FROM 'call_log'
+    JOIN 'jid' ON call_log.jid_row_id=jid._id
+    GROUP BY call_log.jid_row_id
+    ORDER BY call_log.jid_row_id
+    """
+    return msgdb_cursor.execute(msgdb_query).fetchall()
+
+
+def all_call_jids_resolver(msgdb_cursor: sqlite3.Cursor) -> List[Tuple[int, str]]:
+    """Fetch the 'raw_string' of every jid in the msgdb that has calls.
+
+    Args:
+        msgdb_cursor (sqlite3.Cursor): 'msgdb' cursor.
+
+    Returns:
+        List[Tuple[int, str]]: ('jid_row_id', 'raw_string_jid') pairs ordered by 'jid_row_id'.
+    """
+    msgdb_query = """
+    SELECT jid._id as jid_row_id, jid.raw_string as raw_string_jid
+    FROM 'jid'
+    WHERE jid._id IN (SELECT call_log.jid_row_id FROM 'call_log')
+    ORDER BY jid._id
+    """
+    return msgdb_cursor.execute(msgdb_query).fetchall()
+
+
+def all_call_counts_resolver(msgdb_cursor: sqlite3.Cursor) -> List[Tuple[int, int]]:
+    """Fetch the number of calls of every jid in the msgdb that has calls.
+
+    Args:
+        msgdb_cursor (sqlite3.Cursor): 'msgdb' cursor.
+
+    Returns:
+        List[Tuple[int, int]]: ('jid_row_id', call count) pairs, largest call log first.
+    """
+    msgdb_query = """
+    SELECT jid._id as jid_row_id, COUNT(call_log._id) as call_count
+    FROM 'call_log'
+    JOIN 'jid' ON call_log.jid_row_id=jid._id
+    GROUP BY jid._id
+    """
+    execution = msgdb_cursor.execute(msgdb_query)
+    # sorted here, the aggregate is tiny compared to the scan
+    return sorted(execution.fetchall(), key=lambda row: (-row[1], row[0]))
+
+
+def call_log_summary_resolver(msgdb_cursor: sqlite3.Cursor) -> List[Dict[str, Any]]:
+    """Aggregate the calls of every jid in the msgdb that has calls.
+
+    Args:
+        msgdb_cursor (sqlite3.Cursor): 'msgdb' cursor.
+
+    Returns:
+        List[Dict[str, Any]]: Dictionaries containing 'jid_row_id', 'raw_string_jid', 'call_count', 'total_duration',
+            'average_duration', 'video_calls', 'voice_calls', 'outgoing_calls' and 'incoming_calls' keys, ordered by jid_row_id.
+    """
+    msgdb_query = """
+    SELECT call_log.jid_row_id, jid.raw_string as raw_string_jid,
+           COUNT(*) as call_count,
+           COALESCE(SUM(call_log.duration), 0) as total_duration,
+           AVG(call_log.duration) as average_duration,
+           SUM(call_log.video_call != 0) as video_calls,
+           SUM(call_log.video_call = 0) as voice_calls,
+           SUM(call_log.from_me != 0) as outgoing_calls,
+           SUM(call_log.from_me = 0) as incoming_calls
+    FROM 'call_log'
+    JOIN 'jid' ON call_log.jid_row_id=jid._id
+    GROUP BY call_log.jid_row_id
+    ORDER BY call_log.jid_row_id
+    """
+    execution = msgdb_cursor.execute(msgdb_query)
+    columns = [col[0] for col in execution.description]
+    return [dict(zip(columns, row)) for row in execution.fetchall()]
+
+
+def call_result_counts_resolver(msgdb_cursor: sqlite3.Cursor) -> Dict[int, Dict[Optional[int], int]]:
+    """Count the calls of every jid in the msgdb per call result.
+
+    Args:
+        msgdb_cursor (sqlite3.Cursor): 'msgdb' cursor.
+
+    Returns:
+        Dict[int, Dict[Optional[int], int]]: Number of calls per 'call_result', by 'jid_row_id'. Calls without a call
+            result are counted under None.
+    """
+    msgdb_query = """
+    SELECT call_log.jid_row_id, call_log.call_result, COUNT(*) as call_count
+    FROM 'call_log'
+    GROUP BY call_log.jid_row_id, call_log.call_result
+    """
+    call_results = defaultdict(dict)
+    for jid_row_id, call_result, call_count in msgdb_cursor.execute(msgdb_query):
+        call_results[jid_row_id][call_result] = call_count
+    return dict(call_results)
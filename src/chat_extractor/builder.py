@@ -1,11 +1,24 @@
 import sqlite3
-from itertools import chain
-from typing import Generator, Union, Dict, List
+from typing import Dict, Generator, Iterator, List, Set, Tuple, Union
 
 from ..common import contact_resolver
-from ..models import Chat, Contact, GeoPosition, GroupName, Media, Message
+from ..message_batch import MessageBatch
+from ..models import Chat, ChatStream, Contact, GeoPosition, GroupName, Media, Message
+from ..phone_number_index import PhoneNumberIndex
 from .resolver import (
+    all_chat_messages_resolver,
+    all_chat_quoted_key_ids_resolver,
+    all_chat_sender_jids_resolver,
+    all_chats_resolver,
+    all_group_chat_participant_jids_resolver,
+    chat_ids_filter_resolver,
+    chat_messages_after_resolver,
+    chat_messages_by_key_ids_resolver,
+    chat_messages_resolver,
+    chat_quoted_key_ids_resolver,
     chat_resolver,
+    chat_sender_jids_resolver,
+    filtered_chats_resolver,
     geo_position_resolver,
     media_resolver,
     message_resolver, group_chat_participant_jid_resolver,
@@ -53,11 +66,76 @@ def build_message_for_given_id(
     return Message(**message)
 
 
+def build_message_from_row(contacts: Dict[str, List[Contact]], row: tuple) -> Message:
+    """Build a Message from a single row of `chat_messages_resolver`.
+
+    Args:
+        contacts (Dict[str, List[Contact]]): Dict of all contacts and jid as key.
+        row (tuple): Row with the columns of `resolver.MESSAGE_ROWS_QUERY`.
+
+    Returns:
+        A Message object corresponding to the given row.
+    """
+    (
+        message_id, key_id, chat_id, from_me, raw_string_jid, timestamp, text_data, reply_to,
+        media_message_id, media_job_uuid, file_path, mime_type,
+        geo_position_message_id, latitude, longitude,
+    ) = row
+
+    if raw_string_jid:
+        sender_contact = contact_resolver(contacts=contacts, raw_string_jid=raw_string_jid)
+    else:
+        sender_contact = None
+
+    if media_message_id is not None:
+        media = Media(message_id=media_message_id, media_job_uuid=media_job_uuid, file_path=file_path, mime_type=mime_type)
+    else:
+        media = None
+
+    if geo_position_message_id is not None:
+        geo_position = GeoPosition(message_id=geo_position_message_id, latitude=latitude, longitude=longitude)
+    else:
+        geo_position = None
+
+    return Message(
+        message_id=message_id,
+        key_id=key_id,
+        chat_id=chat_id,
+        from_me=from_me,
+        sender_contact=sender_contact,
+        timestamp=timestamp,
+        text_data=text_data,
+        media=media,
+        geo_position=geo_position,
+        reply_to=reply_to,
+    )
+
+
+def build_messages_for_given_chat_id(
+    msgdb_cursor: sqlite3.Cursor, contacts: Dict[str, List[Contact]], chat_row_id: int
+) -> Generator[Message, None, None]:
+    """Extract all messages of a given chat_row_id with one query instead of three queries per message.
+
+    Args:
+        msgdb_cursor (sqlite3.Cursor): The cursor for the 'msgdb' database.
+        contacts (Dict[str, List[Contact]]): Dict of all contacts and jid as key.
+        chat_row_id (int): ID of the chat whose messages you want to extract.
+
+    Yields:
+        Message: Messages of the chat, in the order they are displayed.
+    """
+    for row in chat_messages_resolver(msgdb_cursor=msgdb_cursor, chat_row_id=chat_row_id):
+        yield build_message_from_row(contacts, row)
+
+
 def build_chat_for_given_id_or_phone_number(
     msgdb_cursor: sqlite3.Cursor,
     contacts: Dict[str, List[Contact]],
     chat_row_id: int = None,
     phone_number: str = None,
+    stream: bool = False,
+    columnar: bool = False,
+    phone_number_index: PhoneNumberIndex = None,
 ) -> Union[Chat, None]:
     """Extract all the messages and media (if available) for a given chat_row_id or phone_number.
 
@@ -68,6 +146,10 @@ def build_chat_for_given_id_or_phone_number(
         contacts (Dict[str, List[Contact]]): Dict of all contacts and jid as key.
         chat_row_id (int): ID of the chat to extract. Defaults to None.
         phone_number (str): Phone Number of the person you want to extract the chats of. Defaults to None.
+        stream (bool): Return a ChatStream whose messages are read from the msgdb while they are iterated. Defaults to False.
+        columnar (bool): Hold the messages in a MessageBatch instead of a list. Takes precedence over `stream`.
+            Defaults to False.
+        phone_number_index (PhoneNumberIndex): Index used to look up `phone_number`. Defaults to None.
 
     Returns:
         Chat: Chat corresponding to the given chat_row_id or phone_number.
@@ -78,59 +160,307 @@ def build_chat_for_given_id_or_phone_number(
         )
     elif phone_number:
         chat, raw_string_jid = chat_resolver(
-            msgdb_cursor=msgdb_cursor, phone_number=phone_number
+            msgdb_cursor=msgdb_cursor, phone_number=phone_number, phone_number_index=phone_number_index
         )
     else:
         raise AssertionError("'chat_row_id' and 'phone_number' both cannot be None")
 
+    chat_participant_jids = group_chat_participant_jid_resolver(msgdb_cursor=msgdb_cursor, chat_jid_raw_string=raw_string_jid)
+    if columnar:
+        batch = MessageBatch.from_rows(contacts, chat_messages_resolver(msgdb_cursor=msgdb_cursor, chat_row_id=chat.get("chat_id")))
+        return assemble_chat(contacts, chat.get("chat_id"), raw_string_jid, batch, chat_participant_jids)
+
+    messages = build_messages_for_given_chat_id(msgdb_cursor, contacts, chat.get("chat_id"))
+    if stream:
+        return assemble_chat_stream(
+            contacts,
+            chat.get("chat_id"),
+            raw_string_jid,
+            messages,
+            chat_participant_jids,
+            chat_sender_jids_resolver(msgdb_cursor=msgdb_cursor, chat_row_id=chat.get("chat_id")),
+            chat_quoted_key_ids_resolver(msgdb_cursor=msgdb_cursor, chat_row_id=chat.get("chat_id")),
+        )
+    return assemble_chat(contacts, chat.get("chat_id"), raw_string_jid, list(messages), chat_participant_jids)
+
+
+def build_chat_delta(
+    msgdb_cursor: sqlite3.Cursor,
+    contacts: Dict[str, List[Contact]],
+    chat_row_id: int,
+    message_row_id: int,
+) -> Tuple[ChatStream, Dict[str, Message]]:
+    """Extract the messages of a chat after a given message._id, to append them to an earlier export of the chat.
+
+    The participants of the chat are those of all of its messages, the same as for the whole chat.
+
+    Args:
+        msgdb_cursor (sqlite3.Cursor): The cursor for the 'msgdb' database.
+        contacts (Dict[str, List[Contact]]): Dict of all contacts and jid as key.
+        chat_row_id (int): ID of the chat.
+        message_row_id (int): Last message._id of the earlier export.
+
+    Returns:
+        Tuple[ChatStream, Dict[str, Message]]: Chat with the new messages, and the earlier messages the new ones reply
+            to by key_id, the first one of every key_id.
+    """
+    chat, raw_string_jid = chat_resolver(msgdb_cursor=msgdb_cursor, chat_row_id=chat_row_id)
+    messages = [
+        build_message_from_row(contacts, row)
+        for row in chat_messages_after_resolver(msgdb_cursor, chat.get("chat_id"), message_row_id)
+    ]
+    quoted_key_ids = {message.reply_to for message in messages if message.reply_to}
+
+    replied_messages = {}
+    for row in chat_messages_by_key_ids_resolver(
+            msgdb_cursor, chat.get("chat_id"), sorted(quoted_key_ids), message_row_id
+    ):
+        message = build_message_from_row(contacts, row)
+        replied_messages.setdefault(message.key_id, message)
+
+    chat_stream = assemble_chat_stream(
+        contacts,
+        chat.get("chat_id"),
+        raw_string_jid,
+        iter(messages),
+        group_chat_participant_jid_resolver(msgdb_cursor=msgdb_cursor, chat_jid_raw_string=raw_string_jid),
+        chat_sender_jids_resolver(msgdb_cursor=msgdb_cursor, chat_row_id=chat.get("chat_id")),
+        quoted_key_ids,
+    )
+    return chat_stream, replied_messages
+
+
+def resolve_chat_title(contacts: Dict[str, List[Contact]], raw_string_jid: str) -> Union[Contact, GroupName]:
+    """Resolve the title of a chat, which is a GroupName for groups and the Contact otherwise.
+
+    Args:
+        contacts (Dict[str, List[Contact]]): Dict of all contacts and jid as key.
+        raw_string_jid (str): 'raw_string_jid' of the chat.
+
+    Returns:
+        Union[Contact, GroupName]: Title of the chat.
+    """
     contact = contact_resolver(contacts=contacts, raw_string_jid=raw_string_jid)
     if contact.name and not contact.number:
-        chat["chat_title"] = GroupName(raw_string_jid=raw_string_jid, name=contact.name)
-    else:
-        chat["chat_title"] = contact
-
-    query = "SELECT message._id FROM 'message' WHERE message.chat_row_id=?"
-    execution = msgdb_cursor.execute(query, (chat.get("chat_id"),))
-    res_query = list(chain.from_iterable(execution.fetchall()))
-    chat["messages"] = [
-        build_message_for_given_id(msgdb_cursor, contacts, message_id)
-        for message_id in res_query
-    ]
+        return GroupName(raw_string_jid=raw_string_jid, name=contact.name)
+    return contact
 
-    chat_participant_jids = group_chat_participant_jid_resolver(msgdb_cursor=msgdb_cursor, chat_jid_raw_string=raw_string_jid)
+
+def assemble_chat(
+    contacts: Dict[str, List[Contact]],
+    chat_id: int,
+    raw_string_jid: str,
+    messages: Union[List[Message], MessageBatch],
+    chat_participant_jids: List[str],
+) -> Chat:
+    """Resolve the title and participants of a chat and build the Chat object.
+
+    Args:
+        contacts (Dict[str, List[Contact]]): Dict of all contacts and jid as key.
+        chat_id (int): ID of the chat.
+        raw_string_jid (str): 'raw_string_jid' of the chat.
+        messages (Union[List[Message], MessageBatch]): Messages of the chat.
+        chat_participant_jids (List[str]): Jids of the group participants, empty for a one-on-one chat.
+
+    Returns:
+        Chat: Chat with the given messages.
+    """
+    chat_participant_jids = list(chat_participant_jids)
     # add contacts from messages
-    for message in chat['messages']:
-        if not message.from_me and message.sender_contact:
-            chat_participant_jids.append(message.sender_contact.raw_string_jid)
+    if isinstance(messages, MessageBatch):
+        chat_participant_jids.extend(messages.sender_jids())
+    else:
+        for message in messages:
+            if not message.from_me and message.sender_contact:
+                chat_participant_jids.append(message.sender_contact.raw_string_jid)
     # unique participants
-    chat['participants'] = [contact_resolver(contacts, jid) for jid in set(chat_participant_jids)]
+    participants = [contact_resolver(contacts, jid) for jid in set(chat_participant_jids)]
 
+    return Chat(
+        chat_id=chat_id,
+        chat_title=resolve_chat_title(contacts, raw_string_jid),
+        messages=messages,
+        participants=participants,
+    )
+
+
+def assemble_chat_stream(
+    contacts: Dict[str, List[Contact]],
+    chat_id: int,
+    raw_string_jid: str,
+    messages: Iterator[Message],
+    chat_participant_jids: List[str],
+    sender_jids: List[str],
+    quoted_key_ids: Set[str],
+) -> ChatStream:
+    """Resolve the title and participants of a chat and build a ChatStream around its message iterator.
+
+    The participants can't be collected from the messages before they are written, so the senders are passed in.
+
+    Args:
+        contacts (Dict[str, List[Contact]]): Dict of all contacts and jid as key.
+        chat_id (int): ID of the chat.
+        raw_string_jid (str): 'raw_string_jid' of the chat.
+        messages (Iterator[Message]): Messages of the chat, read while they are iterated.
+        chat_participant_jids (List[str]): Jids of the group participants, empty for a one-on-one chat.
+        sender_jids (List[str]): Jids of the senders of all messages that are not from me.
+        quoted_key_ids (Set[str]): Key IDs of the messages that are replied to in this chat.
+
+    Returns:
+        ChatStream: Chat streaming the given messages.
+    """
+    # unique participants
+    participants = [contact_resolver(contacts, jid) for jid in set(chat_participant_jids) | set(sender_jids)]
 
-    return Chat(**chat)
+    return ChatStream(
+        chat_id=chat_id,
+        chat_title=resolve_chat_title(contacts, raw_string_jid),
+        messages=messages,
+        participants=participants,
+        quoted_key_ids=quoted_key_ids,
+    )
 
 
 def build_all_chats(
-    msgdb_cursor: sqlite3.Cursor, contacts: Dict[str, List[Contact]]
+    msgdb_cursor: sqlite3.Cursor, contacts: Dict[str, List[Contact]], stream: bool = False, columnar: bool = False
 ) -> Generator[Chat, None, None]:
     """Extract all chats in the msgdb database.
 
-    It takes a cursor to the message database and a cursor to the wa database, and returns a generator
-    that yields a chat object for each chat in the message database.
+    All messages are read with a single scan ordered by chat, which is split into Chat objects while it streams,
+    instead of running the per-chat queries once for every chat.
 
     Args:
         msgdb_cursor (sqlite3.Cursor): The cursor for the 'msgdb' database.
         contacts (Dict[str, List[Contact]]): Dict of all contacts and jid as key.
+        stream (bool): Yield ChatStreams whose messages are read from the scan while they are iterated, so no chat
+            is held in memory. They share the scan, so each chat has to be consumed before the next one is requested.
+            Defaults to False.
+        columnar (bool): Yield Chats holding their messages in a MessageBatch instead of a list. Takes precedence
+            over `stream`. Defaults to False.
 
     Return:
-        A generator of Chat objects.
+        A generator of Chat objects, ordered by chat_id.
     """
-    query = "SELECT chat._id FROM 'chat'"
-    execution = msgdb_cursor.execute(query)
-    res_query = list(chain.from_iterable(execution.fetchall()))
+    return build_chats_from_scan(msgdb_cursor, contacts, all_chats_resolver(msgdb_cursor=msgdb_cursor), False, stream, columnar)
 
-    return (
-        build_chat_for_given_id_or_phone_number(
-            msgdb_cursor=msgdb_cursor, contacts=contacts, chat_row_id=chat_id
-        )
-        for chat_id in res_query
-    )
+
+def build_chats_for_phone_numbers(
+    msgdb_cursor: sqlite3.Cursor,
+    contacts: Dict[str, List[Contact]],
+    phone_numbers: List[str],
+    phone_number_index: PhoneNumberIndex,
+    stream: bool = False,
+    columnar: bool = False,
+) -> Generator[Chat, None, None]:
+    """Extract the chats of the given phone numbers.
+
+    The phone numbers are loaded into a temporary table that is joined against `jid` and `chat`, and the messages of
+    all selected chats are read with a single scan, the same way `build_all_chats` does for all chats.
+
+    Args:
+        msgdb_cursor (sqlite3.Cursor): The cursor for the 'msgdb' database.
+        contacts (Dict[str, List[Contact]]): Dict of all contacts and jid as key.
+        phone_numbers (List[str]): Phone numbers of the chats to extract.
+        phone_number_index (PhoneNumberIndex): Index used to look up the phone numbers.
+        stream (bool): Yield ChatStreams, see `build_all_chats`. Defaults to False.
+        columnar (bool): Yield Chats holding their messages in a MessageBatch. Defaults to False.
+
+    Return:
+        A generator of Chat objects, in the order of the phone numbers. Phone numbers without a chat are skipped and
+        a chat is only extracted once.
+    """
+    phone_number_index.load_filter(msgdb_cursor, phone_numbers)
+    chats = filtered_chats_resolver(msgdb_cursor=msgdb_cursor)
+    return build_chats_from_scan(msgdb_cursor, contacts, chats, True, stream, columnar)
+
+
+def build_chats_for_chat_ids(
+    msgdb_cursor: sqlite3.Cursor,
+    contacts: Dict[str, List[Contact]],
+    chat_ids: List[int],
+    stream: bool = False,
+    columnar: bool = False,
+) -> Generator[Chat, None, None]:
+    """Extract the chats with the given IDs with a single scan, the same way `build_chats_for_phone_numbers` does.
+
+    Args:
+        msgdb_cursor (sqlite3.Cursor): The cursor for the 'msgdb' database.
+        contacts (Dict[str, List[Contact]]): Dict of all contacts and jid as key.
+        chat_ids (List[int]): IDs of the chats to extract.
+        stream (bool): Yield ChatStreams, see `build_all_chats`. Defaults to False.
+        columnar (bool): Yield Chats holding their messages in a MessageBatch. Defaults to False.
+
+    Return:
+        A generator of Chat objects, in the order of the IDs. IDs without a chat are skipped.
+    """
+    chats = chat_ids_filter_resolver(msgdb_cursor=msgdb_cursor, chat_ids=chat_ids)
+    return build_chats_from_scan(msgdb_cursor, contacts, chats, True, stream, columnar)
+
+
+def build_chats_from_scan(
+    msgdb_cursor: sqlite3.Cursor,
+    contacts: Dict[str, List[Contact]],
+    chats: List[Tuple[int, str]],
+    filtered: bool,
+    stream: bool,
+    columnar: bool,
+) -> Generator[Chat, None, None]:
+    """Split a single scan over the messages of the given chats into Chat objects while it streams.
+
+    Args:
+        msgdb_cursor (sqlite3.Cursor): The cursor for the 'msgdb' database.
+        contacts (Dict[str, List[Contact]]): Dict of all contacts and jid as key.
+        chats (List[Tuple[int, str]]): ('chat_id', 'raw_string_jid') pairs, in the order of the scan.
+        filtered (bool): Scan the chats in `temp.filtered_chat` instead of all chats.
+        stream (bool): Yield ChatStreams, see `build_all_chats`.
+        columnar (bool): Yield Chats holding their messages in a MessageBatch.
+
+    Return:
+        A generator of Chat objects, in the order of `chats`.
+    """
+    group_participant_jids = all_group_chat_participant_jids_resolver(msgdb_cursor=msgdb_cursor)
+    if stream and not columnar:
+        sender_jids = all_chat_sender_jids_resolver(msgdb_cursor=msgdb_cursor, filtered=filtered)
+        quoted_key_ids = all_chat_quoted_key_ids_resolver(msgdb_cursor=msgdb_cursor, filtered=filtered)
+    # position of every chat in the scan
+    positions = {chat_id: position for position, (chat_id, _) in enumerate(chats)}
+    rows = all_chat_messages_resolver(msgdb_cursor=msgdb_cursor, filtered=filtered)
+    row = next(rows, None)
+
+    def chat_rows(chat_id: int) -> Generator[tuple, None, None]:
+        nonlocal row
+        while row is not None and row[2] == chat_id:
+            message_row, row = row, next(rows, None)
+            yield message_row
+
+    def chat_messages(chat_id: int) -> Generator[Message, None, None]:
+        for message_row in chat_rows(chat_id):
+            yield build_message_from_row(contacts, message_row)
+
+    for position, (chat_id, raw_string_jid) in enumerate(chats):
+        # skip messages whose chat_row_id has no chat, and those left unread by the consumer of the previous chat
+        while row is not None and positions.get(row[2], -1) < position:
+            row = next(rows, None)
+
+        if columnar:
+            yield assemble_chat(
+                contacts,
+                chat_id,
+                raw_string_jid,
+                MessageBatch.from_rows(contacts, chat_rows(chat_id)),
+                group_participant_jids.get(raw_string_jid, []),
+            )
+        elif stream:
+            yield assemble_chat_stream(
+                contacts,
+                chat_id,
+                raw_string_jid,
+                chat_messages(chat_id),
+                group_participant_jids.get(raw_string_jid, []),
+                sender_jids.get(chat_id, []),
+                quoted_key_ids.get(chat_id, set()),
+            )
+        else:
+            yield assemble_chat(
+                contacts, chat_id, raw_string_jid, list(chat_messages(chat_id)), group_participant_jids.get(raw_string_jid, [])
+            )
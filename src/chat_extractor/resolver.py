@@ -1,8 +1,9 @@
 import sqlite3
+from collections import defaultdict
 from itertools import chain
-from typing import Any, Dict, Tuple, Union, List
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
 
-from src.models import Contact
+from src.phone_number_index import PhoneNumberIndex
 
 
 def media_resolver(msgdb_cursor: sqlite3.Cursor, message_row_id: int) -> Dict[str, Any] | None:
@@ -53,6 +54,271 @@ def geo_position_resolver(
     return res
 
 
+# Source of the message queries, either all messages or the messages of the chats selected by
+# `filtered_chats_resolver`. The filter is the outer loop, so the messages of every chat are read in filter order with
+# the (chat_row_id, sort_id) index, instead of scanning all messages and sorting the matches.
+ALL_MESSAGES = """
+    FROM        'message'
+"""
+FILTERED_MESSAGES = """
+    FROM        temp.filtered_chat
+    CROSS JOIN  'message' ON message.chat_row_id=filtered_chat.chat_id
+"""
+
+MESSAGE_ROWS_COLUMNS = """
+    SELECT      message._id as message_id, message.key_id, message.chat_row_id as chat_id, message.from_me,
+                COALESCE(sender_jid.raw_string, chat_jid.raw_string) as raw_string_jid,
+                (CASE WHEN message.received_timestamp=0 THEN message.timestamp ELSE message.received_timestamp END) as timestamp,
+                message.text_data, message_quoted.key_id as reply_to,
+                message_media.message_row_id as media_message_id, message_media.media_job_uuid, message_media.file_path, message_media.mime_type,
+                message_location.message_row_id as geo_position_message_id, message_location.latitude, message_location.longitude
+"""
+MESSAGE_ROWS_JOINS = """
+    LEFT JOIN   'message_quoted' ON message._id=message_quoted.message_row_id
+    LEFT JOIN   'message_media' ON message._id=message_media.message_row_id
+    LEFT JOIN   'message_location' ON message._id=message_location.message_row_id
+    LEFT JOIN   'jid' AS sender_jid ON message.sender_jid_row_id=sender_jid._id
+    LEFT JOIN   'chat' ON message.chat_row_id=chat._id
+    LEFT JOIN   'jid' AS chat_jid ON chat.jid_row_id=chat_jid._id
+"""
+MESSAGE_ROWS_QUERY = MESSAGE_ROWS_COLUMNS + ALL_MESSAGES + MESSAGE_ROWS_JOINS
+
+
+def chat_messages_resolver(
+    msgdb_cursor: sqlite3.Cursor, chat_row_id: int
+) -> sqlite3.Cursor:
+    """Fetch message, media, location and quoted data of every message in a given chat_row_id with a single query.
+
+    The rows are streamed from a dedicated cursor, so `msgdb_cursor` stays free for other queries while they are consumed.
+
+    Args:
+        msgdb_cursor (sqlite3.Cursor): 'msgdb' cursor.
+        chat_row_id (int): ID of the chat for which message data is retrieved.
+
+    Returns:
+        sqlite3.Cursor: Cursor over the rows of `MESSAGE_ROWS_QUERY`, ordered the way the chat is displayed.
+    """
+    query = (
+        MESSAGE_ROWS_QUERY
+        + """
+    WHERE       message.chat_row_id=?
+    ORDER BY    message.sort_id, message._id
+    """
+    )
+    return msgdb_cursor.connection.cursor().execute(query, (chat_row_id,))
+
+
+def chat_messages_after_resolver(
+    msgdb_cursor: sqlite3.Cursor, chat_row_id: int, message_row_id: int
+) -> sqlite3.Cursor:
+    """Fetch the messages of a given chat_row_id whose message._id is greater than a given one.
+
+    Args:
+        msgdb_cursor (sqlite3.Cursor): 'msgdb' cursor.
+        chat_row_id (int): ID of the chat for which message data is retrieved.
+        message_row_id (int): Only messages after this message._id are fetched.
+
+    Returns:
+        sqlite3.Cursor: Cursor over the rows of `MESSAGE_ROWS_QUERY`, ordered the way the chat is displayed.
+    """
+    # the unary + keeps SQLite from reading the _id range with the (chat_row_id, _id) index and sorting the rows in a
+    # temporary B-tree, so they are read in order with the (chat_row_id, sort_id) index instead
+    query = (
+        MESSAGE_ROWS_QUERY
+        + """
+    WHERE       message.chat_row_id=? AND +message._id>?
+    ORDER BY    message.sort_id, message._id
+    """
+    )
+    return msgdb_cursor.connection.cursor().execute(query, (chat_row_id, message_row_id))
+
+
+def chat_messages_by_key_ids_resolver(
+    msgdb_cursor: sqlite3.Cursor, chat_row_id: int, key_ids: List[str], message_row_id: int
+) -> List[tuple]:
+    """Fetch the messages of a given chat_row_id with the given key_ids, up to a given message._id.
+
+    Args:
+        msgdb_cursor (sqlite3.Cursor): 'msgdb' cursor.
+        chat_row_id (int): ID of the chat for which message data is retrieved.
+        key_ids (List[str]): Key IDs of the messages.
+        message_row_id (int): Only messages up to this message._id are fetched.
+
+    Returns:
+        List[tuple]: Rows of `MESSAGE_ROWS_QUERY`, ordered the way the chat is displayed.
+    """
+    if not key_ids:
+        return []
+    # read in order with the (chat_row_id, sort_id) index, see `chat_messages_after_resolver`
+    query = (
+        MESSAGE_ROWS_QUERY
+        + f"""
+    WHERE       message.chat_row_id=? AND +message._id<=? AND message.key_id IN ({", ".join("?" * len(key_ids))})
+    ORDER BY    message.sort_id, message._id
+    """
+    )
+    return msgdb_cursor.execute(query, (chat_row_id, message_row_id, *key_ids)).fetchall()
+
+
+def chat_delta_bounds_resolver(
+    msgdb_cursor: sqlite3.Cursor, chat_row_id: int, message_row_id: int
+) -> Tuple[int, Optional[int], Optional[int]]:
+    """Check how the messages of a given chat_row_id after a given message._id relate to the ones up to it.
+
+    Args:
+        msgdb_cursor (sqlite3.Cursor): 'msgdb' cursor.
+        chat_row_id (int): ID of the chat.
+        message_row_id (int): Last message._id of the earlier messages.
+
+    Returns:
+        Tuple[int, Optional[int], Optional[int]]: Number of messages up to `message_row_id`, their highest sort_id
+            and the lowest sort_id of the messages after it. A NULL sort_id counts as the lowest integer, the way it
+            is ordered, and the sort_ids are None without such messages.
+    """
+    msgdb_query = """
+    SELECT  COALESCE(SUM(message._id<=?), 0),
+            MAX(CASE WHEN message._id<=? THEN IFNULL(message.sort_id, -9223372036854775807 - 1) END),
+            MIN(CASE WHEN message._id>? THEN IFNULL(message.sort_id, -9223372036854775807 - 1) END)
+    FROM    'message'
+    WHERE   message.chat_row_id=?
+    """
+    return msgdb_cursor.execute(msgdb_query, (message_row_id, message_row_id, message_row_id, chat_row_id)).fetchone()
+
+
+def all_chat_messages_resolver(msgdb_cursor: sqlite3.Cursor, filtered: bool = False) -> sqlite3.Cursor:
+    """Fetch message, media, location and quoted data of every message in the msgdb with a single scan.
+
+    The rows are streamed from a dedicated cursor, grouped by chat, so they can be split into chats while they are consumed.
+
+    Args:
+        msgdb_cursor (sqlite3.Cursor): 'msgdb' cursor.
+        filtered (bool): Only fetch the messages of the chats in `temp.filtered_chat`, see `filtered_chats_resolver`.
+            Defaults to False.
+
+    Returns:
+        sqlite3.Cursor: Cursor over the rows of `MESSAGE_ROWS_QUERY`, ordered by 'chat_id' (or by the position of the chat
+            in the filter) and then the way each chat is displayed.
+    """
+    if filtered:
+        query = (
+            MESSAGE_ROWS_COLUMNS
+            + FILTERED_MESSAGES
+            + MESSAGE_ROWS_JOINS
+            + """
+    ORDER BY    filtered_chat.position, message.sort_id, message._id
+    """
+        )
+    else:
+        query = (
+            MESSAGE_ROWS_QUERY
+            + """
+    ORDER BY    message.chat_row_id, message.sort_id, message._id
+    """
+        )
+    return msgdb_cursor.connection.cursor().execute(query)
+
+
+SENDER_JIDS_COLUMNS = """
+    SELECT      message.chat_row_id as chat_id, COALESCE(sender_jid.raw_string, chat_jid.raw_string) as raw_string_jid
+"""
+SENDER_JIDS_JOINS = """
+    LEFT JOIN   'jid' AS sender_jid ON message.sender_jid_row_id=sender_jid._id
+    LEFT JOIN   'chat' ON message.chat_row_id=chat._id
+    LEFT JOIN   'jid' AS chat_jid ON chat.jid_row_id=chat_jid._id
+"""
+SENDER_JIDS_QUERY = SENDER_JIDS_COLUMNS + ALL_MESSAGES + SENDER_JIDS_JOINS
+
+QUOTED_KEY_IDS_COLUMNS = """
+    SELECT      message.chat_row_id as chat_id, message_quoted.key_id
+"""
+QUOTED_KEY_IDS_JOINS = """
+    JOIN        'message_quoted' ON message._id=message_quoted.message_row_id
+"""
+QUOTED_KEY_IDS_QUERY = QUOTED_KEY_IDS_COLUMNS + ALL_MESSAGES + QUOTED_KEY_IDS_JOINS
+
+
+def chat_sender_jids_resolver(msgdb_cursor: sqlite3.Cursor, chat_row_id: int) -> List[str]:
+    """Fetch the jids of everyone who sent a message to a given chat_row_id, without loading the messages.
+
+    Args:
+        msgdb_cursor (sqlite3.Cursor): 'msgdb' cursor.
+        chat_row_id (int): ID of the chat for which the senders are retrieved.
+
+    Returns:
+        List[str]: Sorted, unique 'raw_string_jid' of the senders of all messages that are not from me.
+    """
+    query = (
+        SENDER_JIDS_QUERY
+        + """
+    WHERE       message.chat_row_id=? AND message.from_me=0
+    """
+    )
+    execution = msgdb_cursor.execute(query, (chat_row_id,))
+    return sorted({raw_string_jid for _, raw_string_jid in execution if raw_string_jid})
+
+
+def all_chat_sender_jids_resolver(msgdb_cursor: sqlite3.Cursor, filtered: bool = False) -> Dict[int, List[str]]:
+    """Fetch the jids of everyone who sent a message, for every chat in the msgdb with a single scan.
+
+    Args:
+        msgdb_cursor (sqlite3.Cursor): 'msgdb' cursor.
+        filtered (bool): Only fetch the senders of the chats in `temp.filtered_chat`. Defaults to False.
+
+    Returns:
+        Dict[int, List[str]]: Sorted, unique 'raw_string_jid' of the senders with 'chat_id' as key.
+    """
+    query = (
+        SENDER_JIDS_COLUMNS
+        + (FILTERED_MESSAGES if filtered else ALL_MESSAGES)
+        + SENDER_JIDS_JOINS
+        + """
+    WHERE       message.from_me=0
+    """
+    )
+    sender_jids = defaultdict(set)
+    for chat_id, raw_string_jid in msgdb_cursor.execute(query):
+        if raw_string_jid:
+            sender_jids[chat_id].add(raw_string_jid)
+    return {chat_id: sorted(jids) for chat_id, jids in sender_jids.items()}
+
+
+def chat_quoted_key_ids_resolver(msgdb_cursor: sqlite3.Cursor, chat_row_id: int) -> Set[str]:
+    """Fetch the key_id of every message that is replied to in a given chat_row_id.
+
+    Args:
+        msgdb_cursor (sqlite3.Cursor): 'msgdb' cursor.
+        chat_row_id (int): ID of the chat for which the quoted key_ids are retrieved.
+
+    Returns:
+        Set[str]: 'message_quoted.key_id' of the replies in the chat.
+    """
+    query = (
+        QUOTED_KEY_IDS_QUERY
+        + """
+    WHERE       message.chat_row_id=?
+    """
+    )
+    execution = msgdb_cursor.execute(query, (chat_row_id,))
+    return {key_id for _, key_id in execution}
+
+
+def all_chat_quoted_key_ids_resolver(msgdb_cursor: sqlite3.Cursor, filtered: bool = False) -> Dict[int, Set[str]]:
+    """Fetch the key_id of every message that is replied to, for every chat in the msgdb.
+
+    Args:
+        msgdb_cursor (sqlite3.Cursor): 'msgdb' cursor.
+        filtered (bool): Only fetch the key IDs of the chats in `temp.filtered_chat`. Defaults to False.
+
+    Returns:
+        Dict[int, Set[str]]: 'message_quoted.key_id' of the replies with 'chat_id' as key.
+    """
+    query = QUOTED_KEY_IDS_COLUMNS + (FILTERED_MESSAGES if filtered else ALL_MESSAGES) + QUOTED_KEY_IDS_JOINS
+    quoted_key_ids = defaultdict(set)
+    for chat_id, key_id in msgdb_cursor.execute(query):
+        quoted_key_ids[chat_id].add(key_id)
+    return dict(quoted_key_ids)
+
+
 def message_resolver(
     msgdb_cursor: sqlite3.Cursor, message_row_id: int
 ) -> Tuple[Dict[str, Any], str]:
@@ -66,11 +332,15 @@ def message_resolver(
         Dict[str, Any]: Dictionary containing 'message_id', 'key_id', 'chat_id', 'from_me', 'raw_string_jid', 'timestamp', 'text_data' and 'message_quoted.key_id' keys.
         str: 'raw_string_jid' of the person who sent the message
     """
+    # The sender jid is used for group messages and the chat's jid otherwise. Both are resolved with
+    # primary key lookups instead of an OR join, which made SQLite scan jid x chat for every message.
     query = """
-    SELECT message._id as message_id, message.key_id, message.chat_row_id as chat_id, message.from_me, jid.raw_string as raw_string_jid, (CASE WHEN message.received_timestamp=0 THEN message.timestamp ELSE message.received_timestamp END) as timestamp, message.text_data, message_quoted.key_id as reply_to
+    SELECT message._id as message_id, message.key_id, message.chat_row_id as chat_id, message.from_me, COALESCE(sender_jid.raw_string, chat_jid.raw_string) as raw_string_jid, (CASE WHEN message.received_timestamp=0 THEN message.timestamp ELSE message.received_timestamp END) as timestamp, message.text_data, message_quoted.key_id as reply_to
     FROM 'message'
     LEFT JOIN 'message_quoted' ON message._id=message_quoted.message_row_id
-    JOIN 'jid', 'chat' ON message.sender_jid_row_id=jid._id OR message.chat_row_id=chat._id AND chat.jid_row_id=jid._id
+    LEFT JOIN 'jid' AS sender_jid ON message.sender_jid_row_id=sender_jid._id
+    LEFT JOIN 'chat' ON message.chat_row_id=chat._id
+    LEFT JOIN 'jid' AS chat_jid ON chat.jid_row_id=chat_jid._id
     WHERE message._id=?
     """
 
@@ -90,6 +360,7 @@ def chat_resolver(
     msgdb_cursor: sqlite3.Cursor,
     chat_row_id: Union[int, None] = None,
     phone_number: Union[str, None] = None,
+    phone_number_index: Union[PhoneNumberIndex, None] = None,
 ) -> Tuple[Dict[str, Any], str]:
     """Fetch chat data for a given chat_row_id from the msgdb.
 
@@ -97,6 +368,8 @@ def chat_resolver(
         msgdb_cursor (sqlite3.Cursor): 'msgdb' cursor.
         chat_row_id (Union[int, None]): ID of the chat for which chat data is retrieved. Defaults to None.
         phone_number (Union[str, None]): Phone number of the chat for which chat data is retrieved. Defaults to None.
+        phone_number_index (Union[PhoneNumberIndex, None]): Index used to look up `phone_number` instead of a
+            `LIKE` scan of `jid`. Defaults to None.
 
     Returns:
         Dict[str, Any]: Dictionary containing 'chat_id' as key.
@@ -110,6 +383,22 @@ def chat_resolver(
         WHERE chat._id=?
         """
         execution = msgdb_cursor.execute(msgdb_query, (chat_row_id,))
+    elif phone_number and phone_number_index:
+        msgdb_query = """
+        SELECT chat._id as chat_id, jid.raw_string as raw_string_jid
+        FROM 'chat'
+        JOIN 'jid' ON chat.jid_row_id=jid._id
+        WHERE chat.jid_row_id=?
+        """
+        # the first of the matching jids that has a chat
+        for jid_row_id in phone_number_index.jid_row_ids(phone_number):
+            execution = msgdb_cursor.execute(msgdb_query, (jid_row_id,))
+            res_query = execution.fetchone()
+            if res_query is not None:
+                res = dict(zip([col[0] for col in execution.description], res_query))
+                raw_string_jid = res.pop("raw_string_jid")
+                return res, raw_string_jid
+        return {"chat_id": None}, None
     elif phone_number:
         msgdb_query = """
         SELECT chat._id as chat_id, jid.raw_string as raw_string_jid
@@ -132,9 +421,44 @@ def chat_resolver(
     return res, raw_string_jid
 
 
+def filtered_chats_resolver(msgdb_cursor: sqlite3.Cursor) -> List[Tuple[int, str]]:
+    """Fetch the chats of the phone numbers in `temp.phone_number_filter` with a single query.
+
+    Every phone number selects the chat of its first matching jid that has one, see `PhoneNumberIndex.load_filter`.
+    The selected chats are stored in the temporary table `filtered_chat`, ordered like the filter, so the messages,
+    senders and quoted key IDs of all of them can be fetched with one query each.
+
+    Args:
+        msgdb_cursor (sqlite3.Cursor): 'msgdb' cursor.
+
+    Returns:
+        List[Tuple[int, str]]: ('chat_id', 'raw_string_jid') pairs in the order of the filter, without duplicates.
+            Phone numbers without a chat are left out.
+    """
+    msgdb_query = """
+    SELECT phone_number_filter.position, chat._id as chat_id, jid.raw_string as raw_string_jid
+    FROM temp.phone_number_filter
+    JOIN 'chat' ON chat.jid_row_id=phone_number_filter.jid_row_id
+    JOIN 'jid' ON chat.jid_row_id=jid._id
+    ORDER BY phone_number_filter.position, phone_number_filter.rank
+    """
+    chats = {}
+    position = None
+    for row_position, chat_id, raw_string_jid in msgdb_cursor.execute(msgdb_query).fetchall():
+        # only the first matching jid of every phone number
+        if row_position != position:
+            position = row_position
+            chats.setdefault(chat_id, raw_string_jid)
+
+    msgdb_cursor.execute("DROP TABLE IF EXISTS temp.filtered_chat")
+    msgdb_cursor.execute("CREATE TEMP TABLE filtered_chat (position INTEGER PRIMARY KEY, chat_id INTEGER UNIQUE)")
+    msgdb_cursor.executemany("INSERT INTO temp.filtered_chat VALUES (?, ?)", enumerate(chats))
+    return list(chats.items())
+
+
 def group_chat_participant_jid_resolver(
         msgdb_cursor: sqlite3.Cursor, chat_jid_raw_string: str
-) -> List[Contact]:
+) -> List[str]:
     # Define the query
     msgdb_query = """
         SELECT	jid
@@ -144,8 +468,8 @@ def group_chat_participant_jid_resolver(
                 group_participants.jid != ''
                 AND
                 group_participants.gjid = ?
-        UNION
-        
+        UNION ALL
+
         SELECT	jid
         FROM	group_participants_history
         WHERE	group_participants_history.jid is not NULL
@@ -158,5 +482,126 @@ def group_chat_participant_jid_resolver(
     # Execute the query using the existing cursor
     execution = msgdb_cursor.execute(msgdb_query, (chat_jid_raw_string, chat_jid_raw_string))
 
-    # Fetch all rows
-    return list(chain.from_iterable(execution.fetchall()))
+    # Fetch all rows, de-duplicated and sorted here instead of in a temporary B-tree for every chat
+    return sorted(set(chain.from_iterable(execution.fetchall())))
+
+
+def all_chats_resolver(msgdb_cursor: sqlite3.Cursor) -> List[Tuple[int, str]]:
+    """Fetch 'chat_id' and 'raw_string_jid' of every chat in the msgdb.
+
+    Args:
+        msgdb_cursor (sqlite3.Cursor): 'msgdb' cursor.
+
+    Returns:
+        List[Tuple[int, str]]: ('chat_id', 'raw_string_jid') pairs ordered by 'chat_id'.
+    """
+    msgdb_query = """
+    SELECT chat._id as chat_id, jid.raw_string as raw_string_jid
+    FROM 'chat'
+    JOIN 'jid' ON chat.jid_row_id=jid._id
+    ORDER BY chat._id
+    """
+    execution = msgdb_cursor.execute(msgdb_query)
+    return execution.fetchall()
+
+
+def chat_ids_filter_resolver(msgdb_cursor: sqlite3.Cursor, chat_ids: List[int]) -> List[Tuple[int, str]]:
+    """Load the given chats into the temporary table `filtered_chat`, the same one `filtered_chats_resolver` fills.
+
+    Args:
+        msgdb_cursor (sqlite3.Cursor): 'msgdb' cursor.
+        chat_ids (List[int]): IDs of the chats, in the order they are scanned.
+
+    Returns:
+        List[Tuple[int, str]]: ('chat_id', 'raw_string_jid') pairs in the given order, without duplicates. IDs without
+            a chat are left out.
+    """
+    msgdb_cursor.execute("DROP TABLE IF EXISTS temp.filtered_chat")
+    msgdb_cursor.execute("CREATE TEMP TABLE filtered_chat (position INTEGER PRIMARY KEY, chat_id INTEGER UNIQUE)")
+    msgdb_cursor.executemany(
+        "INSERT OR IGNORE INTO temp.filtered_chat (chat_id) VALUES (?)", ((chat_id,) for chat_id in chat_ids)
+    )
+    msgdb_query = """
+    SELECT chat._id as chat_id, jid.raw_string as raw_string_jid
+    FROM temp.filtered_chat
+    JOIN 'chat' ON chat._id=filtered_chat.chat_id
+    JOIN 'jid' ON chat.jid_row_id=jid._id
+    ORDER BY filtered_chat.position
+    """
+    return msgdb_cursor.execute(msgdb_query).fetchall()
+
+
+def all_chat_message_counts_resolver(msgdb_cursor: sqlite3.Cursor) -> List[Tuple[int, int]]:
+    """Fetch the number of messages of every chat in the msgdb.
+
+    Args:
+        msgdb_cursor (sqlite3.Cursor): 'msgdb' cursor.
+
+    Returns:
+        List[Tuple[int, int]]: ('chat_id', message count) pairs, largest chat first.
+    """
+    msgdb_query = """
+    SELECT chat._id as chat_id, COUNT(message._id) as message_count
+    FROM 'chat'
+    JOIN 'jid' ON chat.jid_row_id=jid._id
+    LEFT JOIN 'message' ON message.chat_row_id=chat._id
+    GROUP BY chat._id
+    """
+    execution = msgdb_cursor.execute(msgdb_query)
+    # sorted here, the aggregate is tiny compared to the scan
+    return sorted(execution.fetchall(), key=lambda row: (-row[1], row[0]))
+
+
+def all_chat_watermarks_resolver(msgdb_cursor: sqlite3.Cursor) -> List[Tuple[int, Optional[int], int]]:
+    """Fetch the highest message ID and the number of messages of every chat in the msgdb with a single aggregate.
+
+    Args:
+        msgdb_cursor (sqlite3.Cursor): 'msgdb' cursor.
+
+    Returns:
+        List[Tuple[int, Optional[int], int]]: ('chat_id', max message ID, message count) rows ordered by 'chat_id'.
+            The max message ID of a chat without messages is None.
+    """
+    msgdb_query = """
+    SELECT chat._id as chat_id, MAX(message._id) as max_message_id, COUNT(message._id) as message_count
+    FROM 'chat'
+    JOIN 'jid' ON chat.jid_row_id=jid._id
+    LEFT JOIN 'message' ON message.chat_row_id=chat._id
+    GROUP BY chat._id
+    ORDER BY chat._id
+    """
+    return msgdb_cursor.execute(msgdb_query).fetchall()
+
+
+def all_group_chat_participant_jids_resolver(
+        msgdb_cursor: sqlite3.Cursor
+) -> Dict[str, List[str]]:
+    """Fetch the participant jids of every group chat in the msgdb with a single query.
+
+    Args:
+        msgdb_cursor (sqlite3.Cursor): 'msgdb' cursor.
+
+    Returns:
+        Dict[str, List[str]]: Participant jids with the group's 'raw_string_jid' as key.
+    """
+    msgdb_query = """
+        SELECT  gjid, jid
+        FROM    (
+                    SELECT	gjid, jid
+                    FROM	group_participants
+                    WHERE	group_participants.jid is not NULL
+                            AND
+                            group_participants.jid != ''
+                    UNION
+
+                    SELECT	gjid, jid
+                    FROM	group_participants_history
+                    WHERE	group_participants_history.jid is not NULL
+                            AND
+                            group_participants_history.jid != ''
+                )
+    """
+    participant_jids = defaultdict(list)
+    for gjid, jid in msgdb_cursor.execute(msgdb_query):
+        participant_jids[gjid].append(jid)
+    return {gjid: sorted(jids) for gjid, jids in participant_jids.items()}
@@ -1,4 +1,6 @@
-from typing import Dict, List
+import sys
+from collections.abc import Mapping
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 from src.models import Contact
 
@@ -15,6 +17,8 @@ def contact_resolver(
     Returns:
         Contact or None
     """
+    if isinstance(contacts, ContactDirectory):
+        return contacts.resolve(raw_string_jid)
     contact = contacts.get(raw_string_jid)
     if contact:
         # use the last contact
@@ -40,3 +44,97 @@ def contact_to_full_str(contact: Contact) -> str:
         return f"{contact.number} ({contact.raw_string_jid})"
     else:
         return contact.raw_string_jid
+
+
+def intern_str(value: Optional[str]) -> Optional[str]:
+    """Intern a string, so equal strings share a single object."""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def sorted_call_results(call_results: Dict[Optional[int], int]) -> List[Tuple[Optional[int], int]]:
+    """Sort the call counts of a `CallLogSummary` by call result, with the calls without a call result last."""
+    return sorted(call_results.items(), key=lambda item: (item[0] is None, item[0] or 0))
+
+
+class ContactDirectory(Mapping):
+    """All contacts of the wa.db, with one canonical Contact per jid and precomputed renderings.
+
+    It can be used wherever a `Dict[str, List[Contact]]` of all contacts and jid as key is expected. The jid, name and
+    number strings are interned, and `resolve` returns the same Contact object for every lookup of a jid, including
+    the jids that are not in the wa.db, so resolving the sender of every message doesn't allocate a Contact each
+    time. `contact_to_str` and `contact_to_full_str` of the canonical contacts are rendered only once.
+
+    Args:
+        contacts (Dict[str, List[Contact]]): Dict of all contacts and jid as key.
+    """
+
+    def __init__(self, contacts: Dict[str, List[Contact]]) -> None:
+        self.contacts = contacts
+        # canonical contact of every jid that has been resolved, including unknown jids
+        self.canonical_contacts: Dict[str, Contact] = {}
+        # (contact, contact_to_str, contact_to_full_str) of every canonical contact, by jid
+        self.renderings: Dict[str, Tuple[Contact, str, str]] = {}
+        for raw_string_jid in contacts:
+            self.resolve(raw_string_jid)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[str, Optional[str], Optional[str]]]) -> "ContactDirectory":
+        """Build the directory from ('jid', 'number', 'display_name') rows of `wa_contacts`.
+
+        Args:
+            rows (Iterable[Tuple[str, Optional[str], Optional[str]]]): Rows of the contacts.
+
+        Returns:
+            ContactDirectory: Directory of the contacts.
+        """
+        contacts = {}
+        for jid, number, display_name in rows:
+            jid = intern_str(jid)
+            contacts.setdefault(jid, []).append(
+                Contact(raw_string_jid=jid, name=intern_str(display_name), number=intern_str(number))
+            )
+        return cls(contacts)
+
+    def __getitem__(self, raw_string_jid: str) -> List[Contact]:
+        return self.contacts[raw_string_jid]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.contacts)
+
+    def __len__(self) -> int:
+        return len(self.contacts)
+
+    def resolve(self, raw_string_jid: str) -> Contact:
+        """Get the canonical contact of a jid, the same way `contact_resolver` does.
+
+        Args:
+            raw_string_jid (str): JID of the person who for which contact data is retrieved
+
+        Returns:
+            Contact: The last contact of the jid in the wa.db, or a contact with just the jid.
+        """
+        contact = self.canonical_contacts.get(raw_string_jid)
+        if contact is None:
+            contact_list = self.contacts.get(raw_string_jid)
+            if contact_list:
+                # use the last contact
+                contact = contact_list[-1]
+            else:
+                contact = Contact(raw_string_jid=intern_str(raw_string_jid), name=None, number=None)
+            self.canonical_contacts[raw_string_jid] = contact
+            self.renderings[raw_string_jid] = (contact, contact_to_str(contact), contact_to_full_str(contact))
+        return contact
+
+    def contact_to_str(self, contact: Contact) -> str:
+        """`contact_to_str`, precomputed for the canonical contacts."""
+        rendering = self.renderings.get(contact.raw_string_jid)
+        if rendering is not None and rendering[0] is contact:
+            return rendering[1]
+        return contact_to_str(contact)
+
+    def contact_to_full_str(self, contact: Contact) -> str:
+        """`contact_to_full_str`, precomputed for the canonical contacts."""
+        rendering = self.renderings.get(contact.raw_string_jid)
+        if rendering is not None and rendering[0] is contact:
+            return rendering[2]
+        return contact_to_full_str(contact)
@@ -0,0 +1,90 @@
+import marshal
+import os
+import sqlite3
+import tempfile
+from typing import Any, Dict, List, Optional, Tuple
+
+from .common import ContactDirectory
+from .contact_extractor.builder import CONTACTS_QUERY
+from .msgdb_cache import database_fingerprint, is_same_database, without_stat
+
+# Version of the cache file layout, a cache file with another version is rebuilt.
+CONTACTS_CACHE_VERSION = 1
+
+
+def read_contacts_cache(cache_path: str) -> Optional[Tuple[Dict[str, Any], List[Tuple[str, Any, Any]]]]:
+    """Read a contacts cache file.
+
+    Args:
+        cache_path (str): Path of the cache file.
+
+    Returns:
+        Optional[Tuple[Dict[str, Any], List[Tuple[str, Any, Any]]]]: The fingerprint of the wa.db the
+            cache was built from and its ('jid', 'number', 'display_name') rows, or None if the file is missing,
+            unreadable or of another version.
+    """
+    try:
+        with open(cache_path, "rb") as file:
+            version, fingerprint, rows = marshal.load(file)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if version != CONTACTS_CACHE_VERSION:
+        return None
+    return fingerprint, rows
+
+
+def write_contacts_cache(cache_path: str, fingerprint: Dict[str, Any], rows: List[Tuple[str, Any, Any]]) -> None:
+    """Write a contacts cache file through a scratch file that is renamed into place.
+
+    Args:
+        cache_path (str): Path of the cache file.
+        fingerprint (Dict[str, Any]): Fingerprint of the wa.db, as returned by `database_fingerprint`.
+        rows (List[Tuple[str, Any, Any]]): ('jid', 'number', 'display_name') rows of `wa_contacts`.
+    """
+    scratch_fd, scratch_path = tempfile.mkstemp(dir=os.path.dirname(cache_path), suffix=".contacts")
+    try:
+        with os.fdopen(scratch_fd, "wb") as file:
+            marshal.dump((CONTACTS_CACHE_VERSION, fingerprint, rows), file)
+        os.replace(scratch_path, cache_path)
+    finally:
+        if os.path.exists(scratch_path):
+            os.remove(scratch_path)
+
+
+def cached_contacts(wadb_path: str, cache_dir: str) -> ContactDirectory:
+    """Return the contacts of the wa.db, from the cache in `cache_dir` if it was built from the same file.
+
+    The rows of `wa_contacts` are kept in a marshal file together with the fingerprint of the wa.db and its
+    write-ahead log, so a cache hit doesn't open the wa.db at all. The cache is used while their size and mtime are
+    unchanged; if they changed, the content hashes decide whether the cache is still valid, and the cache is rebuilt
+    otherwise.
+
+    Args:
+        wadb_path (str): Path to 'wa.db' file.
+        cache_dir (str): Directory in which the cache is kept.
+
+    Returns:
+        ContactDirectory: Directory of all contacts, the same as `build_all_contacts` returns.
+    """
+    if not os.path.exists(cache_dir):
+        os.makedirs(cache_dir)
+    base_name = os.path.splitext(os.path.basename(wadb_path))[0]
+    cache_path = os.path.join(cache_dir, f"{base_name}.contacts")
+
+    cache = read_contacts_cache(cache_path)
+    fingerprint = database_fingerprint(wadb_path, with_hash=False)
+    if cache and is_same_database(cache[0], fingerprint):
+        return ContactDirectory.from_rows(cache[1])
+
+    fingerprint = database_fingerprint(wadb_path)
+    if cache and without_stat(cache[0]) == without_stat(fingerprint):
+        # the file was touched, but its content is the same
+        rows = cache[1]
+    else:
+        wadb = sqlite3.connect(f"file:{wadb_path}?mode=ro", uri=True)
+        try:
+            rows = wadb.execute(CONTACTS_QUERY).fetchall()
+        finally:
+            wadb.close()
+    write_contacts_cache(cache_path, fingerprint, rows)
+    return ContactDirectory.from_rows(rows)
@@ -0,0 +1,194 @@
+import json
+import os
+import tempfile
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Version of the manifest layout, a manifest with another version is discarded.
+EXPORT_MANIFEST_VERSION = 1
+
+# (max message or call ID, message or call count) of a chat or call log.
+Watermark = Tuple[Optional[int], int]
+
+# Settings that change the bytes written for the same text, the stored files are discarded when they changed.
+FILE_SETTINGS = ("compression", "compression_level")
+
+
+class ExportManifest(object):
+    """Record of the chats and call logs in an output directory, to export only those that changed since the last run.
+
+    For every chat and call log the manifest keeps its watermark, the highest message or call `_id` and the number
+    of rows, together with the hash of every file written for it. A chat or call log whose watermark is unchanged
+    and whose files still exist is skipped. Messages and calls are only ever appended to the msgdb, so a new row
+    moves the highest `_id` and a deleted one the count. All entries are discarded when the `settings` of the export
+    changed, e.g. the output style or the contacts of the wa.db, which change every file.
+
+    Besides, the manifest stores the hash of the text of every file it recorded, with the size and mtime of the file
+    after the run, for `UnchangedFileSkipper`. Those are only discarded when the compression changed, since a file
+    with the same text is the same file whatever else changed.
+
+    Args:
+        output_dir (str): Output directory, the paths of the files are stored relative to it.
+        settings (Dict[str, Any]): Everything besides the watermarks that the exported files depend on.
+        extension (str): Extension the output opener appends to every file, e.g. of its compression. Defaults to ''.
+    """
+
+    def __init__(self, output_dir: str, settings: Dict[str, Any], extension: str = "") -> None:
+        self.output_dir = output_dir
+        self.settings = settings
+        self.extension = extension
+        self.entries: Dict[str, Dict[str, Dict[str, Any]]] = {"chats": {}, "call_logs": {}}
+        # watermarks of the chats and call logs that are exported in this run, by kind and ID
+        self.pending: Dict[str, Dict[int, Watermark]] = {"chats": {}, "call_logs": {}}
+        # [hash of the text, size, mtime_ns] of the files, and the hashes of those written in this run, by path
+        self.files: Dict[str, List[Any]] = {}
+        self.written: Dict[str, str] = {}
+
+    @classmethod
+    def load(cls, manifest_path: str, settings: Dict[str, Any], extension: str = "") -> "ExportManifest":
+        """Read the manifest of an output directory, keeping its entries only if they were exported with `settings`.
+
+        Args:
+            manifest_path (str): Path of the manifest file, in the output directory.
+            settings (Dict[str, Any]): Settings of this export, JSON serialisable.
+            extension (str): Extension the output opener appends to every file. Defaults to ''.
+
+        Returns:
+            ExportManifest: The manifest, without entries if the file is missing, unreadable or outdated.
+        """
+        manifest = cls(os.path.dirname(manifest_path), settings, extension)
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return manifest
+        if data.get("version") != EXPORT_MANIFEST_VERSION or not isinstance(data.get("settings"), dict):
+            return manifest
+        # the settings are compared the way they are stored
+        stored_settings = json.loads(json.dumps(settings))
+        if data["settings"] == stored_settings:
+            manifest.entries = {kind: data.get(kind, {}) for kind in manifest.entries}
+        if all(data["settings"].get(setting) == stored_settings.get(setting) for setting in FILE_SETTINGS):
+            manifest.files = data.get("files", {})
+        return manifest
+
+    def is_unchanged(self, kind: str, row_id: int, watermark: Watermark) -> bool:
+        """Check whether a chat or call log has the same watermark as when its files were written, and they exist.
+
+        Args:
+            kind (str): Either 'chats' or 'call_logs'.
+            row_id (int): ID of the chat or jid of the call log.
+            watermark (Watermark): Current (max ID, count) of the chat or call log.
+
+        Returns:
+            bool: True if the chat or call log can be skipped.
+        """
+        entry = self.entries[kind].get(str(row_id))
+        if entry is None or [entry["max_id"], entry["count"]] != list(watermark):
+            return False
+        return all(
+            os.path.exists(os.path.join(self.output_dir, file_path) + self.extension) for file_path in entry["files"]
+        )
+
+    def stale(self, kind: str, row_ids: Iterable[int], watermarks: Dict[int, Watermark]) -> List[int]:
+        """Select the chats or call logs that have to be exported and remember their watermarks for `record`.
+
+        Args:
+            kind (str): Either 'chats' or 'call_logs'.
+            row_ids (Iterable[int]): IDs of the chats or jids of the call logs to export, in export order.
+            watermarks (Dict[int, Watermark]): Current (max ID, count) of every chat or call log, from a single
+                aggregate query. IDs without a watermark have no rows and are left out.
+
+        Returns:
+            List[int]: IDs of the changed chats or call logs, in the given order, without duplicates.
+        """
+        stale_ids = []
+        for row_id in row_ids:
+            watermark = watermarks.get(row_id)
+            if watermark is None or row_id in self.pending[kind]:
+                continue
+            if not self.is_unchanged(kind, row_id, watermark):
+                self.pending[kind][row_id] = watermark
+                stale_ids.append(row_id)
+        return stale_ids
+
+    def appendable(self, kind: str, row_id: int) -> Optional[Tuple[Optional[int], int, str]]:
+        """Get the earlier export of a stale chat or call log that rows can be appended to.
+
+        That is the case if its watermark only grew, it was written to a single file without an extension, and the
+        file still exists. Whether the earlier rows are unchanged is up to the caller.
+
+        Args:
+            kind (str): Either 'chats' or 'call_logs'.
+            row_id (int): ID of the chat or jid of the call log, as selected by `stale`.
+
+        Returns:
+            Optional[Tuple[Optional[int], int, str]]: The max ID and count of the earlier export and the path of its
+                file, or None if it has to be exported as a whole.
+        """
+        entry = self.entries[kind].get(str(row_id))
+        watermark = self.pending[kind].get(row_id)
+        if entry is None or watermark is None or len(entry["files"]) != 1 or self.extension:
+            return None
+        max_id, count = watermark
+        if max_id is None or count <= entry["count"] or (entry["max_id"] is not None and max_id <= entry["max_id"]):
+            return None
+        file_path = os.path.join(self.output_dir, next(iter(entry["files"])))
+        if not os.path.exists(file_path):
+            return None
+        return entry["max_id"], entry["count"], file_path
+
+    def record(self, kind: str, row_id: int, hashes: Dict[str, str]) -> None:
+        """Record the files written for an exported chat or call log, with the watermark `stale` remembered.
+
+        Args:
+            kind (str): Either 'chats' or 'call_logs'.
+            row_id (int): ID of the chat or jid of the call log.
+            hashes (Dict[str, str]): Hash of every written file by its path, see `hash_outputs`.
+        """
+        max_id, count = self.pending[kind].pop(row_id)
+        self.entries[kind][str(row_id)] = {"max_id": max_id, "count": count, "files": self.record_files(hashes)}
+
+    def record_files(self, hashes: Dict[str, str]) -> Dict[str, str]:
+        """Record written files that don't belong to a chat or call log, e.g. the contacts, for `stored_files`.
+
+        Args:
+            hashes (Dict[str, str]): Hash of every written file by its path, see `hash_outputs`.
+
+        Returns:
+            Dict[str, str]: The hashes by the path relative to the output directory.
+        """
+        relative_hashes = {
+            os.path.relpath(file_path, self.output_dir).replace(os.sep, "/"): file_hash
+            for file_path, file_hash in hashes.items()
+        }
+        self.written.update(relative_hashes)
+        return relative_hashes
+
+    def stored_files(self) -> Dict[str, Tuple[str, int, int]]:
+        """Get the hash, size and mtime_ns of the files of the last run, by path relative to the output directory."""
+        return {file_path: tuple(stored_file) for file_path, stored_file in self.files.items()}
+
+    def save(self, manifest_path: str) -> None:
+        """Write the manifest through a scratch file that is renamed into place, with the stat of the written files.
+
+        Args:
+            manifest_path (str): Path of the manifest file.
+        """
+        for file_path, file_hash in self.written.items():
+            try:
+                stat = os.stat(os.path.join(self.output_dir, file_path) + self.extension)
+            except OSError:
+                self.files.pop(file_path, None)
+                continue
+            self.files[file_path] = [file_hash, stat.st_size, stat.st_mtime_ns]
+        scratch_fd, scratch_path = tempfile.mkstemp(dir=os.path.dirname(manifest_path), suffix=".json")
+        try:
+            with os.fdopen(scratch_fd, "w", encoding="utf-8") as file:
+                json.dump(
+                    {"version": EXPORT_MANIFEST_VERSION, "settings": self.settings, **self.entries, "files": self.files},
+                    file
+                )
+            os.replace(scratch_path, manifest_path)
+        finally:
+            if os.path.exists(scratch_path):
+                os.remove(scratch_path)
@@ -0,0 +1,119 @@
+import bz2
+import gzip
+import io
+import lzma
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+import time
+import zipfile
+from typing import BinaryIO, Optional, TextIO
+
+from .output import COMPRESSION_EXTENSIONS
+
+# Size up to which an archive entry is kept in memory before it is spilled to a temporary file.
+ARCHIVE_ENTRY_SPOOL_SIZE = 16 * 1024 * 1024
+
+# Compression method of zip entries for every supported compression.
+ZIP_COMPRESSIONS = {
+    None: zipfile.ZIP_STORED, "gzip": zipfile.ZIP_DEFLATED, "bz2": zipfile.ZIP_BZIP2, "xz": zipfile.ZIP_LZMA
+}
+
+
+class ArchiveEntry(io.TextIOWrapper):
+    """Export file that is added to its archive when the exporter closes it."""
+
+    def __init__(self, archive: "ArchiveWriter", name: str) -> None:
+        super().__init__(tempfile.SpooledTemporaryFile(max_size=ARCHIVE_ENTRY_SPOOL_SIZE), encoding="utf-8")
+        self.archive = archive
+        self.name_in_archive = name
+
+    def close(self) -> None:
+        if not self.closed:
+            self.flush()
+            self.archive.add(self.name_in_archive, self.buffer)
+            super().close()
+
+
+class ArchiveWriter(object):
+    """Opener of export files that writes all of them into a single tar or zip archive.
+
+    Every file is collected in memory, or in a temporary file once it is larger than ARCHIVE_ENTRY_SPOOL_SIZE, while
+    it is written, and added to the archive when it is closed, so the archive is written sequentially. The entries
+    are named by the path of the file relative to `root_dir`, e.g. 'chats/Firstname Lastname (+41786319999).txt'.
+    Files are added one at a time, so the opener can be used by several threads.
+
+    Args:
+        archive_path (str): Path of the archive.
+        archive_format (str): Either 'tar' or 'zip'.
+        root_dir (str): Directory the entry names are relative to.
+        compression (Optional[str]): 'gzip', 'bz2' or 'xz' to compress the whole tar stream or every zip entry.
+            Defaults to None.
+        level (Optional[int]): Compression level. Defaults to None, the default level of the compression.
+    """
+
+    def __init__(
+            self,
+            archive_path: str,
+            archive_format: str,
+            root_dir: str,
+            compression: Optional[str] = None,
+            level: Optional[int] = None
+    ) -> None:
+        if archive_format not in ("tar", "zip"):
+            raise AssertionError(f"Invalid archive format '{archive_format}' requested")
+        if compression is not None and compression not in COMPRESSION_EXTENSIONS:
+            raise AssertionError(f"Invalid compression '{compression}' requested")
+        self.root_dir = root_dir
+        self.lock = threading.Lock()
+        self.mtime = time.time()
+        self.stream: Optional[BinaryIO] = None
+        if archive_format == "zip":
+            self.tar = None
+            self.zip = zipfile.ZipFile(
+                archive_path, "w", compression=ZIP_COMPRESSIONS[compression], compresslevel=level
+            )
+        else:
+            self.zip = None
+            if compression == "gzip":
+                self.stream = gzip.GzipFile(archive_path, "wb", compresslevel=9 if level is None else level)
+            elif compression == "bz2":
+                self.stream = bz2.BZ2File(archive_path, "wb", compresslevel=9 if level is None else level)
+            elif compression == "xz":
+                self.stream = lzma.LZMAFile(archive_path, "wb", preset=level)
+            else:
+                self.stream = open(archive_path, "wb")
+            self.tar = tarfile.open(fileobj=self.stream, mode="w|", format=tarfile.PAX_FORMAT)
+
+    def __call__(self, file_path: str) -> TextIO:
+        return ArchiveEntry(self, os.path.relpath(file_path, self.root_dir).replace(os.sep, "/"))
+
+    def add(self, name: str, file: BinaryIO) -> None:
+        """Add the content of a file to the archive.
+
+        Args:
+            name (str): Name of the entry.
+            file (BinaryIO): File with the content of the entry, read from its start.
+        """
+        size = file.seek(0, io.SEEK_END)
+        file.seek(0)
+        with self.lock:
+            if self.zip is not None:
+                with self.zip.open(name, "w", force_zip64=size > zipfile.ZIP64_LIMIT) as entry:
+                    shutil.copyfileobj(file, entry)
+            else:
+                info = tarfile.TarInfo(name)
+                info.size = size
+                info.mtime = self.mtime
+                self.tar.addfile(info, file)
+
+    def close(self) -> None:
+        """Complete the archive."""
+        with self.lock:
+            if self.zip is not None:
+                self.zip.close()
+            else:
+                self.tar.close()
+                self.stream.close()
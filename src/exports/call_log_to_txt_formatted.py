@@ -1,29 +1,40 @@
-from datetime import datetime, timezone
+from typing import List, Optional
 
-from src.common import contact_to_str, contact_to_full_str
-from src.models import CallLog, Call
+from src.common import ContactDirectory, contact_to_full_str, sorted_call_results
+from src.models import CallLog, CallLogSummary, Call
+from src.exports.output import open_output
+from src.exports.timestamps import UTC_TIMESTAMPS, TimestampFormatter
 
 
-def call_log_to_txt_formatted(call_log: CallLog, folder: str) -> None:
+def call_log_to_txt_formatted(
+    call_log: CallLog,
+    folder: str,
+    contacts: Optional[ContactDirectory] = None,
+    timestamps: Optional[TimestampFormatter] = None
+) -> None:
     """Format call logs in a readable format and store them as a text file.
 
     Args:
         call_log (CallLog): CallLog to be formatted.
         folder (str): Directory to write the formatted call log.
+        contacts (Optional[ContactDirectory]): Directory the caller was resolved with, used for its precomputed
+            renderings. Defaults to None.
+        timestamps (Optional[TimestampFormatter]): Formatter of the timestamps of the calls. Defaults to None, which
+            formats them in UTC.
 
     Returns:
         None: Creates .txt file of the call log in the given directory.
     """
     call_log_list = []
 
-    caller_id_details = contact_to_str(call_log.caller_id)
-    caller_id_details_full = contact_to_full_str(call_log.caller_id)
+    contacts = contacts if contacts is not None else ContactDirectory({})
+    timestamps = timestamps or UTC_TIMESTAMPS
+    caller_id_details = contacts.contact_to_str(call_log.caller_id)
+    caller_id_details_full = contacts.contact_to_full_str(call_log.caller_id)
 
     for call in call_log.calls:
         if call:
-            date_time = datetime.fromtimestamp(int(call.timestamp) / 1000, timezone.utc).strftime(
-                "%Y-%m-%d %H:%M:%S"
-            )
+            date_time = timestamps.call_timestamp(call.timestamp)
 
             if call.from_me:
                 call_log_str = call_from_me_formatted(call, caller_id_details, date_time)
@@ -34,11 +45,53 @@ def call_log_to_txt_formatted(call_log: CallLog, folder: str) -> None:
 
     call_logs = "\n".join(call_log_list)
 
-    file_name = contact_to_str(call_log.caller_id).replace("/", "_") + ".txt"
-    with open(f"{folder}/{file_name}", "w", encoding="utf-8") as file:
+    file_name = caller_id_details.replace("/", "_") + ".txt"
+    with open_output(f"{folder}/{file_name}") as file:
         file.write(f"{caller_id_details_full}\n\n{call_logs}")
 
 
+def call_log_summaries_to_txt_formatted(call_log_summaries: List[CallLogSummary], file_name: str) -> None:
+    """Format the call statistics of every caller in a readable format and store them in a single text file.
+
+    Args:
+        call_log_summaries (List[CallLogSummary]): Summaries to be formatted.
+        file_name (str): Path of the summary file.
+
+    Returns:
+        None: Creates the .txt summary file.
+    """
+    summaries = []
+    for summary in call_log_summaries:
+        call_results = ", ".join(
+            f"{'unknown' if call_result is None else call_result}: {count}"
+            for call_result, count in sorted_call_results(summary.call_results)
+        )
+        summaries.append(
+            f"{contact_to_full_str(summary.caller_id)}\n"
+            f"\t>>> Calls: {summary.call_count} (📞 {summary.voice_calls} voice, 📹 {summary.video_calls} video)\n"
+            f"\t>>> Direction: {summary.outgoing_calls} outgoing, {summary.incoming_calls} incoming\n"
+            f"\t>>> Total Duration: {total_seconds_to_hms(summary.total_duration)}\n"
+            f"\t>>> Average Duration: {seconds_to_hms(duration_in_sec=round(summary.average_duration or 0))}\n"
+            f"\t>>> Status: {call_results}"
+        )
+
+    with open_output(file_name) as file:
+        file.write("\n\n".join(summaries))
+
+
+def total_seconds_to_hms(duration_in_sec: int) -> str:
+    """Convert a total duration in seconds to hours, minutes and seconds, without wrapping at a day.
+
+    Args:
+        duration_in_sec (int): duration in seconds
+
+    Returns:
+        str: Duration as 'HH:MM:SS hours'.
+    """
+    hours, remainder = divmod(duration_in_sec, 3600)
+    return f"{hours:02d}:{remainder // 60:02d}:{remainder % 60:02d} hours"
+
+
 def call_to_me_formatted(call: Call, caller_id_details : str, date_time: str) -> str:
     return (
         f"[{date_time}]: {caller_id_details} ----> Me\n\t>>> Call Type: 📹 - Video Call\n\t>>> Duration: {seconds_to_hms(duration_in_sec=call.duration)}\n\t>>> Status: {call.call_result}"
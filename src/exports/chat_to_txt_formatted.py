@@ -1,23 +1,121 @@
-from datetime import datetime, timezone
-from typing import Callable, List, Generator
+import os
+from typing import Dict, Iterator, List, Optional, Set
 
-from src.common import contact_to_str, contact_to_full_str
-from src.models import Chat, Message, Contact, GroupName
+from src.common import ContactDirectory, contact_resolver
+from src.message_batch import MessageBatch
+from src.models import Chat, ChatStream, Message, Contact, GroupName
+from src.exports.output import open_output
+from src.exports.timestamps import UTC_TIMESTAMPS, TimestampFormatter, numpy
 
 
-def chat_to_txt_formatted(chat: Chat, folder: str) -> None:
+def chat_to_txt_formatted(
+    chat: Chat,
+    folder: str,
+    contacts: Optional[ContactDirectory] = None,
+    timestamps: Optional[TimestampFormatter] = None
+) -> None:
     """Format chat messages in a readable format and store them as a text file.
 
+    The messages are written while they are iterated, so a ChatStream is never held in memory.
+
     Args:
         chat (Chat): Chat to be formatted.
         folder (str): Directory to write the formatted chat.
+        contacts (Optional[ContactDirectory]): Directory the contacts of the chat were resolved with, used for its
+            precomputed renderings. Defaults to None.
+        timestamps (Optional[TimestampFormatter]): Formatter of the timestamps of the messages. Defaults to None,
+            which formats them in UTC.
 
     Returns:
         None: Creates .txt file of the chat in the given directory
     """
-    message_list = []
+    contacts = get_contact_directory(contacts)
+    with open_output(f"{folder}/{get_chat_file_name(chat, contacts)}") as file:
+        file.write(get_chat_header(chat, contacts))
+        for idx, message_str in enumerate(get_messages_strs(chat, {}, contacts, timestamps)):
+            file.write(f"\n{message_str}" if idx else message_str)
+
+
+def append_chat_to_txt_formatted(
+    chat: Chat,
+    file_path: str,
+    replied_messages: Dict[str, Message],
+    has_messages: bool,
+    contacts: Optional[ContactDirectory] = None,
+    timestamps: Optional[TimestampFormatter] = None
+) -> bool:
+    """Append the messages of a chat to an earlier export of it, which ends with the message before the first one.
+
+    The file is only appended to if it is the file of the chat and starts with the same participants, so the result
+    is the same as exporting the whole chat.
+
+    Args:
+        chat (Chat): Chat with the messages to append, and all of its participants.
+        file_path (str): Path of the earlier export.
+        replied_messages (Dict[str, Message]): Earlier messages the appended ones reply to, by key_id.
+        has_messages (bool): Whether the earlier export has messages.
+        contacts (Optional[ContactDirectory]): Directory the contacts of the chat were resolved with. Defaults to None.
+        timestamps (Optional[TimestampFormatter]): Formatter of the timestamps of the messages. Defaults to None, UTC.
+
+    Returns:
+        bool: Whether the messages were appended. Nothing is written otherwise.
+    """
+    contacts = get_contact_directory(contacts)
+    if os.path.basename(file_path) != get_chat_file_name(chat, contacts):
+        return False
+    header = get_chat_header(chat, contacts).encode("utf-8")
+    with open(file_path, "rb") as file:
+        if file.read(len(header)) != header:
+            return False
+    with open(file_path, "a", encoding="utf-8") as file:
+        for idx, message_str in enumerate(get_messages_strs(chat, dict(replied_messages), contacts, timestamps)):
+            file.write(f"\n{message_str}" if idx or has_messages else message_str)
+    return True
+
+
+def get_chat_file_name(chat: Chat, contacts: Optional[ContactDirectory] = None) -> str:
+    return get_chat_title_details(chat, contacts).replace("/", "_") + ".txt"
+
+
+def get_chat_header(chat: Chat, contacts: Optional[ContactDirectory] = None) -> str:
+    """Get the participants of a chat, after the group-name for a group, as they precede the messages."""
+    # list all participants
+    participants_details = get_chat_participants_details(chat, contacts)
+
+    # prepend group-name
+    if isinstance(chat.chat_title, GroupName):
+        participants_details = get_chat_title_details(chat, contacts) + '\n' + participants_details
+    return f"{participants_details}\n\n"
+
+
+def get_messages_strs(
+    chat: Chat,
+    replied_messages: Dict[str, Message],
+    contacts: ContactDirectory,
+    timestamps: Optional[TimestampFormatter] = None
+) -> Iterator[str]:
+    """Format the messages of a chat while they are iterated.
+
+    Args:
+        chat (Chat): Chat with the messages to format.
+        replied_messages (Dict[str, Message]): Earlier messages by key_id, filled with the messages of the chat that
+            are replied to later on.
+        contacts (ContactDirectory): Directory with the precomputed renderings.
+        timestamps (Optional[TimestampFormatter]): Formatter of the timestamps of the messages. Defaults to None, UTC.
+
+    Yields:
+        str: Formatted message.
+    """
+    timestamps = timestamps or UTC_TIMESTAMPS
+    # Index of the earlier messages by key_id, limited to those that are replied to later on.
+    # It is filled while rendering, so a reply never resolves to itself or to a later message.
+    quoted_key_ids = get_quoted_key_ids(chat)
+    if isinstance(chat.messages, MessageBatch):
+        yield from get_batch_messages_strs(chat.messages, replied_messages, contacts, timestamps, quoted_key_ids)
+        return
 
-    for idx, message in enumerate(chat.messages):
+    for message in chat.messages:
+        date_time = timestamps.chat_timestamp(message.timestamp)
         if (
             not message.text_data
             and not message.reply_to
@@ -25,32 +123,122 @@ def chat_to_txt_formatted(chat: Chat, folder: str) -> None:
             and not message.geo_position
         ):
             # If there is no data or media or reply_to, we can assume that the message was about change in chat settings.
-            date_time = datetime.fromtimestamp(int(message.timestamp) / 1000, timezone.utc)
-            message_str = f"[{date_time}] 'Change in the chat settings'"
+            yield f"[{date_time}] 'Change in the chat settings'"
         else:
-            message_str = get_message_str(chat, idx, message)
+            yield get_message_str(message, replied_messages, contacts, date_time=date_time)
 
-        message_list.append(message_str)
+        if message.key_id in quoted_key_ids:
+            # keep the first message with this key_id, as the search through the earlier messages did
+            replied_messages.setdefault(message.key_id, message)
 
-    chat_title_details = get_chat_title_details(chat)
 
-    # list all participants
-    participants_details = get_chat_participants_details(chat)
+def get_batch_messages_strs(
+    batch: MessageBatch,
+    replied_messages: Dict[str, Message],
+    contacts: ContactDirectory,
+    timestamps: TimestampFormatter,
+    quoted_key_ids: Set[str]
+) -> Iterator[str]:
+    """Format the messages of a batch from its columns, the same as `get_messages_strs` formats its `Message` objects.
 
-    # prepend group-name
-    if isinstance(chat.chat_title, GroupName):
-        participants_details = chat_title_details + '\n' + get_chat_participants_details(chat)
+    The timestamps are formatted all at once and every sender only once, and a `Message` is only built for the
+    messages that are replied to later on.
+
+    Args:
+        batch (MessageBatch): Messages of a chat.
+        replied_messages (Dict[str, Message]): Earlier messages by key_id, filled with the messages of the batch
+            that are replied to later on.
+        contacts (ContactDirectory): Directory with the precomputed renderings.
+        timestamps (TimestampFormatter): Formatter of the timestamps of the messages.
+        quoted_key_ids (Set[str]): Key IDs of the messages that are replied to.
+
+    Yields:
+        str: Formatted message.
+    """
+    date_times = get_batch_date_times(batch, timestamps)
+    # rendered name of every sender, by the code of its jid
+    sender_names: Dict[int, str] = {}
+
+    for idx in range(len(batch)):
+        date_time = date_times[idx]
+        text_data = batch.text_data[idx]
+        reply_to = batch.reply_to[idx]
+        has_media = batch.has_media[idx]
+        has_geo_position = batch.has_geo_position[idx]
+        if not text_data and not reply_to and not has_media and not has_geo_position:
+            yield f"[{date_time}] 'Change in the chat settings'"
+        else:
+            if batch.from_me[idx]:
+                sender_name = "Me"
+            else:
+                sender_code = batch.sender_jid.codes[idx]
+                sender_name = sender_names.get(sender_code)
+                if sender_name is None:
+                    sender_jid = batch.sender_jid[idx]
+                    sender_contact = contact_resolver(batch.contacts, sender_jid) if sender_jid else None
+                    sender_name = sender_names[sender_code] = contacts.contact_to_str(sender_contact)
+            message_str = f"[{date_time}]: {sender_name} - {text_data}" if text_data else f"[{date_time}]: {sender_name}"
+            if reply_to:
+                message_str += get_orig_message_str(replied_messages.get(reply_to), contacts)
+            if has_media:
+                message_str += f"\n\t>>> Media: {batch.file_path[idx]}"
+            if has_geo_position:
+                message_str += f"\n\t>>> Location: ({batch.latitude[idx]},{batch.longitude[idx]})"
+            yield message_str
+
+        key_id = batch.key_id[idx]
+        if key_id in quoted_key_ids and key_id not in replied_messages:
+            replied_messages[key_id] = batch.message(idx)
+
+
+def get_quoted_key_ids(chat: Chat) -> Set[str]:
+    """Get the key_id of every message that is replied to in the chat.
+
+    Args:
+        chat (Chat): Chat with a list of messages or a MessageBatch, or a ChatStream.
+
+    Returns:
+        Set[str]: Key IDs of the messages that are replied to.
+    """
+    if isinstance(chat, ChatStream):
+        return chat.quoted_key_ids
+    if isinstance(chat.messages, MessageBatch):
+        return chat.messages.quoted_key_ids()
+    return {message.reply_to for message in chat.messages if message.reply_to}
 
-    messages = "\n".join(message_list)
 
-    file_name = chat_title_details.replace("/", "_") + ".txt"
-    with open(f"{folder}/{file_name}", "w", encoding="utf-8") as file:
-        file.write(f"{participants_details}\n\n{messages}")
+def get_batch_date_times(batch: MessageBatch, timestamps: TimestampFormatter) -> List[str]:
+    """Format the timestamps of all messages of a batch, from its NumPy view if the column is plain integers.
+
+    Args:
+        batch (MessageBatch): Messages of a chat.
+        timestamps (TimestampFormatter): Formatter of the timestamps.
+
+    Returns:
+        List[str]: Formatted timestamp of every message, in the order of the batch.
+    """
+    column = batch.timestamp
+    if numpy is not None and not any(column.nulls) and not column.other_values:
+        return timestamps.chat_timestamps(batch.to_numpy()["timestamp"])
+    return timestamps.chat_timestamps([column[idx] for idx in range(len(column))])
+
+
+def get_contact_directory(contacts: Optional[ContactDirectory]) -> ContactDirectory:
+    """Return the given directory, or an empty one that renders every contact on the fly."""
+    return contacts if contacts is not None else ContactDirectory({})
 
 
-def get_message_str(chat, idx, message) -> str:
-    date_time = datetime.fromtimestamp(int(message.timestamp) / 1000, timezone.utc)
-    sender_name = resolve_sender_name(msg=message)
+def get_message_str(
+    message: Message,
+    replied_messages: Dict[str, Message],
+    contacts: Optional[ContactDirectory] = None,
+    timestamps: Optional[TimestampFormatter] = None,
+    date_time: Optional[str] = None
+) -> str:
+    contacts = get_contact_directory(contacts)
+    if date_time is None:
+        date_time = (timestamps or UTC_TIMESTAMPS).chat_timestamp(message.timestamp)
+    sender_name = resolve_sender_name(msg=message, contacts=contacts)
     message_str = (
         f"[{date_time}]: {sender_name} - {message.text_data}"
         if message.text_data
@@ -58,14 +246,8 @@ def get_message_str(chat, idx, message) -> str:
     )
     # Retrieve the 'original message' to which the replied message belongs to.
     if message.reply_to:
-        orig_message = next(
-            find_reply(
-                lambda x, msg=message: msg.reply_to == x.key_id,
-                chat.messages[:idx],
-            ),
-            None,
-        )  # Get the original message.
-        message_str += get_orig_message_str(orig_message)
+        orig_message = replied_messages.get(message.reply_to)  # Get the original message.
+        message_str += get_orig_message_str(orig_message, contacts)
     # Retrieve media from the message if any
     if message.media:
         message_str += f"\n\t>>> Media: {message.media.file_path}"
@@ -75,7 +257,7 @@ def get_message_str(chat, idx, message) -> str:
     return message_str
 
 
-def get_orig_message_str(orig_message: Message) -> str:
+def get_orig_message_str(orig_message: Message, contacts: Optional[ContactDirectory] = None) -> str:
     # Check if the reply is given to a deleted message
     # If orig_message is None, we can assume that the original message was deleted
     if orig_message:
@@ -89,33 +271,17 @@ def get_orig_message_str(orig_message: Message) -> str:
             orig_message_data_str = f"location: ({orig_message.geo_position.latitude},{orig_message.geo_position.longitude})"
         else:
             orig_message_data_str = ""
-        return f"\n\t>>> Reply to: {resolve_sender_name(orig_message)} - {orig_message_data_str}"
+        return f"\n\t>>> Reply to: {resolve_sender_name(orig_message, contacts)} - {orig_message_data_str}"
     else:
         return "\n\t>>> Reply to: 'Message has been deleted'"
 
 
-def find_reply(
-    compare_function: Callable, chat_list: List[Message]
-) -> Generator[Message, None, None]:
-    """Generator function to find the message to which a reply was given.
-
-    Args:
-        compare_function (function): Compare lambda function that needs to be run against the chat_list.
-        chat_list (List[Message]): List of chat messages.
-
-    Yields:
-        Message: Message object to which the reply was given.
-    """
-    for ct in chat_list:
-        if compare_function(ct):
-            yield ct
-
-
-def resolve_sender_name(msg: Message) -> str:
+def resolve_sender_name(msg: Message, contacts: Optional[ContactDirectory] = None) -> str:
     """Utility function to extract 'sender_name' from a given message.
 
     Args:
         msg (Message): Message from which we want to extract sender_name.
+        contacts (Optional[ContactDirectory]): Directory with the precomputed renderings. Defaults to None.
 
     Returns:
         str: sender_name
@@ -123,12 +289,12 @@ def resolve_sender_name(msg: Message) -> str:
     if msg.from_me:
         return "Me"
     else:
-        return contact_to_str(msg.sender_contact)
+        return get_contact_directory(contacts).contact_to_str(msg.sender_contact)
 
 
-def get_chat_title_details(chat: Chat) -> str:
+def get_chat_title_details(chat: Chat, contacts: Optional[ContactDirectory] = None) -> str:
     if isinstance(chat.chat_title, Contact):
-        chat_title_details = contact_to_str(chat.chat_title)
+        chat_title_details = get_contact_directory(contacts).contact_to_str(chat.chat_title)
     elif isinstance(chat.chat_title, GroupName):
         chat_title_details = f"{chat.chat_title.name}"
     else:
@@ -136,9 +302,10 @@ def get_chat_title_details(chat: Chat) -> str:
     return chat_title_details
 
 
-def get_chat_participants_details(chat: Chat) -> str:
+def get_chat_participants_details(chat: Chat, contacts: Optional[ContactDirectory] = None) -> str:
     if not chat.participants:
         return ""
-    contacts_str = [contact_to_full_str(contact) for contact in chat.participants]
+    contacts = get_contact_directory(contacts)
+    contacts_str = [contacts.contact_to_full_str(contact) for contact in chat.participants]
     contacts_str.sort()
     return '\n'.join(contacts_str)
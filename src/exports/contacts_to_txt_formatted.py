@@ -1,10 +1,13 @@
 from typing import Dict, List
 
-from src.common import contact_to_full_str
+from src.common import ContactDirectory, contact_to_full_str
 from src.models import Contact
+from src.exports.output import open_output
 
 
 def contacts_to_txt_formatted(contacts: Dict[str, List[Contact]], file_name: str) -> None:
+    # a ContactDirectory has the rendering of every contact that is used as its canonical contact
+    render = contacts.contact_to_full_str if isinstance(contacts, ContactDirectory) else contact_to_full_str
     lines = []
 
     # Collect lines to write
@@ -12,11 +15,11 @@ def contacts_to_txt_formatted(contacts: Dict[str, List[Contact]], file_name: str
         for contact in contact_list:
             # if contact.number and contact.raw_string_jid.endswith('@s.whatsapp.net'):
             if contact.number:
-                lines.append(contact_to_full_str(contact))
+                lines.append(render(contact))
 
     # Sort the collected lines alphabetically
     lines.sort()
 
     # Write sorted lines to file
-    with open(file_name, 'w', encoding="utf-8") as f:
+    with open_output(file_name) as f:
         f.writelines('\n'.join(lines))
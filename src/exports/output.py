@@ -0,0 +1,213 @@
+import bz2
+import gzip
+import hashlib
+import io
+import lzma
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, TextIO, Tuple
+
+# Opens an export file for writing text, given its path.
+OutputOpener = Callable[[str], TextIO]
+
+
+def open_file(file_path: str) -> TextIO:
+    """Open an export file on disk for writing UTF-8 text.
+
+    Args:
+        file_path (str): Path of the export file.
+
+    Returns:
+        TextIO: File object to write the export to.
+    """
+    return open(file_path, "w", encoding="utf-8")
+
+
+# File name extension of every supported compression.
+COMPRESSION_EXTENSIONS = {"gzip": ".gz", "bz2": ".bz2", "xz": ".xz"}
+
+
+class CompressedFileOpener(object):
+    """Opener of export files on disk that compresses them while they are written.
+
+    The text is encoded to UTF-8 and passed through a streaming compressor in small chunks, so the compressed file
+    is never held in memory. The extension of the compression is appended to every file name.
+
+    Args:
+        compression (str): One of 'gzip', 'bz2' or 'xz'.
+        level (Optional[int]): Compression level, 0-9 for gzip and xz and 1-9 for bz2. Defaults to None, the
+            default level of the compression.
+    """
+
+    def __init__(self, compression: str, level: Optional[int] = None) -> None:
+        if compression not in COMPRESSION_EXTENSIONS:
+            raise AssertionError(f"Invalid compression '{compression}' requested")
+        self.compression = compression
+        self.level = level
+
+    def __call__(self, file_path: str) -> TextIO:
+        file_path += COMPRESSION_EXTENSIONS[self.compression]
+        if self.compression == "gzip":
+            # without a timestamp in the header, the same export is compressed to the same bytes
+            file = gzip.GzipFile(file_path, "wb", compresslevel=9 if self.level is None else self.level, mtime=0)
+        elif self.compression == "bz2":
+            file = bz2.BZ2File(file_path, "wb", compresslevel=9 if self.level is None else self.level)
+        else:
+            file = lzma.LZMAFile(file_path, "wb", preset=self.level)
+        return io.TextIOWrapper(file, encoding="utf-8")
+
+
+# Opener used by all exporters, replaced with `use_output_opener`.
+current_output_opener: OutputOpener = open_file
+
+
+def open_output(file_path: str) -> TextIO:
+    """Open an export file for writing with the current output opener.
+
+    All exporters open their files through this function, so where and how the output is written can be
+    changed without touching them.
+
+    Args:
+        file_path (str): Path of the export file.
+
+    Returns:
+        TextIO: File object to write the export to. Closing it completes the file.
+    """
+    return current_output_opener(file_path)
+
+
+@contextmanager
+def use_output_opener(opener: OutputOpener) -> Iterator[OutputOpener]:
+    """Make the exporters open their files with `opener` for the duration of the context.
+
+    Args:
+        opener (OutputOpener): Opener to use.
+
+    Yields:
+        OutputOpener: The opener that was in use before, e.g. for an opener wrapping it.
+    """
+    global current_output_opener
+    previous_opener = current_output_opener
+    current_output_opener = opener
+    try:
+        yield previous_opener
+    finally:
+        current_output_opener = previous_opener
+
+
+class HashedFile(object):
+    """Export file that hashes the text written to it and records the hash by path when it is closed.
+
+    Args:
+        file (TextIO): File opened by the wrapped opener.
+        file_path (str): Path the file was opened with.
+        hashes (Dict[str, str]): Hex SHA-256 of the UTF-8 text of every closed file by its path.
+    """
+
+    def __init__(self, file: TextIO, file_path: str, hashes: Dict[str, str]) -> None:
+        self.file = file
+        self.file_path = file_path
+        self.hashes = hashes
+        self.sha256 = hashlib.sha256()
+
+    def write(self, text: str) -> int:
+        self.sha256.update(text.encode("utf-8"))
+        return self.file.write(text)
+
+    def writelines(self, lines: Iterable[str]) -> None:
+        for line in lines:
+            self.write(line)
+
+    @property
+    def closed(self) -> bool:
+        return self.file.closed
+
+    def close(self) -> None:
+        if not self.file.closed:
+            self.file.close()
+            self.hashes[self.file_path] = self.sha256.hexdigest()
+
+    def __enter__(self) -> "HashedFile":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+@contextmanager
+def hash_outputs() -> Iterator[Dict[str, str]]:
+    """Hash the text of every file the exporters write in the context, while it is written.
+
+    Yields:
+        Dict[str, str]: Hex SHA-256 of the UTF-8 text of every written file by the path it was opened with, filled
+            in when the file is closed.
+    """
+    hashes: Dict[str, str] = {}
+    opener = current_output_opener
+    with use_output_opener(lambda file_path: HashedFile(opener(file_path), file_path, hashes)):
+        yield hashes
+
+
+class ScratchFile(HashedFile):
+    """Export file written to a scratch file, which replaces the file on close unless the content is unchanged."""
+
+    def __init__(self, file: TextIO, scratch_path: str, file_path: str, stored_hash: str) -> None:
+        super().__init__(file, file_path, {})
+        self.scratch_path = scratch_path
+        self.stored_hash = stored_hash
+
+    def close(self) -> None:
+        if not self.file.closed:
+            super().close()
+            if self.hashes[self.file_path] == self.stored_hash:
+                os.remove(self.scratch_path)
+            else:
+                os.replace(self.scratch_path, self.file_path)
+
+
+class UnchangedFileSkipper(object):
+    """Opener of export files on disk that leaves a file untouched, mtime included, if its content is unchanged.
+
+    A file with a stored hash is written to a hidden scratch file next to it and hashed while it streams. When it is
+    closed, the scratch file replaces the file if the hash differs from the stored one and is removed otherwise. A
+    stored hash is only trusted while the file has the size and mtime stored with it; other files are written
+    directly.
+
+    Args:
+        opener (OutputOpener): Opener writing the files, e.g. open_file or a CompressedFileOpener.
+        root_dir (str): Directory the paths of the stored files are relative to.
+        stored_files (Dict[str, Tuple[str, int, int]]): Hex SHA-256 of the UTF-8 text, size and mtime_ns of the
+            files by their path relative to `root_dir`, e.g. from `ExportManifest.stored_files`.
+        extension (str): Extension `opener` appends to every file. Defaults to ''.
+    """
+
+    def __init__(
+            self,
+            opener: OutputOpener,
+            root_dir: str,
+            stored_files: Dict[str, Tuple[str, int, int]],
+            extension: str = ""
+    ) -> None:
+        self.opener = opener
+        self.root_dir = root_dir
+        self.stored_files = stored_files
+        self.extension = extension
+
+    def __call__(self, file_path: str) -> TextIO:
+        stored_file = self.stored_files.get(os.path.relpath(file_path, self.root_dir).replace(os.sep, "/"))
+        if stored_file is None:
+            return self.opener(file_path)
+        stored_hash, size, mtime_ns = stored_file
+        try:
+            stat = os.stat(file_path + self.extension)
+        except OSError:
+            return self.opener(file_path)
+        if (stat.st_size, stat.st_mtime_ns) != (size, mtime_ns):
+            return self.opener(file_path)
+        directory, file_name = os.path.split(file_path)
+        # unique per thread of every process, so writers never share a scratch file
+        scratch_path = os.path.join(directory, f".{file_name}.{os.getpid()}-{threading.get_ident()}.tmp")
+        return ScratchFile(
+            self.opener(scratch_path), scratch_path + self.extension, file_path + self.extension, stored_hash
+        )
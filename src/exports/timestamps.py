@@ -0,0 +1,139 @@
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy
+except ImportError:  # NumPy is optional, `TimestampFormatter.chat_timestamps` formats batches without it as well
+    numpy = None
+
+MS_PER_DAY = 24 * 60 * 60 * 1000
+MS_PER_HOUR = 60 * 60 * 1000
+UNIX_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+# Timestamps up to 2**32 seconds, until the year 2106, are exact to the millisecond as a float of seconds. Beyond,
+# `datetime.fromtimestamp` sees the rounding error of the float, so those are formatted with datetime.
+MAX_EXACT_TIMESTAMP = 2 ** 32 * 1000
+
+
+class TimestampFormatter(object):
+    """Format the millisecond timestamps of messages and calls for the formatted txt exports.
+
+    The strings are the same as `str(datetime.fromtimestamp(int(timestamp) / 1000, timezone.utc))` for messages and
+    its `strftime("%Y-%m-%d %H:%M:%S")` for calls, but they are built from the timestamp with integer arithmetic and a
+    cached 'YYYY-MM-DD ' prefix per day instead of a datetime object per timestamp.
+
+    With `local_timezone` the timestamps are formatted in the local timezone of the machine instead of UTC, with its
+    offset at the time, e.g. '2018-11-27 12:21:29.901000+01:00' for a message. The offset is cached per hour, except
+    for the hours in which it changes.
+
+    Args:
+        local_timezone (bool): Format in the local timezone instead of UTC. Defaults to False.
+    """
+
+    def __init__(self, local_timezone: bool = False) -> None:
+        self.local_timezone = local_timezone
+        self.day_prefixes: Dict[int, str] = {}
+        # (offset in milliseconds, '+HH:MM' suffix) by hour, for the local timezone
+        self.hour_offsets: Dict[int, Optional[Tuple[int, str]]] = {}
+        self.offset_suffixes: Dict[int, str] = {0: "+00:00"}
+
+    def offset(self, timestamp: int) -> Tuple[int, str]:
+        """Get the offset of the timezone at a timestamp, in milliseconds and as the suffix `str(datetime)` uses."""
+        if not self.local_timezone:
+            return 0, "+00:00"
+        hour = timestamp // MS_PER_HOUR
+        hour_offset = self.hour_offsets.get(hour, False)
+        if hour_offset is False:
+            start_offset = time.localtime(hour * MS_PER_HOUR // 1000).tm_gmtoff
+            end_offset = time.localtime((hour + 1) * MS_PER_HOUR // 1000 - 1).tm_gmtoff
+            # the offset of an hour in which it changes isn't cached
+            hour_offset = self.hour_offsets[hour] = (
+                (start_offset * 1000, self.offset_suffix(start_offset)) if start_offset == end_offset else None
+            )
+        if hour_offset is None:
+            local_offset = time.localtime(timestamp // 1000).tm_gmtoff
+            return local_offset * 1000, self.offset_suffix(local_offset)
+        return hour_offset
+
+    def offset_suffix(self, offset: int) -> str:
+        suffix = self.offset_suffixes.get(offset)
+        if suffix is None:
+            suffix = self.offset_suffixes[offset] = datetime(
+                2000, 1, 1, tzinfo=timezone(timedelta(seconds=offset))
+            ).isoformat()[19:]
+        return suffix
+
+    def day_and_time(self, timestamp: int) -> Tuple[str, int]:
+        """Split a timestamp into the cached 'YYYY-MM-DD ' prefix of its day and the milliseconds into the day."""
+        day, ms_of_day = divmod(timestamp, MS_PER_DAY)
+        prefix = self.day_prefixes.get(day)
+        if prefix is None:
+            prefix = self.day_prefixes[day] = date.fromordinal(UNIX_EPOCH_ORDINAL + day).isoformat() + " "
+        return prefix, ms_of_day
+
+    def to_datetime(self, timestamp: int) -> datetime:
+        """Convert a timestamp to a datetime the way the formatted exports always did."""
+        if self.local_timezone:
+            return datetime.fromtimestamp(timestamp / 1000).astimezone()
+        return datetime.fromtimestamp(timestamp / 1000, timezone.utc)
+
+    def call_timestamp(self, timestamp: Any) -> str:
+        """Format the timestamp of a call as 'YYYY-MM-DD HH:MM:SS'.
+
+        Args:
+            timestamp (Any): Milliseconds since the epoch, as an int or a string of one.
+
+        Returns:
+            str: Formatted timestamp.
+        """
+        timestamp = int(timestamp)
+        if not -MAX_EXACT_TIMESTAMP < timestamp < MAX_EXACT_TIMESTAMP:
+            return self.to_datetime(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+        prefix, ms_of_day = self.day_and_time(timestamp + self.offset(timestamp)[0])
+        seconds = ms_of_day // 1000
+        return f"{prefix}{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+    def chat_timestamp(self, timestamp: Any) -> str:
+        """Format the timestamp of a message as 'YYYY-MM-DD HH:MM:SS[.ffffff]+HH:MM'.
+
+        Args:
+            timestamp (Any): Milliseconds since the epoch, as an int or a string of one.
+
+        Returns:
+            str: Formatted timestamp.
+        """
+        timestamp = int(timestamp)
+        if not -MAX_EXACT_TIMESTAMP < timestamp < MAX_EXACT_TIMESTAMP:
+            return str(self.to_datetime(timestamp))
+        offset, suffix = self.offset(timestamp)
+        prefix, ms_of_day = self.day_and_time(timestamp + offset)
+        seconds, ms = divmod(ms_of_day, 1000)
+        if ms:
+            return f"{prefix}{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}.{ms:03d}000{suffix}"
+        return f"{prefix}{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}{suffix}"
+
+    def chat_timestamps(self, timestamps: Sequence[Any]) -> List[str]:
+        """Format the timestamps of a batch of messages, the same as `chat_timestamp` does.
+
+        A NumPy array of UTC timestamps, e.g. from `MessageBatch.to_numpy`, is converted to `datetime64` and
+        formatted by NumPy.
+
+        Args:
+            timestamps (Sequence[Any]): Milliseconds since the epoch of every message.
+
+        Returns:
+            List[str]: Formatted timestamps, in the same order.
+        """
+        if numpy is not None and isinstance(timestamps, numpy.ndarray) and not self.local_timezone:
+            if len(timestamps) and -MAX_EXACT_TIMESTAMP < timestamps.min() and timestamps.max() < MAX_EXACT_TIMESTAMP:
+                date_times = numpy.datetime_as_string(timestamps.astype("datetime64[ms]"), unit="s").tolist()
+                return [
+                    f"{date_time[:10]} {date_time[11:]}.{ms:03d}000+00:00" if ms
+                    else f"{date_time[:10]} {date_time[11:]}+00:00"
+                    for date_time, ms in zip(date_times, (timestamps % 1000).tolist())
+                ]
+        return [self.chat_timestamp(timestamp) for timestamp in timestamps]
+
+
+# Formatter of the UTC timestamps of the exports, shared by all exporters.
+UTC_TIMESTAMPS = TimestampFormatter()
@@ -1,12 +1,23 @@
 import json
+from json.encoder import encode_basestring
+from typing import Any, Dict, Iterator, List, Optional, TextIO
 
 from attrs import asdict
 
-from ..common import contact_to_str
-from ..models import CallLog, Chat, Contact, GroupName
+from ..common import contact_to_str, sorted_call_results
+from ..message_batch import MessageBatch
+from ..models import Call, CallLog, CallLogSummary, Chat, Contact, GroupName, Message
+from .output import open_output
 
 
-def chat_to_json(chat: Chat, folder: str) -> None:
+# Indentation of every nesting level, as written by `json.dump(..., indent=4)`.
+INDENT = "    "
+
+# Separators of the compact documents, which have no whitespace at all.
+COMPACT_SEPARATORS = (",", ":")
+
+
+def chat_to_json(chat: Chat, folder: str, compact: bool = False) -> None:
     """Store chat as a JSON file.
 
     It takes a chat object and a directory, and writes a json file to the directory with the chat's
@@ -15,6 +26,7 @@ def chat_to_json(chat: Chat, folder: str) -> None:
     Args:
         chat (Chat): Chat - the chat object to be converted to JSON
         folder (str): The directory to save the chats to.
+        compact (bool): Write the document without indentation and whitespace. Defaults to False.
 
     Returns:
         None: Creates .json file of the chat in the given directory
@@ -26,12 +38,215 @@ def chat_to_json(chat: Chat, folder: str) -> None:
     else:
         chat_title_details = ""
 
+    # a MessageBatch renders its messages straight from its columns
+    if isinstance(chat.messages, MessageBatch):
+        message_dicts = chat.messages.to_dicts()
+    else:
+        message_dicts = (message_to_dict(message) for message in chat.messages)
+
     file_name = chat_title_details.replace("/", "_") + ".json"
-    with open(f"{folder}/{file_name}", "w", encoding="utf8") as file:
-        json.dump(asdict(chat), file, sort_keys=True, indent=4, ensure_ascii=False)
+    with open_output(f"{folder}/{file_name}") as file:
+        # Same document as `json.dump(asdict(chat), file, sort_keys=True, indent=4, ensure_ascii=False)`, but the
+        # messages are serialised one at a time, so a ChatStream is never held in memory.
+        write_json_object(
+            file,
+            {
+                "chat_id": chat.chat_id,
+                "chat_title": asdict(chat.chat_title) if chat.chat_title else None,
+                "messages": message_dicts,
+                "participants": [asdict(contact) for contact in chat.participants],
+            },
+            compact,
+        )
+
 
+def message_to_dict(message: Optional[Message]) -> Optional[Dict[str, Any]]:
+    """Render a message as the dictionary `attrs.asdict` returns for it, without its recursive copy.
+
+    Args:
+        message (Optional[Message]): Message to render.
+
+    Returns:
+        Optional[Dict[str, Any]]: Dictionary of the message.
+    """
+    if message is None:
+        return None
+    sender_contact, media, geo_position = message.sender_contact, message.media, message.geo_position
+    return {
+        "message_id": message.message_id,
+        "key_id": message.key_id,
+        "chat_id": message.chat_id,
+        "from_me": message.from_me,
+        "sender_contact": {
+            "raw_string_jid": sender_contact.raw_string_jid, "name": sender_contact.name, "number": sender_contact.number
+        } if sender_contact else None,
+        "timestamp": message.timestamp,
+        "text_data": message.text_data,
+        "media": {
+            "message_id": media.message_id,
+            "media_job_uuid": media.media_job_uuid,
+            "file_path": media.file_path,
+            "mime_type": media.mime_type,
+        } if media else None,
+        "geo_position": {
+            "message_id": geo_position.message_id, "latitude": geo_position.latitude, "longitude": geo_position.longitude
+        } if geo_position else None,
+        "reply_to": message.reply_to,
+    }
+
+
+def call_to_dict(call: Optional[Call]) -> Optional[Dict[str, Any]]:
+    """Render a call as the dictionary `attrs.asdict` returns for it.
+
+    Args:
+        call (Optional[Call]): Call to render.
 
-def call_log_to_json(call_log: CallLog, folder: str) -> None:
+    Returns:
+        Optional[Dict[str, Any]]: Dictionary of the call.
+    """
+    if call is None:
+        return None
+    return {
+        "call_row_id": call.call_row_id,
+        "from_me": call.from_me,
+        "timestamp": call.timestamp,
+        "video_call": call.video_call,
+        "duration": call.duration,
+        "call_result": call.call_result,
+    }
+
+
+def write_json_object(file: TextIO, members: Dict[str, Any], compact: bool = False) -> None:
+    """Write a JSON object the way `json.dump(..., sort_keys=True, ensure_ascii=False)` does, member by member.
+
+    Members whose value is an iterator are written as arrays while they are iterated, so they are never held in
+    memory.
+
+    Args:
+        file (TextIO): File to write to.
+        members (Dict[str, Any]): Members of the object. Iterators are written as arrays.
+        compact (bool): Write the object without whitespace instead of with `indent=4`. Defaults to False.
+    """
+    if compact:
+        to_json = to_compact_json
+        object_start, member_start, name_separator, object_end = "{", "", ":", "}"
+        array_start, item_start, next_item_start, array_end, empty_array_end = "[", "", ",", "]", "]"
+    else:
+        to_json = to_indented_json
+        object_start, member_start, name_separator, object_end = "{\n", INDENT, ": ", "\n}"
+        array_start, item_start, next_item_start = "[", "\n" + INDENT * 2, ",\n" + INDENT * 2
+        array_end, empty_array_end = "\n" + INDENT + "]", "]"
+    member_separator = "," + ("" if compact else "\n")
+
+    file.write(object_start)
+    for idx, name in enumerate(sorted(members)):
+        value = members[name]
+        file.write(member_separator + member_start if idx else member_start)
+        file.write(to_json(name, 1) + name_separator)
+        if isinstance(value, Iterator):
+            file.write(array_start)
+            no_items = True
+            for item in value:
+                file.write(item_start if no_items else next_item_start)
+                file.write(to_json(item, 2))
+                no_items = False
+            file.write(empty_array_end if no_items else array_end)
+        else:
+            file.write(to_json(value, 1))
+    file.write(object_end if members else "}")
+
+
+def to_compact_json(value: Any, level: int = 0) -> str:
+    """Serialise a value without whitespace, with sorted keys.
+
+    Args:
+        value (Any): JSON serialisable value.
+        level (int): Nesting level of the value in the document, which doesn't change the compact JSON.
+
+    Returns:
+        str: JSON of the value.
+    """
+    return json.dumps(value, sort_keys=True, ensure_ascii=False, separators=COMPACT_SEPARATORS)
+
+
+def to_indented_json(value: Any, level: int) -> str:
+    """Serialise a value the way `json.dumps(..., sort_keys=True, indent=4, ensure_ascii=False)` does at the given
+    nesting level.
+
+    `json` only uses its C encoder without indentation, so the indented document is built here instead of with its
+    pure Python encoder.
+
+    Args:
+        value (Any): JSON serialisable value.
+        level (int): Nesting level of the value in the document.
+
+    Returns:
+        str: JSON of the value, with every line but the first indented by `level` * 4 spaces.
+    """
+    if isinstance(value, str):
+        return encode_basestring(value)
+    if value is None:
+        return "null"
+    if value is True:
+        return "true"
+    if value is False:
+        return "false"
+    if isinstance(value, int):
+        return int.__repr__(value)
+    if isinstance(value, float):
+        return float_to_json(value)
+    if isinstance(value, dict):
+        if not value:
+            return "{}"
+        member_start = "\n" + INDENT * (level + 1)
+        return (
+            "{" + member_start
+            + ("," + member_start).join(
+                f"{encode_basestring(key_to_json(key))}: {to_indented_json(member, level + 1)}"
+                for key, member in sorted(value.items(), key=lambda item: item[0])
+            )
+            + "\n" + INDENT * level + "}"
+        )
+    if isinstance(value, (list, tuple)):
+        if not value:
+            return "[]"
+        item_start = "\n" + INDENT * (level + 1)
+        return (
+            "[" + item_start
+            + ("," + item_start).join(to_indented_json(item, level + 1) for item in value)
+            + "\n" + INDENT * level + "]"
+        )
+    # anything else fails or is converted the way `json.dumps` does it
+    return json.dumps(value, sort_keys=True, indent=4, ensure_ascii=False).replace("\n", "\n" + INDENT * level)
+
+
+def float_to_json(value: float) -> str:
+    """Serialise a float the way `json.dumps` does."""
+    if value != value:
+        return "NaN"
+    if value == float("inf"):
+        return "Infinity"
+    if value == -float("inf"):
+        return "-Infinity"
+    return float.__repr__(value)
+
+
+def key_to_json(key: Any) -> str:
+    """Convert a dictionary key to the string `json.dumps` uses for it."""
+    if isinstance(key, str):
+        return key
+    if key is None:
+        return "null"
+    if key is True:
+        return "true"
+    if key is False:
+        return "false"
+    if isinstance(key, float):
+        return float_to_json(key)
+    return int.__repr__(key)
+
+
+def call_log_to_json(call_log: CallLog, folder: str, compact: bool = False) -> None:
     """Store call logs as a JSON file.
 
     It takes a `CallLog` object and a directory path, and writes a JSON file to the directory with the
@@ -40,6 +255,7 @@ def call_log_to_json(call_log: CallLog, folder: str) -> None:
     Args:
         call_log (CallLog): CallLog - The call log object to be converted to JSON.
         folder (str): The directory where the JSON files will be saved.
+        compact (bool): Write the document without indentation and whitespace. Defaults to False.
 
     Returns:
         None: Creates .json file of the chat in the given directory
@@ -47,5 +263,42 @@ def call_log_to_json(call_log: CallLog, folder: str) -> None:
     caller_id_details = contact_to_str(call_log.caller_id)
 
     file_name = caller_id_details.replace("/", "_") + ".json"
-    with open(f"{folder}/{file_name}", "w", encoding="utf8") as file:
-        json.dump(asdict(call_log), file, sort_keys=True, indent=4, ensure_ascii=False)
+    with open_output(f"{folder}/{file_name}") as file:
+        write_json_object(
+            file,
+            {
+                "caller_id": asdict(call_log.caller_id) if call_log.caller_id else None,
+                "calls": (call_to_dict(call) for call in call_log.calls),
+                "jid_row_id": call_log.jid_row_id,
+            },
+            compact,
+        )
+
+
+def call_log_summary_to_dict(summary: CallLogSummary) -> Dict[str, Any]:
+    """Convert the call statistics of a caller to a dictionary.
+
+    The call results are converted to the names `json` writes for them, since the calls without a call result are
+    counted under None, which can't be sorted with the other call results.
+    """
+    summary_dict = asdict(summary)
+    summary_dict["call_results"] = {
+        key_to_json(call_result): count for call_result, count in sorted_call_results(summary.call_results)
+    }
+    return summary_dict
+
+
+def call_log_summaries_to_json(call_log_summaries: List[CallLogSummary], file_name: str, compact: bool = False) -> None:
+    """Store the call statistics of every caller in a single JSON file.
+
+    Args:
+        call_log_summaries (List[CallLogSummary]): Summaries to be stored.
+        file_name (str): Path of the summary file.
+        compact (bool): Write the document without indentation and whitespace. Defaults to False.
+
+    Returns:
+        None: Creates the .json summary file.
+    """
+    summaries = [call_log_summary_to_dict(summary) for summary in call_log_summaries]
+    with open_output(file_name) as file:
+        file.write(to_compact_json(summaries) if compact else to_indented_json(summaries, 0))
@@ -0,0 +1,165 @@
+import json
+import os
+from typing import Any, Dict, Iterable, Iterator, List, TextIO
+
+from attrs import asdict
+
+from ..common import contact_to_str
+from ..message_batch import MessageBatch
+from ..models import CallLog, CallLogSummary, Chat, Contact, GroupName
+from .output import open_output
+from .to_json import call_log_summary_to_dict, call_to_dict, message_to_dict, to_compact_json
+
+# Number of characters collected before they are written to the file in a single call.
+NDJSON_BUFFER_SIZE = 1024 * 1024
+
+
+class LineWriter(object):
+    """Write lines to a file in large chunks instead of one `write` call per line.
+
+    Args:
+        file (TextIO): File to write to.
+        buffer_size (int): Number of characters collected before they are written. Defaults to NDJSON_BUFFER_SIZE.
+    """
+
+    def __init__(self, file: TextIO, buffer_size: int = NDJSON_BUFFER_SIZE) -> None:
+        self.file = file
+        self.buffer_size = buffer_size
+        self.lines: List[str] = []
+        self.buffered = 0
+
+    def write_line(self, line: str) -> None:
+        self.lines.append(line)
+        self.buffered += len(line) + 1
+        if self.buffered >= self.buffer_size:
+            self.flush()
+
+    def write_records(self, records: Iterable[Dict[str, Any]]) -> None:
+        """Write every record as a line of compact JSON."""
+        for record in records:
+            self.write_line(to_compact_json(record))
+
+    def flush(self) -> None:
+        if self.lines:
+            self.file.write("\n".join(self.lines) + "\n")
+            self.lines = []
+            self.buffered = 0
+
+
+def chat_to_ndjson(chat: Chat, folder: str) -> None:
+    """Store chat as a JSON Lines file, with the chat on the first line and a message on every following line.
+
+    The first line has the 'chat_id', 'chat_title' and 'participants' of the chat, every other line is a message
+    with the same keys as in the JSON export. Messages are written while they are iterated, so a ChatStream is
+    never held in memory.
+
+    Args:
+        chat (Chat): Chat to be stored.
+        folder (str): Directory to write the chat.
+
+    Returns:
+        None: Creates .ndjson file of the chat in the given directory
+    """
+    with open_output(f"{folder}/{get_chat_file_name(chat)}") as file:
+        writer = LineWriter(file, NDJSON_BUFFER_SIZE)
+        writer.write_records([get_chat_header(chat)])
+        writer.write_records(get_message_dicts(chat))
+        writer.flush()
+
+
+def append_chat_to_ndjson(chat: Chat, file_path: str) -> bool:
+    """Append the messages of a chat to an earlier export of it, which ends with the message before the first one.
+
+    The file is only appended to if it is the file of the chat and its first line has the same chat and
+    participants, in any order.
+
+    Args:
+        chat (Chat): Chat with the messages to append, and all of its participants.
+        file_path (str): Path of the earlier export.
+
+    Returns:
+        bool: Whether the messages were appended. Nothing is written otherwise.
+    """
+    if os.path.basename(file_path) != get_chat_file_name(chat):
+        return False
+    with open(file_path, "r", encoding="utf-8") as file:
+        try:
+            header = json.loads(file.readline())
+        except ValueError:
+            return False
+    expected_header = json.loads(to_compact_json(get_chat_header(chat)))
+    for record in (header, expected_header):
+        if not isinstance(record, dict) or not isinstance(record.get("participants"), list):
+            return False
+        record["participants"].sort(key=to_compact_json)
+    if header != expected_header:
+        return False
+    with open(file_path, "a", encoding="utf-8") as file:
+        writer = LineWriter(file, NDJSON_BUFFER_SIZE)
+        writer.write_records(get_message_dicts(chat))
+        writer.flush()
+    return True
+
+
+def get_chat_file_name(chat: Chat) -> str:
+    if isinstance(chat.chat_title, Contact):
+        chat_title_details = contact_to_str(chat.chat_title)
+    elif isinstance(chat.chat_title, GroupName):
+        chat_title_details = f"{chat.chat_title.name}"
+    else:
+        chat_title_details = ""
+    return chat_title_details.replace("/", "_") + ".ndjson"
+
+
+def get_chat_header(chat: Chat) -> Dict[str, Any]:
+    return {
+        "chat_id": chat.chat_id,
+        "chat_title": asdict(chat.chat_title) if chat.chat_title else None,
+        "participants": [asdict(contact) for contact in chat.participants],
+    }
+
+
+def get_message_dicts(chat: Chat) -> Iterator[Dict[str, Any]]:
+    # a MessageBatch renders its messages straight from its columns
+    if isinstance(chat.messages, MessageBatch):
+        return chat.messages.to_dicts()
+    return (message_to_dict(message) for message in chat.messages if message)
+
+
+def call_log_to_ndjson(call_log: CallLog, folder: str) -> None:
+    """Store call logs as a JSON Lines file, with the caller on the first line and a call on every following line.
+
+    Args:
+        call_log (CallLog): CallLog to be stored.
+        folder (str): Directory to write the call log.
+
+    Returns:
+        None: Creates .ndjson file of the call log in the given directory.
+    """
+    caller_id_details = contact_to_str(call_log.caller_id)
+
+    file_name = caller_id_details.replace("/", "_") + ".ndjson"
+    with open_output(f"{folder}/{file_name}") as file:
+        writer = LineWriter(file, NDJSON_BUFFER_SIZE)
+        writer.write_records([{
+            "caller_id": asdict(call_log.caller_id) if call_log.caller_id else None,
+            "jid_row_id": call_log.jid_row_id,
+        }])
+        writer.write_records(call_to_dict(call) for call in call_log.calls if call)
+        writer.flush()
+
+
+def call_log_summaries_to_ndjson(call_log_summaries: List[CallLogSummary], file_name: str) -> None:
+    """Store the call statistics of every caller in a single JSON Lines file, one caller per line.
+
+    Args:
+        call_log_summaries (List[CallLogSummary]): Summaries to be stored.
+        file_name (str): Path of the summary file.
+
+    Returns:
+        None: Creates the .ndjson summary file.
+    """
+    with open_output(file_name) as file:
+        writer = LineWriter(file, NDJSON_BUFFER_SIZE)
+        writer.write_records(call_log_summary_to_dict(summary) for summary in call_log_summaries)
+        writer.flush()
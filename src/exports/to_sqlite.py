@@ -0,0 +1,190 @@
+import os
+import sqlite3
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from ..common import sorted_call_results
+from ..models import CallLog, CallLogSummary, Chat, Contact, GroupName
+
+# Rows collected per table before they are inserted with a single `executemany`.
+SQLITE_BATCH_SIZE = 10000
+
+# Rows inserted in a single transaction.
+SQLITE_TRANSACTION_SIZE = 200000
+
+# Tables of the output database, created without secondary indexes so they load in insertion order.
+SQLITE_SCHEMA = {
+    "contacts": "raw_string_jid TEXT NOT NULL, name TEXT, number TEXT",
+    "chats": "chat_id INTEGER PRIMARY KEY, raw_string_jid TEXT, group_name TEXT",
+    "participants": "chat_id INTEGER NOT NULL, raw_string_jid TEXT NOT NULL",
+    "messages": (
+        "message_id INTEGER PRIMARY KEY, chat_id INTEGER, key_id TEXT, from_me INTEGER, sender_jid TEXT, "
+        "timestamp INTEGER, text_data TEXT, reply_to TEXT"
+    ),
+    "media": "message_id INTEGER PRIMARY KEY, media_job_uuid TEXT, file_path TEXT, mime_type TEXT",
+    "locations": "message_id INTEGER PRIMARY KEY, latitude REAL, longitude REAL",
+    "call_logs": "jid_row_id INTEGER PRIMARY KEY, raw_string_jid TEXT",
+    "calls": (
+        "call_row_id INTEGER PRIMARY KEY, jid_row_id INTEGER, from_me INTEGER, timestamp INTEGER, "
+        "video_call INTEGER, duration INTEGER, call_result INTEGER"
+    ),
+    "call_log_summaries": (
+        "jid_row_id INTEGER PRIMARY KEY, raw_string_jid TEXT, call_count INTEGER, total_duration INTEGER, "
+        "average_duration REAL, video_calls INTEGER, voice_calls INTEGER, outgoing_calls INTEGER, "
+        "incoming_calls INTEGER"
+    ),
+    "call_log_summary_results": "jid_row_id INTEGER NOT NULL, call_result INTEGER, call_count INTEGER",
+}
+
+# Indexes created once all rows are loaded.
+SQLITE_INDEXES = [
+    "CREATE UNIQUE INDEX contacts_jid_index ON contacts (raw_string_jid)",
+    "CREATE INDEX participants_chat_index ON participants (chat_id, raw_string_jid)",
+    "CREATE INDEX messages_chat_index ON messages (chat_id, timestamp)",
+    "CREATE INDEX messages_key_id_index ON messages (key_id)",
+    "CREATE INDEX calls_jid_index ON calls (jid_row_id, timestamp)",
+    "CREATE INDEX call_log_summary_results_jid_index ON call_log_summary_results (jid_row_id)",
+]
+
+
+class SqliteExport(object):
+    """Normalised output database that chats, call logs and contacts are bulk loaded into.
+
+    Rows are collected per table and inserted with `executemany` in large transactions, with the journal and
+    synchronous writes turned off for the load, because a failed export is simply repeated. The secondary indexes
+    are created by `close`, after all rows are loaded; `abort` removes a failed export instead. Every contact is
+    stored once, by jid; chats, participants, messages and call logs refer to it by its 'raw_string_jid'.
+
+    Args:
+        file_path (str): Path of the output database. An existing file is replaced.
+    """
+
+    def __init__(self, file_path: str) -> None:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        self.file_path = file_path
+        self.db = sqlite3.connect(file_path, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=OFF")
+        self.db.execute("PRAGMA synchronous=OFF")
+        self.db.execute("PRAGMA temp_store=MEMORY")
+        self.db.execute("PRAGMA cache_size=-65536")
+        for table, columns in SQLITE_SCHEMA.items():
+            self.db.execute(f"CREATE TABLE {table} ({columns})")
+        self.rows: Dict[str, List[Tuple[Any, ...]]] = {table: [] for table in SQLITE_SCHEMA}
+        self.contact_jids = set()
+        self.uncommitted_rows = 0
+        self.db.execute("BEGIN")
+
+    def add_row(self, table: str, row: Tuple[Any, ...]) -> None:
+        rows = self.rows[table]
+        rows.append(row)
+        if len(rows) >= SQLITE_BATCH_SIZE:
+            self.flush(table)
+
+    def flush(self, table: str) -> None:
+        """Insert the collected rows of a table, and commit the transaction once it is large enough."""
+        rows = self.rows[table]
+        if not rows:
+            return
+        placeholders = ", ".join("?" * len(rows[0]))
+        self.db.executemany(f"INSERT INTO {table} VALUES ({placeholders})", rows)
+        self.uncommitted_rows += len(rows)
+        self.rows[table] = []
+        if self.uncommitted_rows >= SQLITE_TRANSACTION_SIZE:
+            self.db.execute("COMMIT")
+            self.db.execute("BEGIN")
+            self.uncommitted_rows = 0
+
+    def add_contact(self, contact: Optional[Contact]) -> Optional[str]:
+        """Store a contact, unless one with its jid is stored already.
+
+        Args:
+            contact (Optional[Contact]): Contact to store.
+
+        Returns:
+            Optional[str]: JID of the contact, to refer to it.
+        """
+        if contact is None:
+            return None
+        if contact.raw_string_jid not in self.contact_jids:
+            self.contact_jids.add(contact.raw_string_jid)
+            self.add_row("contacts", (contact.raw_string_jid, contact.name, contact.number))
+        return contact.raw_string_jid
+
+    def add_contacts(self, contacts: Dict[str, List[Contact]]) -> None:
+        """Store the contact of every jid of the wa.db, the last one if a jid has several.
+
+        Args:
+            contacts (Dict[str, List[Contact]]): Dict of all contacts and jid as key.
+        """
+        for contact_list in contacts.values():
+            if contact_list:
+                self.add_contact(contact_list[-1])
+
+    def add_chat(self, chat: Chat) -> None:
+        """Store a chat with its participants and messages, while the messages are iterated.
+
+        Args:
+            chat (Chat): Chat to store.
+        """
+        if isinstance(chat.chat_title, GroupName):
+            self.add_row("chats", (chat.chat_id, chat.chat_title.raw_string_jid, chat.chat_title.name))
+        else:
+            self.add_row("chats", (chat.chat_id, self.add_contact(chat.chat_title), None))
+        for contact in chat.participants:
+            self.add_row("participants", (chat.chat_id, self.add_contact(contact)))
+        for message in chat.messages:
+            if not message:
+                continue
+            self.add_row("messages", (
+                message.message_id, message.chat_id, message.key_id, message.from_me,
+                self.add_contact(message.sender_contact), message.timestamp, message.text_data, message.reply_to,
+            ))
+            if message.media:
+                media = message.media
+                self.add_row("media", (media.message_id, media.media_job_uuid, media.file_path, media.mime_type))
+            if message.geo_position:
+                geo_position = message.geo_position
+                self.add_row("locations", (geo_position.message_id, geo_position.latitude, geo_position.longitude))
+
+    def add_call_log(self, call_log: CallLog) -> None:
+        """Store a call log with its calls.
+
+        Args:
+            call_log (CallLog): Call log to store.
+        """
+        self.add_row("call_logs", (call_log.jid_row_id, self.add_contact(call_log.caller_id)))
+        for call in call_log.calls:
+            if call:
+                self.add_row("calls", (
+                    call.call_row_id, call_log.jid_row_id, call.from_me, call.timestamp, call.video_call,
+                    call.duration, call.call_result,
+                ))
+
+    def add_call_log_summaries(self, call_log_summaries: Iterable[CallLogSummary]) -> None:
+        """Store the call statistics of every caller.
+
+        Args:
+            call_log_summaries (Iterable[CallLogSummary]): Summaries to store.
+        """
+        for summary in call_log_summaries:
+            self.add_row("call_log_summaries", (
+                summary.jid_row_id, self.add_contact(summary.caller_id), summary.call_count, summary.total_duration, summary.average_duration,
+                summary.video_calls, summary.voice_calls, summary.outgoing_calls, summary.incoming_calls,
+            ))
+            for call_result, count in sorted_call_results(summary.call_results):
+                self.add_row("call_log_summary_results", (summary.jid_row_id, call_result, count))
+
+    def close(self) -> None:
+        """Insert the remaining rows, create the indexes and close the database."""
+        for table in self.rows:
+            self.flush(table)
+        for index in SQLITE_INDEXES:
+            self.db.execute(index)
+        self.db.execute("COMMIT")
+        self.db.execute("ANALYZE")
+        self.db.close()
+
+    def abort(self) -> None:
+        """Close the database without finishing it and remove the incomplete file."""
+        self.db.close()
+        os.remove(self.file_path)
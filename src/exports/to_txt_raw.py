@@ -1,5 +1,162 @@
-from ..common import contact_to_str
-from ..models import CallLog, Chat, Contact, GroupName
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from ..common import contact_resolver, contact_to_str
+from ..message_batch import MessageBatch
+from ..models import Call, CallLog, CallLogSummary, Chat, Contact, GeoPosition, GroupName, Media, Message
+from .output import open_output
+
+# Number of characters collected before they are written to the file in a single call.
+RAW_BUFFER_SIZE = 1024 * 1024
+
+
+def contact_to_raw(contact: Contact) -> str:
+    return f"Contact(raw_string_jid={contact.raw_string_jid!r}, name={contact.name!r}, number={contact.number!r})"
+
+
+def group_name_to_raw(group_name: GroupName) -> str:
+    return f"GroupName(raw_string_jid={group_name.raw_string_jid!r}, name={group_name.name!r})"
+
+
+def media_to_raw(media: Media) -> str:
+    return (
+        f"Media(message_id={media.message_id!r}, media_job_uuid={media.media_job_uuid!r}, "
+        f"file_path={media.file_path!r}, mime_type={media.mime_type!r})"
+    )
+
+
+def geo_position_to_raw(geo_position: GeoPosition) -> str:
+    return (
+        f"GeoPosition(message_id={geo_position.message_id!r}, latitude={geo_position.latitude!r}, "
+        f"longitude={geo_position.longitude!r})"
+    )
+
+
+def call_to_raw(call: Call) -> str:
+    return (
+        f"Call(call_row_id={call.call_row_id!r}, from_me={call.from_me!r}, timestamp={call.timestamp!r}, "
+        f"video_call={call.video_call!r}, duration={call.duration!r}, call_result={call.call_result!r})"
+    )
+
+
+def call_log_summary_to_raw(summary: CallLogSummary) -> str:
+    return (
+        f"CallLogSummary(jid_row_id={summary.jid_row_id!r}, caller_id={value_to_raw(summary.caller_id)}, "
+        f"call_count={summary.call_count!r}, total_duration={summary.total_duration!r}, "
+        f"average_duration={summary.average_duration!r}, video_calls={summary.video_calls!r}, "
+        f"voice_calls={summary.voice_calls!r}, outgoing_calls={summary.outgoing_calls!r}, "
+        f"incoming_calls={summary.incoming_calls!r}, call_results={summary.call_results!r})"
+    )
+
+
+def value_to_raw(value: Any) -> str:
+    """Render a value the same as its attrs `repr`, through the formatter of its type if there is one."""
+    formatter = RAW_FORMATTERS.get(type(value))
+    return formatter(value) if formatter else repr(value)
+
+
+class RawMessageFormatter(object):
+    """Render messages the same as `str(message)`, without the attrs `repr` of the message and its nested objects.
+
+    The rendering of every sender contact is kept, by the identity of the contact, so the many messages of the same
+    sender share it.
+    """
+
+    def __init__(self) -> None:
+        # the contact is kept with its rendering, so its id isn't reused while it is cached
+        self.contacts: Dict[int, Tuple[Optional[Contact], str]] = {}
+
+    def sender_to_raw(self, contact: Optional[Contact]) -> str:
+        cached = self.contacts.get(id(contact))
+        if cached is None:
+            cached = self.contacts[id(contact)] = (contact, value_to_raw(contact))
+        return cached[1]
+
+    def __call__(self, message: Optional[Message]) -> str:
+        if type(message) is not Message:
+            return value_to_raw(message)
+        media = message.media
+        geo_position = message.geo_position
+        return (
+            f"Message(message_id={message.message_id!r}, key_id={message.key_id!r}, chat_id={message.chat_id!r}, "
+            f"from_me={message.from_me!r}, sender_contact={self.sender_to_raw(message.sender_contact)}, "
+            f"timestamp={message.timestamp!r}, text_data={message.text_data!r}, "
+            f"media={'None' if media is None else value_to_raw(media)}, "
+            f"geo_position={'None' if geo_position is None else value_to_raw(geo_position)}, "
+            f"reply_to={message.reply_to!r})"
+        )
+
+
+def batch_to_raw(batch: MessageBatch) -> Iterator[str]:
+    """Render the messages of a batch from its columns, the same as `RawMessageFormatter` renders its `Message` objects.
+
+    Args:
+        batch (MessageBatch): Messages of a chat.
+
+    Yields:
+        str: Rendering of every message, in the order of the batch.
+    """
+    # the rendering of every sender contact is built once and shared by all of its messages
+    sender_contacts = [
+        value_to_raw(contact_resolver(batch.contacts, jid)) for jid in batch.sender_jid.distinct_values
+    ]
+    for idx in range(len(batch)):
+        message_id = batch.message_id[idx]
+        sender_code = batch.sender_jid.codes[idx]
+        media = (
+            f"Media(message_id={message_id!r}, media_job_uuid={batch.media_job_uuid[idx]!r}, "
+            f"file_path={batch.file_path[idx]!r}, mime_type={batch.mime_type[idx]!r})"
+        ) if batch.has_media[idx] else "None"
+        geo_position = (
+            f"GeoPosition(message_id={message_id!r}, latitude={batch.latitude[idx]!r}, "
+            f"longitude={batch.longitude[idx]!r})"
+        ) if batch.has_geo_position[idx] else "None"
+        yield (
+            f"Message(message_id={message_id!r}, key_id={batch.key_id[idx]!r}, chat_id={batch.chat_id[idx]!r}, "
+            f"from_me={batch.from_me[idx]!r}, "
+            f"sender_contact={sender_contacts[sender_code] if sender_code >= 0 else 'None'}, "
+            f"timestamp={batch.timestamp[idx]!r}, text_data={batch.text_data[idx]!r}, "
+            f"media={media}, geo_position={geo_position}, reply_to={batch.reply_to[idx]!r})"
+        )
+
+
+def message_to_raw(message: Message) -> str:
+    return RawMessageFormatter()(message)
+
+
+# Formatters of the models, by their exact type; subclasses fall back to their own `repr`.
+RAW_FORMATTERS: Dict[type, Callable[[Any], str]] = {
+    Contact: contact_to_raw,
+    GroupName: group_name_to_raw,
+    Media: media_to_raw,
+    GeoPosition: geo_position_to_raw,
+    Message: message_to_raw,
+    Call: call_to_raw,
+    CallLogSummary: call_log_summary_to_raw,
+}
+
+
+def write_raw_lines(file: TextIO, lines: Iterable[str], buffer_size: int = RAW_BUFFER_SIZE) -> None:
+    """Write lines separated by newlines, without a trailing one, in chunks of about `buffer_size` characters.
+
+    Args:
+        file (TextIO): File to write to.
+        lines (Iterable[str]): Lines to write, consumed while they are written.
+        buffer_size (int): Number of characters collected before they are written. Defaults to RAW_BUFFER_SIZE.
+    """
+    chunk: List[str] = []
+    buffered = 0
+    separator = ""
+    for line in lines:
+        chunk.append(separator)
+        chunk.append(line)
+        separator = "\n"
+        buffered += len(line) + 1
+        if buffered >= buffer_size:
+            file.write("".join(chunk))
+            chunk = []
+            buffered = 0
+    if chunk:
+        file.write("".join(chunk))
 
 
 def chat_to_txt_raw(chat: Chat, folder: str) -> None:
@@ -20,11 +177,15 @@ def chat_to_txt_raw(chat: Chat, folder: str) -> None:
     else:
         chat_title_details = ""
 
-    messages = "\n".join([str(message) for message in chat.messages])
-
     file_name = chat_title_details.replace("/", "_") + "-raw.txt"
-    with open(f"{folder}/{file_name}", "w", encoding="utf-8") as file:
-        file.write(f"{chat_title_details}\n\n{messages}")
+    with open_output(f"{folder}/{file_name}") as file:
+        file.write(f"{chat_title_details}\n\n")
+        # write the messages while they are iterated, so a ChatStream is never held in memory
+        if isinstance(chat.messages, MessageBatch):
+            lines = batch_to_raw(chat.messages)
+        else:
+            lines = map(RawMessageFormatter(), chat.messages)
+        write_raw_lines(file, lines, RAW_BUFFER_SIZE)
 
 
 def call_log_to_txt_raw(call_log: CallLog, folder: str) -> None:
@@ -39,8 +200,21 @@ def call_log_to_txt_raw(call_log: CallLog, folder: str) -> None:
     """
     caller_id_details = contact_to_str(call_log.caller_id)
 
-    call_logs = "\n".join([str(call) for call in call_log.calls])
-
     file_name = caller_id_details.replace("/", "_") + "-raw.txt"
-    with open(f"{folder}/{file_name}", "w", encoding="utf-8") as file:
-        file.write(f"{caller_id_details}\n\n{call_logs}")
+    with open_output(f"{folder}/{file_name}") as file:
+        file.write(f"{caller_id_details}\n\n")
+        write_raw_lines(file, map(value_to_raw, call_log.calls), RAW_BUFFER_SIZE)
+
+
+def call_log_summaries_to_txt_raw(call_log_summaries: List[CallLogSummary], file_name: str) -> None:
+    """Store the call statistics of every caller in a single text file without formatting.
+
+    Args:
+        call_log_summaries (List[CallLogSummary]): Summaries to be stored.
+        file_name (str): Path of the summary file.
+
+    Returns:
+        None: Creates the .txt summary file.
+    """
+    with open_output(file_name) as file:
+        write_raw_lines(file, map(value_to_raw, call_log_summaries), RAW_BUFFER_SIZE)
@@ -0,0 +1,280 @@
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
+
+from .common import contact_resolver
+from .models import Contact, GeoPosition, Media, Message
+
+try:
+    import numpy
+except ImportError:  # NumPy is optional, `MessageBatch.to_numpy` is the only thing that needs it
+    numpy = None
+
+
+class NumberColumn(object):
+    """Nullable column of numbers, stored in an `array` of the given type code.
+
+    SQLite columns are dynamically typed, so the rare values the array can't hold (e.g. an empty string in a timestamp
+    column) are kept as they are in a dictionary by position.
+    """
+
+    def __init__(self, typecode: str) -> None:
+        self.values = array(typecode)
+        self.nulls = bytearray()
+        self.other_values: Dict[int, Any] = {}
+
+    def append(self, value: Optional[Any]) -> None:
+        if value is None:
+            self.nulls.append(True)
+            self.values.append(0)
+            return
+        self.nulls.append(False)
+        try:
+            self.values.append(value)
+        except (TypeError, OverflowError):
+            self.other_values[len(self.values)] = value
+            self.values.append(0)
+
+    def __getitem__(self, idx: int) -> Optional[Any]:
+        if self.nulls[idx]:
+            return None
+        if self.other_values and idx in self.other_values:
+            return self.other_values[idx]
+        return self.values[idx]
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class StringColumn(object):
+    """Nullable column of strings, stored back to back as UTF-8 in a single buffer with an array of end offsets."""
+
+    def __init__(self) -> None:
+        self.data = bytearray()
+        self.ends = array("q")
+        self.nulls = bytearray()
+
+    def append(self, value: Optional[str]) -> None:
+        self.nulls.append(value is None)
+        if value is not None:
+            self.data += value.encode("utf-8", "surrogatepass")
+        self.ends.append(len(self.data))
+
+    def __getitem__(self, idx: int) -> Optional[str]:
+        if self.nulls[idx]:
+            return None
+        start = self.ends[idx - 1] if idx else 0
+        return self.data[start:self.ends[idx]].decode("utf-8", "surrogatepass")
+
+    def __len__(self) -> int:
+        return len(self.ends)
+
+
+class DictionaryColumn(object):
+    """Nullable column of strings that repeat a lot, stored as codes into a list of the distinct values."""
+
+    def __init__(self) -> None:
+        self.codes = array("l")
+        self.distinct_values: List[str] = []
+        self.value_codes: Dict[str, int] = {}
+
+    def append(self, value: Optional[str]) -> None:
+        if value is None:
+            self.codes.append(-1)
+            return
+        code = self.value_codes.get(value)
+        if code is None:
+            code = self.value_codes[value] = len(self.distinct_values)
+            self.distinct_values.append(value)
+        self.codes.append(code)
+
+    def __getitem__(self, idx: int) -> Optional[str]:
+        code = self.codes[idx]
+        return None if code < 0 else self.distinct_values[code]
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+
+class MessageBatch(object):
+    """Messages of a chat stored column by column instead of one `Message` object per message.
+
+    Numbers are kept in `array` columns, text and paths in a single UTF-8 buffer per column and jids and mime types
+    as codes into their distinct values, so the memory of a batch grows by a few dozen bytes per message plus its
+    text. Iterating a batch builds the `Message` objects one at a time, and `to_dicts` renders them for the JSON
+    export without building them at all.
+
+    Args:
+        contacts (Dict[str, List[Contact]]): Dict of all contacts and jid as key, used to resolve the senders.
+    """
+
+    def __init__(self, contacts: Dict[str, List[Contact]]) -> None:
+        self.contacts = contacts
+        self.message_id = NumberColumn("q")
+        self.chat_id = NumberColumn("q")
+        self.timestamp = NumberColumn("q")
+        self.from_me = NumberColumn("b")
+        self.key_id = StringColumn()
+        self.sender_jid = DictionaryColumn()
+        self.text_data = StringColumn()
+        self.reply_to = StringColumn()
+        self.has_media = bytearray()
+        self.media_job_uuid = StringColumn()
+        self.file_path = StringColumn()
+        self.mime_type = DictionaryColumn()
+        self.has_geo_position = bytearray()
+        self.latitude = NumberColumn("d")
+        self.longitude = NumberColumn("d")
+
+    @classmethod
+    def from_rows(cls, contacts: Dict[str, List[Contact]], rows: Iterable[tuple]) -> "MessageBatch":
+        """Build a batch from rows with the columns of `chat_extractor.resolver.MESSAGE_ROWS_QUERY`.
+
+        Args:
+            contacts (Dict[str, List[Contact]]): Dict of all contacts and jid as key.
+            rows (Iterable[tuple]): Rows of the messages, in the order they are displayed.
+
+        Returns:
+            MessageBatch: Batch holding the given messages.
+        """
+        batch = cls(contacts)
+        for row in rows:
+            batch.append_row(row)
+        return batch
+
+    def append_row(self, row: tuple) -> None:
+        """Append a message from a row with the columns of `chat_extractor.resolver.MESSAGE_ROWS_QUERY`.
+
+        Args:
+            row (tuple): Row of the message.
+        """
+        (
+            message_id, key_id, chat_id, from_me, raw_string_jid, timestamp, text_data, reply_to,
+            media_message_id, media_job_uuid, file_path, mime_type,
+            geo_position_message_id, latitude, longitude,
+        ) = row
+        self.message_id.append(message_id)
+        self.chat_id.append(chat_id)
+        self.timestamp.append(timestamp)
+        self.from_me.append(from_me)
+        self.key_id.append(key_id)
+        # an empty jid has no sender contact, the same as a missing one
+        self.sender_jid.append(raw_string_jid or None)
+        self.text_data.append(text_data)
+        self.reply_to.append(reply_to)
+        # media and locations are joined on the message id, so their message_id column is not stored
+        self.has_media.append(media_message_id is not None)
+        self.media_job_uuid.append(media_job_uuid)
+        self.file_path.append(file_path)
+        self.mime_type.append(mime_type)
+        self.has_geo_position.append(geo_position_message_id is not None)
+        self.latitude.append(latitude)
+        self.longitude.append(longitude)
+
+    def __len__(self) -> int:
+        return len(self.message_id)
+
+    def __iter__(self) -> Iterator[Message]:
+        return (self.message(idx) for idx in range(len(self)))
+
+    def message(self, idx: int) -> Message:
+        """Build the `Message` at a given position of the batch.
+
+        Args:
+            idx (int): Position of the message in the batch.
+
+        Returns:
+            Message: The message, equal to the one built by `build_message_from_row` from the same row.
+        """
+        message_id = self.message_id[idx]
+        sender_jid = self.sender_jid[idx]
+        return Message(
+            message_id=message_id,
+            key_id=self.key_id[idx],
+            chat_id=self.chat_id[idx],
+            from_me=self.from_me[idx],
+            sender_contact=contact_resolver(self.contacts, sender_jid) if sender_jid else None,
+            timestamp=self.timestamp[idx],
+            text_data=self.text_data[idx],
+            media=Media(
+                message_id=message_id,
+                media_job_uuid=self.media_job_uuid[idx],
+                file_path=self.file_path[idx],
+                mime_type=self.mime_type[idx],
+            ) if self.has_media[idx] else None,
+            geo_position=GeoPosition(
+                message_id=message_id, latitude=self.latitude[idx], longitude=self.longitude[idx]
+            ) if self.has_geo_position[idx] else None,
+            reply_to=self.reply_to[idx],
+        )
+
+    def to_dicts(self) -> Iterator[Dict[str, Any]]:
+        """Render the messages as the dictionaries `attrs.asdict` returns for them, without building them.
+
+        Yields:
+            Dict[str, Any]: Dictionary of every message, in the order of the batch.
+        """
+        # the dictionary of every sender contact is built once and shared by all of its messages
+        sender_contacts = [
+            {"raw_string_jid": contact.raw_string_jid, "name": contact.name, "number": contact.number}
+            for contact in (contact_resolver(self.contacts, jid) for jid in self.sender_jid.distinct_values)
+        ]
+        for idx in range(len(self)):
+            message_id = self.message_id[idx]
+            sender_code = self.sender_jid.codes[idx]
+            yield {
+                "message_id": message_id,
+                "key_id": self.key_id[idx],
+                "chat_id": self.chat_id[idx],
+                "from_me": self.from_me[idx],
+                "sender_contact": sender_contacts[sender_code] if sender_code >= 0 else None,
+                "timestamp": self.timestamp[idx],
+                "text_data": self.text_data[idx],
+                "media": {
+                    "message_id": message_id,
+                    "media_job_uuid": self.media_job_uuid[idx],
+                    "file_path": self.file_path[idx],
+                    "mime_type": self.mime_type[idx],
+                } if self.has_media[idx] else None,
+                "geo_position": {
+                    "message_id": message_id, "latitude": self.latitude[idx], "longitude": self.longitude[idx]
+                } if self.has_geo_position[idx] else None,
+                "reply_to": self.reply_to[idx],
+            }
+
+    def sender_jids(self) -> List[str]:
+        """Get the jids of the senders of all messages that are not from me.
+
+        Returns:
+            List[str]: Unique jids, in the order of the first message they sent.
+        """
+        codes = dict.fromkeys(
+            code for code, from_me in zip(self.sender_jid.codes, self.from_me.values) if code >= 0 and not from_me
+        )
+        return [self.sender_jid.distinct_values[code] for code in codes]
+
+    def quoted_key_ids(self) -> Set[str]:
+        """Get the key_id of every message that is replied to in the batch.
+
+        Returns:
+            Set[str]: Key IDs of the messages that are replied to.
+        """
+        return {key_id for key_id in (self.reply_to[idx] for idx in range(len(self))) if key_id}
+
+    def to_numpy(self) -> Dict[str, Any]:
+        """Get the numeric columns as NumPy arrays that share the memory of the batch.
+
+        Returns:
+            Dict[str, numpy.ndarray]: 'message_id', 'chat_id', 'timestamp' and 'from_me' arrays. Null and
+                non-numeric values are 0.
+        """
+        if numpy is None:
+            raise ImportError("NumPy is required for 'MessageBatch.to_numpy'")
+        return {
+            name: numpy.frombuffer(column.values, dtype=column.values.typecode)
+            for name, column in (
+                ("message_id", self.message_id),
+                ("chat_id", self.chat_id),
+                ("timestamp", self.timestamp),
+                ("from_me", self.from_me),
+            )
+        }
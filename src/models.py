@@ -1,6 +1,6 @@
-from typing import List, Optional, Union
+from typing import Dict, Iterable, List, Optional, Set, Union
 
-from attrs import define
+from attrs import define, field
 
 
 @define
@@ -60,10 +60,17 @@ class Message(object):
 class Chat(object):
     chat_id: int  # Chat ID. Resolved from `chat._id`.
     chat_title: Optional[Union[Contact, GroupName]]  # Chat title.
-    messages: List[Optional[Message]]
+    messages: Iterable[Optional[Message]]  # A list, or a single-use iterator for a `ChatStream`.
     participants: List[Contact]
 
 
+@define
+class ChatStream(Chat):
+    """Chat whose messages are a single-use iterator streamed from the msgdb cursor instead of a list."""
+
+    quoted_key_ids: Set[str] = field(factory=set)  # Key IDs of the messages that are replied to in this chat. Resolved from `message._id -> message_quoted.message_row_id -> message_quoted.key_id`.
+
+
 @define
 class Call(object):
     call_row_id: int  # Call row ID. Resolved from `call_log._id`.
@@ -79,3 +86,17 @@ class CallLog(object):
     jid_row_id: int
     caller_id: Optional[Contact]
     calls: List[Optional[Call]]
+
+
+@define
+class CallLogSummary(object):
+    jid_row_id: int
+    caller_id: Optional[Contact]
+    call_count: int  # Number of calls. Resolved from `COUNT(call_log._id)`.
+    total_duration: int  # Duration of all calls in seconds. Resolved from `SUM(call_log.duration)`.
+    average_duration: float  # Average duration of a call in seconds. Resolved from `AVG(call_log.duration)`.
+    video_calls: int  # Resolved from `SUM(call_log.video_call)`.
+    voice_calls: int
+    outgoing_calls: int  # Calls made by me. Resolved from `SUM(call_log.from_me)`.
+    incoming_calls: int
+    call_results: Dict[Optional[int], int]  # Number of calls per `call_log.call_result`, None if it is NULL.
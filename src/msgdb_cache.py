@@ -0,0 +1,170 @@
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+from typing import Any, Dict, List, Tuple, Union
+
+# (table, column) pairs used by the per-id lookups of the extractors.
+LOOKUP_COLUMNS = [
+    ("message", "chat_row_id"),
+    ("message_media", "message_row_id"),
+    ("message_location", "message_row_id"),
+    ("message_quoted", "message_row_id"),
+    ("call_log", "jid_row_id"),
+    ("group_participants", "gjid"),
+]
+
+
+def file_fingerprint(file_path: str, with_hash: bool = True) -> Dict[str, Union[int, str]]:
+    """Fingerprint a file by its size, mtime and (optionally) the sha256 of its content.
+
+    Args:
+        file_path (str): Path of the file to fingerprint.
+        with_hash (bool): Whether to read the whole file to compute its sha256. Defaults to True.
+
+    Returns:
+        Dict[str, Union[int, str]]: Dictionary containing 'size', 'mtime_ns' and, if requested, 'sha256' keys.
+    """
+    stat = os.stat(file_path)
+    fingerprint = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if with_hash:
+        sha256 = hashlib.sha256()
+        with open(file_path, "rb") as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b""):
+                sha256.update(chunk)
+        fingerprint["sha256"] = sha256.hexdigest()
+    return fingerprint
+
+
+def database_fingerprint(db_path: str, with_hash: bool = True) -> Dict[str, Any]:
+    """Fingerprint a database and its write-ahead log, which holds the latest changes until it is checkpointed.
+
+    Args:
+        db_path (str): Path of the database file.
+        with_hash (bool): Whether to hash the content of the files. Defaults to True.
+
+    Returns:
+        Dict[str, Any]: Fingerprint of the database as returned by `file_fingerprint`, with the fingerprint of the
+            write-ahead log under 'wal' if there is one.
+    """
+    fingerprint: Dict[str, Any] = file_fingerprint(db_path, with_hash)
+    if os.path.exists(db_path + "-wal"):
+        fingerprint["wal"] = file_fingerprint(db_path + "-wal", with_hash)
+    return fingerprint
+
+
+def is_same_database(cached_fingerprint: Dict[str, Any], fingerprint: Dict[str, Any]) -> bool:
+    """Check whether the size and mtime of a fingerprint without hash match a cached fingerprint."""
+    if ("wal" in cached_fingerprint) != ("wal" in fingerprint):
+        return False
+    if "wal" in fingerprint and not is_same_database(cached_fingerprint["wal"], fingerprint["wal"]):
+        return False
+    return all(cached_fingerprint.get(key) == value for key, value in fingerprint.items() if key != "wal")
+
+
+def without_stat(fingerprint: Dict[str, Any]) -> Dict[str, Any]:
+    """Drop the size and mtime of a fingerprint, leaving the content hashes."""
+    return {
+        key: without_stat(value) if key == "wal" else value
+        for key, value in fingerprint.items() if key not in ("size", "mtime_ns")
+    }
+
+
+def is_indexed(db: sqlite3.Connection, table: str, column: str) -> bool:
+    """Check whether lookups on `table.column` can use an index or the integer primary key.
+
+    Args:
+        db (sqlite3.Connection): Database containing the table.
+        table (str): Name of the table.
+        column (str): Name of the column.
+
+    Returns:
+        bool: True if the column is the integer primary key or the leading column of an index.
+    """
+    for _, name, column_type, _, _, pk in db.execute(f"PRAGMA table_info('{table}')"):
+        if name == column and pk == 1 and column_type.upper() == "INTEGER":
+            return True
+    for index in db.execute(f"PRAGMA index_list('{table}')"):
+        index_columns = db.execute(f"PRAGMA index_info('{index[1]}')").fetchall()
+        if index_columns and index_columns[0][2] == column:
+            return True
+    return False
+
+
+def create_missing_indexes(db: sqlite3.Connection) -> List[Tuple[str, str]]:
+    """Create an index for every entry of `LOOKUP_COLUMNS` that is not indexed yet.
+
+    Tables that don't exist in this version of the msgdb are skipped.
+
+    Args:
+        db (sqlite3.Connection): Writable 'msgdb' connection.
+
+    Returns:
+        List[Tuple[str, str]]: (table, column) pairs for which an index was created.
+    """
+    tables = {name for (name,) in db.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    created = []
+    for table, column in LOOKUP_COLUMNS:
+        if table in tables and not is_indexed(db, table, column):
+            db.execute(f"CREATE INDEX '{table}_{column}_lookup_index' ON '{table}' ('{column}')")
+            created.append((table, column))
+    db.commit()
+    return created
+
+
+def indexed_copy(msgdb_path: str, cache_dir: str) -> str:
+    """Return the path of an indexed copy of the msgdb, building it if the cached one is missing or stale.
+
+    The source is only ever opened read-only. It is copied with the sqlite3 backup API into a scratch database in
+    `cache_dir`, the missing lookup indexes are built there and the result is renamed into place together with
+    the fingerprint of the source and its write-ahead log. The cached copy is reused while their size and mtime are
+    unchanged; if they changed, the content hashes decide whether the copy is still valid. The scratch database is
+    kept in `cache_dir` rather than the temporary directory, so it is renamed within one file system.
+
+    Args:
+        msgdb_path (str): Path to 'msgstore.db' file.
+        cache_dir (str): Directory in which the indexed copy is kept.
+
+    Returns:
+        str: Path to the indexed copy of the msgdb.
+    """
+    if not os.path.exists(cache_dir):
+        os.makedirs(cache_dir)
+    base_name = os.path.splitext(os.path.basename(msgdb_path))[0]
+    copy_path = os.path.join(cache_dir, f"{base_name}.indexed.db")
+    fingerprint_path = os.path.join(cache_dir, f"{base_name}.indexed.json")
+
+    cached_fingerprint = None
+    if os.path.exists(copy_path) and os.path.exists(fingerprint_path):
+        with open(fingerprint_path, "r", encoding="utf-8") as file:
+            cached_fingerprint = json.load(file)
+
+    fingerprint = database_fingerprint(msgdb_path, with_hash=False)
+    if cached_fingerprint and is_same_database(cached_fingerprint, fingerprint):
+        return copy_path
+
+    fingerprint = database_fingerprint(msgdb_path)
+    if not cached_fingerprint or without_stat(cached_fingerprint) != without_stat(fingerprint):
+        scratch_fd, scratch_path = tempfile.mkstemp(dir=cache_dir, suffix=".db")
+        os.close(scratch_fd)
+        try:
+            source = sqlite3.connect(f"file:{msgdb_path}?mode=ro", uri=True)
+            scratch = sqlite3.connect(scratch_path)
+            try:
+                source.backup(scratch, pages=4096)
+                # The scratch copy is disposable until it is renamed into place
+                scratch.execute("PRAGMA journal_mode=OFF")
+                scratch.execute("PRAGMA synchronous=OFF")
+                create_missing_indexes(scratch)
+            finally:
+                scratch.close()
+                source.close()
+            os.replace(scratch_path, copy_path)
+        finally:
+            if os.path.exists(scratch_path):
+                os.remove(scratch_path)
+
+    with open(fingerprint_path, "w", encoding="utf-8") as file:
+        json.dump(fingerprint, file)
+    return copy_path
@@ -0,0 +1,119 @@
+import sqlite3
+from collections import defaultdict
+from typing import Dict, Iterable, List
+
+# Length of the country codes that are dropped to index a number without its country code.
+COUNTRY_CODE_LENGTHS = (1, 2, 3)
+# Numbers without their country code must keep at least this many digits, so short numbers don't match everything.
+MIN_NATIONAL_NUMBER_LENGTH = 6
+
+
+def normalise_phone_number(phone_number: str) -> str:
+    """Normalise a phone number to its digits, without a leading '+' or '00' international prefix.
+
+    Values that aren't phone numbers, like the id of a group, are only stripped of whitespace.
+
+    Args:
+        phone_number (str): Phone number as given by the user, e.g. '+41 78 631 99 99' or '0041786319999'.
+
+    Returns:
+        str: Normalised phone number, e.g. '41786319999'.
+    """
+    phone_number = "".join(phone_number.split())
+    digits = phone_number.lstrip("+")
+    if not digits.isdigit():
+        return phone_number
+    if digits.startswith("00"):
+        digits = digits[2:]
+    return digits
+
+
+class PhoneNumberIndex(object):
+    """Index of the jids in the msgdb by the number in their user part, with and without the country code.
+
+    It is built with a single scan of `jid`, after which every phone number of a filter is resolved with a few
+    dictionary lookups instead of a `LIKE '%number@%'` scan of `jid`. Only a number that matches no jid this way is
+    matched against the end of every user part, in memory, so every number the `LIKE` filter matched still matches.
+    """
+
+    def __init__(self) -> None:
+        self.numbers: Dict[str, List[int]] = defaultdict(list)
+        self.national_numbers: Dict[str, List[int]] = defaultdict(list)
+
+    @classmethod
+    def build(cls, msgdb_cursor: sqlite3.Cursor) -> "PhoneNumberIndex":
+        """Build the index of all jids in the msgdb.
+
+        Args:
+            msgdb_cursor (sqlite3.Cursor): 'msgdb' cursor.
+
+        Returns:
+            PhoneNumberIndex: Index of all jids.
+        """
+        index = cls()
+        for jid_row_id, user in msgdb_cursor.execute("SELECT jid._id, jid.user FROM 'jid' ORDER BY jid._id"):
+            index.add(jid_row_id, user)
+        return index
+
+    def add(self, jid_row_id: int, user: str) -> None:
+        """Add a jid to the index.
+
+        Args:
+            jid_row_id (int): ID of the jid.
+            user (str): User part of the jid, the phone number for contacts and the group id for groups.
+        """
+        if not user:
+            return
+        self.numbers[user].append(jid_row_id)
+        if user.isdigit():
+            for country_code_length in COUNTRY_CODE_LENGTHS:
+                if len(user) - country_code_length >= MIN_NATIONAL_NUMBER_LENGTH:
+                    self.national_numbers[user[country_code_length:]].append(jid_row_id)
+
+    def jid_row_ids(self, phone_number: str) -> List[int]:
+        """Look up the jids of a phone number.
+
+        Args:
+            phone_number (str): Phone number with or without country code, or the id of a group.
+
+        Returns:
+            List[int]: IDs of the matching jids. Exact matches come first, then the jids whose number matches without
+                their country code, each ordered by ID. Without any of those, the jids whose user part ends with the
+                number, ordered by ID, like the `LIKE '%number@%'` filter.
+        """
+        number = normalise_phone_number(phone_number)
+        candidates = self.numbers.get(number, []) + self.national_numbers.get(number, [])
+        if number.isdigit() and number.startswith("0"):
+            # a national number with its trunk prefix, e.g. '0786319999'
+            candidates += self.national_numbers.get(number.lstrip("0"), [])
+        if not candidates and number:
+            # e.g. a number shorter than MIN_NATIONAL_NUMBER_LENGTH or the part of a group id after its '-'
+            candidates = sorted(
+                jid_row_id for user, jid_row_ids in self.numbers.items() if user.endswith(number)
+                for jid_row_id in jid_row_ids
+            )
+        return list(dict.fromkeys(candidates))
+
+    def load_filter(self, msgdb_cursor: sqlite3.Cursor, phone_numbers: Iterable[str]) -> None:
+        """Load the matching jids of the phone numbers of a filter into the temporary table `phone_number_filter`.
+
+        The table has a ('position', 'rank', 'jid_row_id') row for every match, where 'position' is the position of
+        the phone number in the filter and 'rank' the position of the jid in `jid_row_ids`, so resolvers can join it
+        against `jid` to resolve the whole filter with a single query.
+
+        Args:
+            msgdb_cursor (sqlite3.Cursor): 'msgdb' cursor. Temporary tables can be created on a read-only connection.
+            phone_numbers (Iterable[str]): Phone numbers of the filter.
+        """
+        msgdb_cursor.execute("DROP TABLE IF EXISTS temp.phone_number_filter")
+        msgdb_cursor.execute(
+            "CREATE TEMP TABLE phone_number_filter (position INTEGER, rank INTEGER, jid_row_id INTEGER, PRIMARY KEY (position, rank))"
+        )
+        msgdb_cursor.executemany(
+            "INSERT INTO temp.phone_number_filter VALUES (?, ?, ?)",
+            (
+                (position, rank, jid_row_id)
+                for position, phone_number in enumerate(phone_numbers)
+                for rank, jid_row_id in enumerate(self.jid_row_ids(phone_number))
+            ),
+        )
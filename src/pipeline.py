@@ -0,0 +1,215 @@
+import io
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import ExitStack
+from typing import Any, Callable, Iterable, List, Optional
+
+from src.exports.output import OutputOpener, use_output_opener
+from src.models import ChatStream
+
+# Number of loaded chats or call logs waiting to be rendered, and of rendered files waiting to be written.
+QUEUE_SIZE = 8
+
+# Marks the end of the prefetch queue.
+END_OF_QUEUE = object()
+
+
+class QueueStats:
+    """Depth of a bounded queue, sampled every time an item is taken from it."""
+
+    def __init__(self, name: str, max_size: int) -> None:
+        self.name = name
+        self.max_size = max_size
+        self.samples = 0
+        self.total_depth = 0
+        self.max_depth = 0
+
+    def sample(self, depth: int) -> None:
+        self.samples += 1
+        self.total_depth += depth
+        self.max_depth = max(self.max_depth, depth)
+
+    def __str__(self) -> str:
+        mean_depth = self.total_depth / self.samples if self.samples else 0.0
+        return f"{self.name}: max depth {self.max_depth}/{self.max_size}, mean depth {mean_depth:.1f}"
+
+
+class StageStats:
+    """Items processed by a pipeline stage, the time spent working and the time spent waiting on other stages."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.items = 0
+        self.busy = 0.0
+        self.waits = {}
+
+    def wait(self, on: str, seconds: float) -> None:
+        self.waits[on] = self.waits.get(on, 0.0) + seconds
+
+    def __str__(self) -> str:
+        waits = ", ".join(f"waiting for {on} {seconds:.2f}s" for on, seconds in self.waits.items())
+        return f"{self.name}: {self.items} items, busy {self.busy:.2f}s" + (f", {waits}" if waits else "")
+
+
+class RenderedFile(io.StringIO):
+    """In-memory export file that is handed to the writer stage when the exporter closes it."""
+
+    def __init__(self, file_path: str, on_close: Callable[[str, str], None]) -> None:
+        super().__init__()
+        self.file_path = file_path
+        self.on_close = on_close
+
+    def close(self) -> None:
+        if not self.closed:
+            content = self.getvalue()
+            super().close()
+            self.on_close(self.file_path, content)
+
+
+class ExportPipeline:
+    """Export chats or call logs in three overlapping stages.
+
+    A prefetch thread loads the next chats or call logs from its own msgdb connection, including all of their
+    messages, while the calling thread renders the current one into memory. Rendered files are written by a
+    small pool of writer threads. All files with the same path are written by the same thread, in the order they
+    were rendered, so when chats or call logs share a file the last one wins as in a serial export. The stages are connected by bounded queues, so memory stays limited when one
+    stage is slower than the others, and the time every stage spent waiting is reported at the end.
+
+    Args:
+        msgdb_path (str): Path to 'msgstore.db' file, opened read-only by the prefetch thread.
+        writer_threads (int): Number of threads writing the rendered files.
+    """
+
+    def __init__(self, msgdb_path: str, writer_threads: int = 4) -> None:
+        self.msgdb_path = msgdb_path
+        self.writer_threads = writer_threads
+        self.prefetch_queue_stats = QueueStats("prefetch queue", QUEUE_SIZE)
+        self.write_queue_stats = QueueStats("write queue", QUEUE_SIZE)
+        self.prefetch_stats = StageStats("prefetch")
+        self.render_stats = StageStats("render")
+        self.write_stats = StageStats("write")
+        self.write_stats_lock = threading.Lock()
+        self.pending_writes = 0
+        self.stopped = threading.Event()
+
+    def prefetch(self, load: Callable[[sqlite3.Cursor], Iterable[Any]], prefetched: queue.Queue) -> None:
+        """Load all items with `load` on a new msgdb connection and put them into `prefetched`.
+
+        The messages of a ChatStream are read into a list, because its cursor belongs to this thread.
+        """
+        try:
+            msgdb = sqlite3.connect(f"file:{self.msgdb_path}?mode=ro", uri=True)
+            try:
+                items = iter(load(msgdb.cursor()))
+                while not self.stopped.is_set():
+                    start = time.perf_counter()
+                    item = next(items, END_OF_QUEUE)
+                    if isinstance(item, ChatStream):
+                        item.messages = list(item.messages)
+                    self.prefetch_stats.busy += time.perf_counter() - start
+                    if item is END_OF_QUEUE:
+                        break
+                    self.prefetch_stats.items += 1
+
+                    start = time.perf_counter()
+                    prefetched.put(item)
+                    self.prefetch_stats.wait("render", time.perf_counter() - start)
+            finally:
+                msgdb.close()
+        except BaseException as error:
+            prefetched.put(error)
+        prefetched.put(END_OF_QUEUE)
+
+    def write(self, opener: OutputOpener, file_path: str, content: str, write_slots: threading.Semaphore) -> None:
+        """Write a rendered file with `opener` and free its slot in the write queue."""
+        try:
+            start = time.perf_counter()
+            with opener(file_path) as file:
+                file.write(content)
+            with self.write_stats_lock:
+                self.write_stats.items += 1
+                self.write_stats.busy += time.perf_counter() - start
+        finally:
+            with self.write_stats_lock:
+                self.pending_writes -= 1
+            write_slots.release()
+
+    def run(
+            self,
+            load: Callable[[sqlite3.Cursor], Iterable[Any]],
+            export: Callable[[Any], None],
+            progress: Optional[Callable[[], None]] = None
+    ) -> None:
+        """Export every item returned by `load`.
+
+        Args:
+            load (Callable[[sqlite3.Cursor], Iterable[Any]]): Loads the chats or call logs from a msgdb cursor.
+            export (Callable[[Any], None]): Exports a single chat or call log through `open_output`.
+            progress (Optional[Callable[[], None]]): Called after every rendered item.
+        """
+        self.stopped.clear()
+        prefetched = queue.Queue(maxsize=QUEUE_SIZE)
+        prefetcher = threading.Thread(target=self.prefetch, args=(load, prefetched), daemon=True)
+        write_slots = threading.Semaphore(QUEUE_SIZE)
+        writes: List[Future] = []
+
+        with ExitStack() as stack:
+            writers = [
+                stack.enter_context(ThreadPoolExecutor(max_workers=1)) for _ in range(max(self.writer_threads, 1))
+            ]
+            file_opener = stack.enter_context(
+                use_output_opener(lambda file_path: RenderedFile(file_path, submit_write))
+            )
+
+            def submit_write(file_path: str, content: str) -> None:
+                start = time.perf_counter()
+                write_slots.acquire()
+                self.render_stats.wait("write", time.perf_counter() - start)
+                with self.write_stats_lock:
+                    self.write_queue_stats.sample(self.pending_writes)
+                    self.pending_writes += 1
+                # case-folded, so the files of a case-insensitive file system that share a path share a writer too
+                writer = writers[hash(file_path.casefold()) % len(writers)]
+                writes.append(writer.submit(self.write, file_opener, file_path, content, write_slots))
+
+            prefetcher.start()
+            try:
+                while True:
+                    start = time.perf_counter()
+                    self.prefetch_queue_stats.sample(prefetched.qsize())
+                    item = prefetched.get()
+                    self.render_stats.wait("prefetch", time.perf_counter() - start)
+                    if item is END_OF_QUEUE:
+                        break
+                    if isinstance(item, BaseException):
+                        raise item
+
+                    start = time.perf_counter()
+                    wait = sum(self.render_stats.waits.values())
+                    export(item)
+                    self.render_stats.busy += time.perf_counter() - start - (sum(self.render_stats.waits.values()) - wait)
+                    self.render_stats.items += 1
+                    if progress:
+                        progress()
+            finally:
+                # Stop the prefetch thread, which may be blocked on a full queue
+                self.stopped.set()
+                while prefetcher.is_alive():
+                    try:
+                        prefetched.get(timeout=0.1)
+                    except queue.Empty:
+                        pass
+
+        for write in writes:
+            write.result()
+
+    def report(self) -> str:
+        """Return the queue depths and per-stage times of the export."""
+        return "\n".join(
+            str(stats) for stats in (
+                self.prefetch_queue_stats, self.write_queue_stats, self.prefetch_stats, self.render_stats, self.write_stats
+            )
+        )
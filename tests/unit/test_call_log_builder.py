@@ -1,6 +1,9 @@
+import shutil
 import sqlite3
 
 from src.call_log_extractor import builder
+from src.contact_extractor import builder as contact_builder
+from src.phone_number_index import PhoneNumberIndex
 from tests.unit.data.expected_call_log_builder_results import (
     expected_build_all_call_logs,
     expected_build_call_for_given_id_results,
@@ -80,3 +83,102 @@ def test_build_all_chats():
 
     msgdb.close()
     wadb.close()
+
+
+def test_build_all_call_logs_matches_build_call_log_for_given_id():
+    msgdb = sqlite3.connect("tests/unit/data/test_msgstore.db")
+    msgdb_cursor = msgdb.cursor()
+    wadb = sqlite3.connect("tests/unit/data/test_wa.db")
+    contacts = contact_builder.build_all_contacts(wadb.cursor())
+
+    call_logs = list(builder.build_all_call_logs(msgdb_cursor, contacts))
+
+    jid_row_ids = [jid_row_id for (jid_row_id,) in msgdb_cursor.execute("SELECT _id FROM jid ORDER BY _id")]
+    expected_call_logs = [
+        call_log
+        for call_log in (
+            builder.build_call_log_for_given_id_or_phone_number(msgdb_cursor, contacts, jid_row_id=jid_row_id)
+            for jid_row_id in jid_row_ids
+        )
+        if call_log.calls
+    ]
+    assert call_logs
+    assert call_logs == expected_call_logs
+
+    msgdb.close()
+    wadb.close()
+
+
+def test_build_call_log_summaries():
+    msgdb = sqlite3.connect("tests/unit/data/test_msgstore.db")
+    msgdb_cursor = msgdb.cursor()
+    wadb = sqlite3.connect("tests/unit/data/test_wa.db")
+    contacts = contact_builder.build_all_contacts(wadb.cursor())
+
+    summaries = builder.build_call_log_summaries(msgdb_cursor, contacts)
+
+    call_logs = {call_log.jid_row_id: call_log for call_log in builder.build_all_call_logs(msgdb_cursor, contacts)}
+    assert sorted(summary.jid_row_id for summary in summaries) == sorted(call_logs)
+    assert [summary.call_count for summary in summaries] == sorted(
+        (summary.call_count for summary in summaries), reverse=True
+    )
+    for summary in summaries:
+        calls = call_logs[summary.jid_row_id].calls
+        assert summary.caller_id == call_logs[summary.jid_row_id].caller_id
+        assert summary.call_count == len(calls)
+        assert summary.total_duration == sum(call.duration for call in calls)
+        assert summary.average_duration == sum(call.duration for call in calls) / len(calls)
+        assert summary.video_calls == sum(1 for call in calls if call.video_call)
+        assert summary.voice_calls == sum(1 for call in calls if not call.video_call)
+        assert summary.outgoing_calls == sum(1 for call in calls if call.from_me)
+        assert summary.incoming_calls == sum(1 for call in calls if not call.from_me)
+        assert sum(summary.call_results.values()) == len(calls)
+
+    filtered_summaries = builder.build_call_log_summaries(msgdb_cursor, contacts, phone_numbers=["728678956227"])
+    assert [summary.caller_id.number for summary in filtered_summaries] == ["+728678956227"]
+
+    msgdb.close()
+    wadb.close()
+
+
+def test_build_call_log_summaries_with_null_call_result(tmp_path):
+    msgdb_path = str(tmp_path / "msgstore.db")
+    shutil.copyfile("tests/unit/data/test_msgstore.db", msgdb_path)
+    msgdb = sqlite3.connect(msgdb_path)
+    jid_row_id = msgdb.execute("SELECT jid_row_id FROM call_log ORDER BY _id LIMIT 1").fetchone()[0]
+    msgdb.execute("UPDATE call_log SET call_result = NULL WHERE _id = (SELECT MIN(_id) FROM call_log)")
+    wadb = sqlite3.connect("tests/unit/data/test_wa.db")
+    contacts = contact_builder.build_all_contacts(wadb.cursor())
+
+    summaries = {summary.jid_row_id: summary for summary in builder.build_call_log_summaries(msgdb.cursor(), contacts)}
+
+    assert summaries[jid_row_id].call_results[None] == 1
+    for summary in summaries.values():
+        assert sum(summary.call_results.values()) == summary.call_count
+
+    msgdb.close()
+    wadb.close()
+
+
+def test_build_call_logs_for_phone_numbers():
+    msgdb = sqlite3.connect("tests/unit/data/test_msgstore.db")
+    msgdb_cursor = msgdb.cursor()
+    wadb = sqlite3.connect("tests/unit/data/test_wa.db")
+    contacts = contact_builder.build_all_contacts(wadb.cursor())
+    phone_number_index = PhoneNumberIndex.build(msgdb_cursor)
+
+    phone_numbers = ["728678956227", "972071704671", "123", "922359962900"]
+    call_logs = list(
+        builder.build_call_logs_for_phone_numbers(msgdb_cursor, contacts, phone_numbers, phone_number_index)
+    )
+
+    expected_call_logs = [
+        builder.build_call_log_for_given_id_or_phone_number(msgdb_cursor, contacts, phone_number=phone_number)
+        for phone_number in phone_numbers
+        if phone_number != "123"
+    ]
+    assert call_logs == expected_call_logs
+    assert [bool(call_log.calls) for call_log in call_logs] == [True, False, True]
+
+    msgdb.close()
+    wadb.close()
@@ -0,0 +1,161 @@
+import shutil
+import sqlite3
+
+from src.chat_extractor import builder
+from src.contact_extractor import builder as contact_builder
+from src.phone_number_index import PhoneNumberIndex
+
+
+def test_build_messages_for_given_chat_id():
+    msgdb = sqlite3.connect("tests/unit/data/test_msgstore.db")
+    msgdb_cursor = msgdb.cursor()
+    wadb = sqlite3.connect("tests/unit/data/test_wa.db")
+    contacts = contact_builder.build_all_contacts(wadb.cursor())
+
+    for chat_row_id in [463, 545, 533]:
+        message_ids = [
+            message_id
+            for (message_id,) in msgdb_cursor.execute(
+                "SELECT _id FROM message WHERE chat_row_id=? ORDER BY sort_id, _id",
+                (chat_row_id,),
+            )
+        ]
+        assert list(
+            builder.build_messages_for_given_chat_id(msgdb_cursor, contacts, chat_row_id)
+        ) == [
+            builder.build_message_for_given_id(msgdb_cursor, contacts, message_id)
+            for message_id in message_ids
+        ]
+
+    msgdb.close()
+    wadb.close()
+
+
+def test_build_all_chats_matches_build_chat_for_given_id():
+    msgdb = sqlite3.connect("tests/unit/data/test_msgstore.db")
+    msgdb_cursor = msgdb.cursor()
+    wadb = sqlite3.connect("tests/unit/data/test_wa.db")
+    contacts = contact_builder.build_all_contacts(wadb.cursor())
+
+    chats = list(builder.build_all_chats(msgdb_cursor, contacts))
+    assert [chat.chat_id for chat in chats] == [456, 463, 484, 497, 533, 545, 562, 583]
+    for chat in chats:
+        expected_chat = builder.build_chat_for_given_id_or_phone_number(
+            msgdb_cursor, contacts, chat_row_id=chat.chat_id
+        )
+        assert chat.chat_title == expected_chat.chat_title
+        assert chat.messages == expected_chat.messages
+        assert sorted(chat.participants, key=str) == sorted(
+            expected_chat.participants, key=str
+        )
+
+    msgdb.close()
+    wadb.close()
+
+
+def test_build_chats_from_scan_splits_the_scan(tmp_path):
+    msgdb_path = str(tmp_path / "msgstore.db")
+    shutil.copyfile("tests/unit/data/test_msgstore.db", msgdb_path)
+    msgdb = sqlite3.connect(msgdb_path)
+    # messages without a chat before, between and after the chats of the scan
+    msgdb.executemany(
+        "INSERT INTO message (chat_row_id, from_me, key_id, timestamp, received_timestamp, text_data, sort_id) "
+        "VALUES (?, 0, ?, 0, 0, 'orphan', 0)",
+        [(1, "orphan-1"), (500, "orphan-500"), (9999, "orphan-9999")],
+    )
+    msgdb_cursor = msgdb.cursor()
+    wadb = sqlite3.connect("tests/unit/data/test_wa.db")
+    contacts = contact_builder.build_all_contacts(wadb.cursor())
+
+    def expected_messages(chat_id):
+        return builder.build_chat_for_given_id_or_phone_number(msgdb_cursor, contacts, chat_row_id=chat_id).messages
+
+    def assert_split(chats, chat_ids):
+        # the chats are left unread, read partially or read completely by the consumer
+        for idx, chat in enumerate(chats):
+            assert chat.chat_id == chat_ids[idx]
+            if idx % 3 == 1:
+                assert next(iter(chat.messages)) == expected_messages(chat.chat_id)[0]
+            elif idx % 3 == 2:
+                assert list(chat.messages) == expected_messages(chat.chat_id)
+        assert idx == len(chat_ids) - 1
+
+    chat_ids = [chat.chat_id for chat in builder.build_all_chats(msgdb_cursor, contacts)]
+    assert chat_ids == [456, 463, 484, 497, 533, 545, 562, 583]
+    assert_split(builder.build_all_chats(msgdb_cursor, contacts, stream=True), chat_ids)
+    assert_split(builder.build_chats_for_chat_ids(msgdb_cursor, contacts, chat_ids + [1, 500], stream=True), chat_ids)
+
+    # the chats are split in the order of the IDs, without duplicates and missing chats
+    chat_ids = [583, 1, 456, 545, 456, 500, 463]
+    for columnar in (False, True):
+        chats = list(builder.build_chats_for_chat_ids(msgdb_cursor, contacts, chat_ids, columnar=columnar))
+        assert [chat.chat_id for chat in chats] == [583, 456, 545, 463]
+        for chat in chats:
+            assert list(chat.messages) == expected_messages(chat.chat_id)
+
+    msgdb.close()
+    wadb.close()
+
+
+def test_build_all_chats_stream():
+    msgdb = sqlite3.connect("tests/unit/data/test_msgstore.db")
+    msgdb_cursor = msgdb.cursor()
+    wadb = sqlite3.connect("tests/unit/data/test_wa.db")
+    contacts = contact_builder.build_all_contacts(wadb.cursor())
+
+    chats = list(builder.build_all_chats(msgdb_cursor, contacts))
+    for chat in builder.build_all_chats(msgdb_cursor, contacts, stream=True):
+        expected_chat = chats.pop(0)
+        assert chat.chat_id == expected_chat.chat_id
+        assert chat.chat_title == expected_chat.chat_title
+        assert sorted(chat.participants, key=str) == sorted(
+            expected_chat.participants, key=str
+        )
+        assert list(chat.messages) == expected_chat.messages
+        assert chat.quoted_key_ids == set()
+
+        chat_stream = builder.build_chat_for_given_id_or_phone_number(
+            msgdb_cursor, contacts, chat_row_id=chat.chat_id, stream=True
+        )
+        assert sorted(chat_stream.participants, key=str) == sorted(
+            expected_chat.participants, key=str
+        )
+        assert list(chat_stream.messages) == expected_chat.messages
+    assert chats == []
+
+    msgdb.close()
+    wadb.close()
+
+
+def test_build_chats_for_phone_numbers():
+    msgdb = sqlite3.connect("tests/unit/data/test_msgstore.db")
+    msgdb_cursor = msgdb.cursor()
+    wadb = sqlite3.connect("tests/unit/data/test_wa.db")
+    contacts = contact_builder.build_all_contacts(wadb.cursor())
+    phone_number_index = PhoneNumberIndex.build(msgdb_cursor)
+
+    phone_numbers = ["972071704671", "123", "899167416177-1533072403", "972071704671", "728678956227"]
+    expected_chats = [
+        builder.build_chat_for_given_id_or_phone_number(msgdb_cursor, contacts, phone_number=phone_number)
+        for phone_number in ["972071704671", "899167416177-1533072403", "728678956227"]
+    ]
+
+    chats = list(
+        builder.build_chats_for_phone_numbers(msgdb_cursor, contacts, phone_numbers, phone_number_index)
+    )
+    assert [chat.chat_id for chat in chats] == [chat.chat_id for chat in expected_chats]
+    for chat, expected_chat in zip(chats, expected_chats):
+        assert chat.chat_title == expected_chat.chat_title
+        assert sorted(chat.participants, key=str) == sorted(expected_chat.participants, key=str)
+        assert chat.messages == expected_chat.messages
+
+    # ChatStreams share the scan, also when a chat is not consumed
+    chat_streams = builder.build_chats_for_phone_numbers(
+        msgdb_cursor, contacts, phone_numbers, phone_number_index, stream=True
+    )
+    next(chat_streams)
+    for chat, expected_chat in zip(chat_streams, expected_chats[1:]):
+        assert list(chat.messages) == expected_chat.messages
+
+    msgdb.close()
+    wadb.close()
@@ -142,3 +142,70 @@ def test_chat_resolver_with_phone_number():
         )
 
     msgdb.close()
+
+
+def test_chat_messages_resolver():
+    msgdb = sqlite3.connect("tests/unit/data/test_msgstore.db")
+    msgdb_cursor = msgdb.cursor()
+
+    rows = resolver.chat_messages_resolver(msgdb_cursor, chat_row_id=545).fetchall()
+    assert [row[0] for row in rows] == [
+        158373, 158374, 158375, 158376, 158377, 158378, 158379, 158380,
+        158381, 158382, 158383, 158384, 158390, 158391, 158392,
+    ]
+
+    # media of 158375 is joined in, other messages of the chat have none
+    media_row = rows[2]
+    assert media_row[4] == "589431685089@s.whatsapp.net"
+    assert media_row[8:12] == (
+        158375,
+        "e16c9bec-0e8c-4beb-94bd-67ebb8103a64",
+        "Media/WhatsApp Images/IMG-20181127-WA0028.jpg",
+        "image/jpeg",
+    )
+    assert all(row[8] is None for row in rows if row[0] != 158375)
+
+    msgdb.close()
+
+
+def test_all_group_chat_participant_jids_resolver():
+    msgdb = sqlite3.connect("tests/unit/data/test_msgstore.db")
+    msgdb_cursor = msgdb.cursor()
+
+    participant_jids = resolver.all_group_chat_participant_jids_resolver(msgdb_cursor)
+    assert participant_jids
+    for gjid, jids in participant_jids.items():
+        assert jids == resolver.group_chat_participant_jid_resolver(msgdb_cursor, gjid)
+
+    msgdb.close()
+
+
+def test_chat_sender_jids_resolver():
+    msgdb = sqlite3.connect("tests/unit/data/test_msgstore.db")
+    msgdb_cursor = msgdb.cursor()
+
+    assert resolver.chat_sender_jids_resolver(msgdb_cursor, 545) == [
+        "589431685089@s.whatsapp.net",
+        "669233817152@s.whatsapp.net",
+        "719080917801@s.whatsapp.net",
+        "970338350633@s.whatsapp.net",
+    ]
+    # only messages from me
+    assert resolver.chat_sender_jids_resolver(msgdb_cursor, 533) == []
+
+    sender_jids = resolver.all_chat_sender_jids_resolver(msgdb_cursor)
+    for chat_id, jids in sender_jids.items():
+        assert jids == resolver.chat_sender_jids_resolver(msgdb_cursor, chat_id)
+
+    msgdb.close()
+
+
+def test_chat_quoted_key_ids_resolver():
+    msgdb = sqlite3.connect("tests/unit/data/test_msgstore.db")
+    msgdb_cursor = msgdb.cursor()
+
+    # the test database has no replies
+    assert resolver.chat_quoted_key_ids_resolver(msgdb_cursor, 545) == set()
+    assert resolver.all_chat_quoted_key_ids_resolver(msgdb_cursor) == {}
+
+    msgdb.close()
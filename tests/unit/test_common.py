@@ -1,6 +1,7 @@
 import sqlite3
 
-from src.common import contact_resolver
+from src.common import ContactDirectory, contact_resolver, contact_to_full_str, contact_to_str
+from src.contact_extractor import builder as contact_builder
 
 
 def test_contact_resolver():
@@ -22,3 +23,16 @@ def test_contact_resolver():
         assert contact_resolver(wadb_cursor, raw_string_jid) == expected_result
 
     wadb.close()
+
+
+def test_contact_directory():
+    wadb = sqlite3.connect("tests/unit/data/test_wa.db")
+    contacts = contact_builder.build_all_contacts(wadb.cursor())
+
+    assert isinstance(contacts, ContactDirectory)
+    for raw_string_jid in ["972071704671@s.whatsapp.net", "899167416177-1533072403@g.us", "000000000000@s.whatsapp.net"]:
+        contact = contact_resolver(contacts, raw_string_jid)
+        assert contact is contact_resolver(contacts, raw_string_jid)
+        assert contacts.contact_to_str(contact) == contact_to_str(contact)
+        assert contacts.contact_to_full_str(contact) == contact_to_full_str(contact)
+    assert contact_resolver(contacts, "000000000000@s.whatsapp.net").name is None
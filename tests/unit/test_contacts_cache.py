@@ -0,0 +1,60 @@
+import os
+import shutil
+import sqlite3
+
+from src import contacts_cache
+from src.contact_extractor import builder as contact_builder
+
+
+def create_wadb(file_path):
+    db = sqlite3.connect(file_path)
+    db.execute("CREATE TABLE wa_contacts (_id INTEGER PRIMARY KEY, jid TEXT, number TEXT, display_name TEXT)")
+    db.executemany(
+        "INSERT INTO wa_contacts (jid, number, display_name) VALUES (?, ?, ?)",
+        [("41786319999@s.whatsapp.net", "+41786319999", "Anna"), ("41786318888@s.whatsapp.net", None, None)],
+    )
+    db.commit()
+    db.close()
+
+
+def test_cached_contacts_match_built_contacts(tmp_path):
+    # a read-only connection leaves the -shm and -wal files of the WAL mode fixture behind, so a copy is read
+    wadb_path = str(tmp_path / "wa.db")
+    shutil.copyfile("tests/unit/data/test_wa.db", wadb_path)
+    wadb = sqlite3.connect(wadb_path)
+    expected_contacts = dict(contact_builder.build_all_contacts(wadb.cursor()))
+    wadb.close()
+
+    cache_dir = str(tmp_path / "cache")
+    # built from the wa.db, then read from the cache
+    assert dict(contacts_cache.cached_contacts(wadb_path, cache_dir)) == expected_contacts
+    assert dict(contacts_cache.cached_contacts(wadb_path, cache_dir)) == expected_contacts
+
+
+def test_cached_contacts_are_reused_until_wadb_changes(tmp_path):
+    wadb_path = str(tmp_path / "wa.db")
+    create_wadb(wadb_path)
+    cache_dir = str(tmp_path / "cache")
+    cache_path = os.path.join(cache_dir, "wa.contacts")
+
+    contacts = contacts_cache.cached_contacts(wadb_path, cache_dir)
+    assert contacts["41786319999@s.whatsapp.net"][0].name == "Anna"
+    cache_inode = os.stat(cache_path).st_ino
+
+    # unchanged wa.db
+    contacts_cache.cached_contacts(wadb_path, cache_dir)
+    assert os.stat(cache_path).st_ino == cache_inode
+
+    # touched but identical wa.db, the cache is kept with the new mtime
+    wadb_mtime_ns = os.stat(wadb_path).st_mtime_ns
+    os.utime(wadb_path, ns=(wadb_mtime_ns + 10**9, wadb_mtime_ns + 10**9))
+    assert dict(contacts_cache.cached_contacts(wadb_path, cache_dir)) == dict(contacts)
+    assert contacts_cache.read_contacts_cache(cache_path)[0]["mtime_ns"] == wadb_mtime_ns + 10**9
+
+    # changed wa.db
+    db = sqlite3.connect(wadb_path)
+    db.execute("UPDATE wa_contacts SET display_name='Anne' WHERE number='+41786319999'")
+    db.commit()
+    db.close()
+    contacts = contacts_cache.cached_contacts(wadb_path, cache_dir)
+    assert contacts["41786319999@s.whatsapp.net"][0].name == "Anne"
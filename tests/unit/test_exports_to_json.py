@@ -1,9 +1,20 @@
 import json
 
+from attrs import asdict
 from deepdiff import DeepDiff
 
 from src.exports import to_json
-from src.models import Call, CallLog, Chat, Contact, GeoPosition, Media, Message
+from src.models import (
+    Call,
+    CallLog,
+    Chat,
+    ChatStream,
+    Contact,
+    GeoPosition,
+    GroupName,
+    Media,
+    Message,
+)
 
 
 def test_export_chats_to_json(tmp_path):
@@ -146,3 +157,99 @@ def test_export_call_logs_to_json(tmp_path):
         )
         == {}
     )
+
+
+def test_export_chat_stream_to_json(tmp_path):
+    messages = [
+        Message(
+            message_id=158375,
+            key_id="E00CEB0FF3CFCC183A2082D1478A3ACC",
+            chat_id=545,
+            from_me=0,
+            sender_contact=Contact(
+                raw_string_jid="589431685089@s.whatsapp.net",
+                name="Oddbjørn Marques",
+                number="+589431685089",
+            ),
+            timestamp=1543325180845,
+            text_data="Ut at dui orci.\n😂",
+            media=Media(
+                message_id=158375,
+                media_job_uuid="e16c9bec-0e8c-4beb-94bd-67ebb8103a64",
+                file_path="Media/WhatsApp Images/IMG-20181127-WA0028.jpg",
+                mime_type="image/jpeg",
+            ),
+            geo_position=GeoPosition(
+                message_id=158375, latitude=65.754409, longitude=-168.924534
+            ),
+            reply_to=None,
+        ),
+        Message(
+            message_id=158376,
+            key_id="EAD217166463F44C5EE6A088F6571E8B",
+            chat_id=545,
+            from_me=1,
+            sender_contact=None,
+            timestamp=1543325182506,
+            text_data="Aliquam erat volutpat!",
+            media=None,
+            geo_position=None,
+            reply_to="E00CEB0FF3CFCC183A2082D1478A3ACC",
+        ),
+    ]
+    chat_title = GroupName(raw_string_jid="899167416177-1533072403@g.us", name="Vivamus bibendum")
+    participants = [
+        Contact(raw_string_jid="589431685089@s.whatsapp.net", name="Oddbjørn Marques", number="+589431685089"),
+        Contact(raw_string_jid="15106049490@s.whatsapp.net", name=None, number=None),
+    ]
+
+    for chat_messages in [messages, []]:
+        test_chat = ChatStream(
+            chat_id=545,
+            chat_title=chat_title,
+            messages=iter(chat_messages),
+            participants=participants,
+            quoted_key_ids={"E00CEB0FF3CFCC183A2082D1478A3ACC"},
+        )
+        to_json.chat_to_json(chat=test_chat, folder=f"{tmp_path}")
+
+        expected_chat = Chat(chat_id=545, chat_title=chat_title, messages=chat_messages, participants=participants)
+        with open(f"{tmp_path}/Vivamus bibendum.json", encoding="utf8") as f:
+            assert f.read() == json.dumps(asdict(expected_chat), sort_keys=True, indent=4, ensure_ascii=False)
+
+
+def test_export_compact_json(tmp_path):
+    call_log = CallLog(
+        jid_row_id=16,
+        caller_id=Contact(raw_string_jid="669233817152@s.whatsapp.net", name="Izebel Bengtsdotter", number="+669233817152"),
+        calls=[
+            Call(call_row_id=929, from_me=1, timestamp=1545829680246, video_call=0, duration=0, call_result=4),
+            None,
+        ],
+    )
+    to_json.call_log_to_json(call_log=call_log, folder=f"{tmp_path}", compact=True)
+    with open(f"{tmp_path}/Izebel Bengtsdotter (+669233817152).json", encoding="utf8") as f:
+        assert f.read() == json.dumps(asdict(call_log), sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+
+    chat = Chat(
+        chat_id=545,
+        chat_title=GroupName(raw_string_jid="899167416177-1533072403@g.us", name="Vivamus bibendum"),
+        messages=[
+            Message(
+                message_id=158376,
+                key_id="EAD217166463F44C5EE6A088F6571E8B",
+                chat_id=545,
+                from_me=0,
+                sender_contact=Contact(raw_string_jid="15106049490@s.whatsapp.net", name=None, number=None),
+                timestamp=1543325182506,
+                text_data="Aliquam erat volutpat! 😂",
+                media=None,
+                geo_position=GeoPosition(message_id=158376, latitude=65.754409, longitude=-168.924534),
+                reply_to=None,
+            ),
+        ],
+        participants=[Contact(raw_string_jid="15106049490@s.whatsapp.net", name=None, number=None)],
+    )
+    to_json.chat_to_json(chat=chat, folder=f"{tmp_path}", compact=True)
+    with open(f"{tmp_path}/Vivamus bibendum.json", encoding="utf8") as f:
+        assert f.read() == json.dumps(asdict(chat), sort_keys=True, ensure_ascii=False, separators=(",", ":"))
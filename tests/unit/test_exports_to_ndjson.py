@@ -0,0 +1,75 @@
+import json
+
+from attrs import asdict
+
+from src.exports import to_ndjson
+from src.models import Call, CallLog, ChatStream, Contact, GroupName, Media, Message
+
+
+def test_export_chat_stream_to_ndjson(tmp_path):
+    messages = [
+        Message(
+            message_id=158375,
+            key_id="E00CEB0FF3CFCC183A2082D1478A3ACC",
+            chat_id=545,
+            from_me=0,
+            sender_contact=Contact(
+                raw_string_jid="589431685089@s.whatsapp.net", name="Oddbjørn Marques", number="+589431685089"
+            ),
+            timestamp=1543325180845,
+            text_data="Ut at dui orci.\n😂",
+            media=Media(
+                message_id=158375,
+                media_job_uuid="e16c9bec-0e8c-4beb-94bd-67ebb8103a64",
+                file_path="Media/WhatsApp Images/IMG-20181127-WA0028.jpg",
+                mime_type="image/jpeg",
+            ),
+            geo_position=None,
+            reply_to=None,
+        ),
+        Message(
+            message_id=158376,
+            key_id="EAD217166463F44C5EE6A088F6571E8B",
+            chat_id=545,
+            from_me=1,
+            sender_contact=None,
+            timestamp=1543325182506,
+            text_data="Aliquam erat volutpat!",
+            media=None,
+            geo_position=None,
+            reply_to="E00CEB0FF3CFCC183A2082D1478A3ACC",
+        ),
+    ]
+    chat_title = GroupName(raw_string_jid="899167416177-1533072403@g.us", name="Vivamus bibendum")
+    participants = [
+        Contact(raw_string_jid="589431685089@s.whatsapp.net", name="Oddbjørn Marques", number="+589431685089"),
+    ]
+    test_chat = ChatStream(chat_id=545, chat_title=chat_title, messages=iter(messages), participants=participants)
+
+    to_ndjson.chat_to_ndjson(chat=test_chat, folder=f"{tmp_path}")
+
+    with open(f"{tmp_path}/Vivamus bibendum.ndjson", encoding="utf8") as f:
+        lines = f.read().split("\n")
+    assert lines[-1] == ""
+    assert [json.loads(line) for line in lines[:-1]] == [
+        {"chat_id": 545, "chat_title": asdict(chat_title), "participants": [asdict(participants[0])]},
+        asdict(messages[0]),
+        asdict(messages[1]),
+    ]
+
+
+def test_export_call_log_to_ndjson_in_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(to_ndjson, "NDJSON_BUFFER_SIZE", 1)
+    caller_id = Contact(raw_string_jid="669233817152@s.whatsapp.net", name="Izebel Bengtsdotter", number="+669233817152")
+    calls = [
+        Call(call_row_id=929, from_me=1, timestamp=1545829680246, video_call=0, duration=0, call_result=4),
+        Call(call_row_id=2909, from_me=0, timestamp=1568973142212, video_call=0, duration=72, call_result=2),
+    ]
+    call_log = CallLog(jid_row_id=16, caller_id=caller_id, calls=calls + [None])
+
+    to_ndjson.call_log_to_ndjson(call_log=call_log, folder=f"{tmp_path}")
+
+    with open(f"{tmp_path}/Izebel Bengtsdotter (+669233817152).ndjson", encoding="utf8") as f:
+        assert [json.loads(line) for line in f] == [
+            {"caller_id": asdict(caller_id), "jid_row_id": 16}, asdict(calls[0]), asdict(calls[1])
+        ]
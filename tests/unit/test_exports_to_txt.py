@@ -1,10 +1,11 @@
 import src.exports.call_log_to_txt_formatted
-from src.exports.chat_to_txt_formatted import chat_to_txt_formatted
+from src.exports.chat_to_txt_formatted import chat_to_txt_formatted, get_message_str
 from src.exports import to_txt_raw
 from src.models import (
     Call,
     CallLog,
     Chat,
+    ChatStream,
     Contact,
     GeoPosition,
     GroupName,
@@ -245,3 +246,169 @@ def test_export_call_logs_to_txt_formatted(tmp_path):
         f"{test_call_log_dir}/{test_call_log.caller_id.name} ({test_call_log.caller_id.number}).txt"
     ) as f:
         assert f.read() == expected_export_call_logs_to_txt_formatted_result
+
+
+def build_reply_chat_messages():
+    sender = Contact(
+        raw_string_jid="589431685089@s.whatsapp.net",
+        name="Oddbjørn Marques",
+        number="+589431685089",
+    )
+    return [
+        Message(
+            message_id=1,
+            key_id="A",
+            chat_id=545,
+            from_me=0,
+            sender_contact=sender,
+            timestamp=1543325180845,
+            text_data="",
+            media=Media(
+                message_id=1,
+                media_job_uuid="e16c9bec-0e8c-4beb-94bd-67ebb8103a64",
+                file_path="Media/WhatsApp Images/IMG-20181127-WA0028.jpg",
+                mime_type="image/jpeg",
+            ),
+            geo_position=None,
+            reply_to=None,
+        ),
+        Message(
+            message_id=2,
+            key_id="B",
+            chat_id=545,
+            from_me=1,
+            sender_contact=None,
+            timestamp=1543325182506,
+            text_data="Aliquam erat volutpat!",
+            media=None,
+            geo_position=None,
+            reply_to="A",
+        ),
+        Message(
+            message_id=3,
+            key_id="C",
+            chat_id=545,
+            from_me=0,
+            sender_contact=sender,
+            timestamp=1543325193470,
+            text_data="Maecenas auctor metus",
+            media=None,
+            geo_position=None,
+            reply_to="D",  # replies to a later message, rendered as deleted
+        ),
+        Message(
+            message_id=4,
+            key_id="D",
+            chat_id=545,
+            from_me=0,
+            sender_contact=sender,
+            timestamp=1543325317387,
+            text_data="In interdum leo\nsit amet",
+            media=None,
+            geo_position=None,
+            reply_to="B",
+        ),
+        Message(
+            message_id=5,
+            key_id="E",
+            chat_id=545,
+            from_me=0,
+            sender_contact=sender,
+            timestamp=1543325478743,
+            text_data="",
+            media=None,
+            geo_position=None,
+            reply_to=None,
+        ),
+    ]
+
+
+def test_export_chat_stream_to_txt(tmp_path):
+    chat_title = GroupName(raw_string_jid="899167416177-1533072403@g.us", name="Vivamus bibendum")
+    participants = [
+        Contact(
+            raw_string_jid="589431685089@s.whatsapp.net",
+            name="Oddbjørn Marques",
+            number="+589431685089",
+        )
+    ]
+    test_chat = Chat(
+        chat_id=545,
+        chat_title=chat_title,
+        messages=build_reply_chat_messages(),
+        participants=participants,
+    )
+
+    for export, file_name in [
+        (chat_to_txt_formatted, "Vivamus bibendum.txt"),
+        (to_txt_raw.chat_to_txt_raw, "Vivamus bibendum-raw.txt"),
+    ]:
+        list_dir = tmp_path / "list"
+        stream_dir = tmp_path / "stream"
+        list_dir.mkdir(exist_ok=True)
+        stream_dir.mkdir(exist_ok=True)
+
+        export(chat=test_chat, folder=f"{list_dir}")
+        export(
+            chat=ChatStream(
+                chat_id=545,
+                chat_title=chat_title,
+                messages=iter(build_reply_chat_messages()),
+                participants=participants,
+                quoted_key_ids={"A", "B", "D"},
+            ),
+            folder=f"{stream_dir}",
+        )
+
+        with open(list_dir / file_name, encoding="utf-8") as f:
+            expected_result = f.read()
+        with open(stream_dir / file_name, encoding="utf-8") as f:
+            assert f.read() == expected_result
+
+    with open(stream_dir / "Vivamus bibendum.txt", encoding="utf-8") as f:
+        replies = [line for line in f.read().splitlines() if "Reply to" in line]
+    assert replies == [
+        "\t>>> Reply to: Oddbjørn Marques (+589431685089) - media: Media/WhatsApp Images/IMG-20181127-WA0028.jpg",
+        "\t>>> Reply to: 'Message has been deleted'",
+        "\t>>> Reply to: Me - Aliquam erat volutpat!",
+    ]
+
+
+def test_get_message_str_reply_lookup():
+    messages = build_reply_chat_messages()
+    replied_messages = {"A": messages[0], "B": messages[1]}
+
+    assert get_message_str(messages[3], replied_messages).endswith(
+        "\n\t>>> Reply to: Me - Aliquam erat volutpat!"
+    )
+    assert get_message_str(messages[2], replied_messages).endswith(
+        "\n\t>>> Reply to: 'Message has been deleted'"
+    )
+
+
+def test_raw_formatters_match_repr(tmp_path, monkeypatch):
+    contact = Contact(raw_string_jid="997863428668@s.whatsapp.net", name="O'Kyler \"Sung\"", number=None)
+    messages = [
+        Message(
+            message_id=1, key_id="A", chat_id=533, from_me=0, sender_contact=contact, timestamp=1543317689901,
+            text_data="Nulla\nscelerisque 😂", media=Media(1, "uuid", "Media/IMG.jpg", "image/jpeg"),
+            geo_position=GeoPosition(1, 47.5, -8.25), reply_to="B",
+        ),
+        Message(
+            message_id=2, key_id="B", chat_id=533, from_me=1, sender_contact=None, timestamp="",
+            text_data=None, media=None, geo_position=None, reply_to=None,
+        ),
+        None,
+    ]
+    formatter = to_txt_raw.RawMessageFormatter()
+    assert [formatter(message) for message in messages] == [str(message) for message in messages]
+    assert to_txt_raw.value_to_raw(GroupName("1@g.us", None)) == str(GroupName("1@g.us", None))
+    assert to_txt_raw.value_to_raw(Call(1, 0, 1543317689901, 1, 60, 5)) == str(Call(1, 0, 1543317689901, 1, 60, 5))
+
+    # messages are written in several chunks, with the same text as a single write
+    monkeypatch.setattr(to_txt_raw, "RAW_BUFFER_SIZE", 10)
+    to_txt_raw.chat_to_txt_raw(
+        chat=Chat(chat_id=533, chat_title=contact, messages=messages, participants=[contact]), folder=f"{tmp_path}"
+    )
+    with open(tmp_path / "997863428668@s.whatsapp.net-raw.txt", encoding="utf-8") as f:
+        assert f.read() == "997863428668@s.whatsapp.net\n\n" + "\n".join(map(str, messages))
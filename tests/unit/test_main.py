@@ -0,0 +1,371 @@
+import bz2
+import filecmp
+import gzip
+import json
+import lzma
+import os
+import shutil
+import sqlite3
+import tarfile
+import zipfile
+
+import pytest
+
+import main
+
+FIXTURE_DBS = ("tests/unit/data/test_msgstore.db", "tests/unit/data/test_wa.db")
+
+
+@pytest.fixture
+def fixture_dbs(tmp_path):
+    # the read-only connections of `main` leave the -shm and -wal files of the WAL mode fixtures behind
+    msgdb_path, wadb_path = str(tmp_path / "msgstore.db"), str(tmp_path / "wa.db")
+    shutil.copyfile(FIXTURE_DBS[0], msgdb_path)
+    shutil.copyfile(FIXTURE_DBS[1], wadb_path)
+    return msgdb_path, wadb_path
+
+
+def read_output_files(output_dir):
+    files = {}
+    for root, dirs, file_names in os.walk(output_dir):
+        dirs[:] = [name for name in dirs if not name.startswith(".")]
+        for file_name in file_names:
+            if file_name.startswith("."):
+                continue
+            path = os.path.join(root, file_name)
+            files[os.path.relpath(path, output_dir)] = path
+    return files
+
+
+def assert_same_output(expected_dir, output_dir):
+    expected_files = read_output_files(expected_dir)
+    output_files = read_output_files(output_dir)
+    assert sorted(output_files) == sorted(expected_files)
+    for name, path in expected_files.items():
+        assert filecmp.cmp(path, output_files[name], shallow=False), name
+
+
+def run_main(output_dir, output_style="formatted_txt", phone_numbers=(), dbs=FIXTURE_DBS, **kwargs):
+    main.main(
+        msgdb_path=dbs[0],
+        wadb_path=dbs[1],
+        output_dir=str(output_dir),
+        conversation_types=["call_logs", "chats", "contacts"],
+        phone_numbers=list(phone_numbers),
+        output_style=output_style,
+        **kwargs,
+    )
+
+
+def test_main_with_workers(tmp_path, fixture_dbs):
+    for output_style in ["raw_txt", "formatted_txt"]:
+        run_main(tmp_path / output_style / "serial", output_style, dbs=fixture_dbs)
+        run_main(tmp_path / output_style / "parallel", output_style, dbs=fixture_dbs, workers=2)
+
+        assert_same_output(tmp_path / output_style / "serial", tmp_path / output_style / "parallel")
+
+    run_main(tmp_path / "filtered" / "serial", phone_numbers=["728678956227", "972071704671"], dbs=fixture_dbs)
+    run_main(
+        tmp_path / "filtered" / "parallel", phone_numbers=["728678956227", "972071704671"], dbs=fixture_dbs,
+        workers=2
+    )
+    assert_same_output(tmp_path / "filtered" / "serial", tmp_path / "filtered" / "parallel")
+
+
+def test_main_with_workers_and_colliding_titles(tmp_path, fixture_dbs):
+    # all groups get the same name, so their chats are written to the same file, the last one in a serial export wins
+    db = sqlite3.connect(fixture_dbs[1])
+    assert db.execute("UPDATE wa_contacts SET display_name = 'Same' WHERE jid LIKE '%@g.us'").rowcount > 1
+    db.commit()
+    db.close()
+
+    for workers in (1, 2, 3):
+        run_main(tmp_path / str(workers), dbs=fixture_dbs, workers=workers)
+    assert os.path.exists(tmp_path / "1" / "chats" / "Same.txt")
+    assert_same_output(tmp_path / "1", tmp_path / "2")
+    assert_same_output(tmp_path / "1", tmp_path / "3")
+
+
+def test_main_with_pipeline(tmp_path, fixture_dbs):
+    for output_style in ["raw_txt", "formatted_txt", "json"]:
+        run_main(tmp_path / output_style / "serial", output_style, dbs=fixture_dbs)
+        run_main(tmp_path / output_style / "pipeline", output_style, pipeline=True, writer_threads=2, dbs=fixture_dbs)
+
+        assert_same_output(tmp_path / output_style / "serial", tmp_path / output_style / "pipeline")
+
+    run_main(tmp_path / "filtered" / "serial", phone_numbers=["728678956227", "972071704671"], dbs=fixture_dbs)
+    run_main(
+        tmp_path / "filtered" / "pipeline", phone_numbers=["728678956227", "972071704671"], pipeline=True,
+        dbs=fixture_dbs
+    )
+    assert_same_output(tmp_path / "filtered" / "serial", tmp_path / "filtered" / "pipeline")
+
+
+def test_main_with_pipeline_and_colliding_titles(tmp_path, fixture_dbs, capsys):
+    # all groups get the same name, so their chats are written to the same file, the last one in a serial export wins
+    db = sqlite3.connect(fixture_dbs[1])
+    assert db.execute("UPDATE wa_contacts SET display_name = 'Same' WHERE jid LIKE '%@g.us'").rowcount > 1
+    db.commit()
+    db.close()
+
+    run_main(tmp_path / "serial", dbs=fixture_dbs)
+    for run in range(3):
+        run_main(tmp_path / str(run), pipeline=True, writer_threads=4, dbs=fixture_dbs)
+        assert_same_output(tmp_path / "serial", tmp_path / str(run))
+    # the pipeline report is not part of the output
+    assert "prefetch queue" not in capsys.readouterr().out
+
+
+def test_main_with_columnar_messages(tmp_path, fixture_dbs):
+    for output_style in ["raw_txt", "formatted_txt"]:
+        run_main(tmp_path / output_style / "objects", output_style, dbs=fixture_dbs)
+        run_main(tmp_path / output_style / "columnar", output_style, columnar=True, dbs=fixture_dbs)
+
+        assert_same_output(tmp_path / output_style / "objects", tmp_path / output_style / "columnar")
+
+    run_main(tmp_path / "json" / "objects", "json", dbs=fixture_dbs)
+    run_main(tmp_path / "json" / "columnar", "json", columnar=True, dbs=fixture_dbs)
+    expected_files = read_output_files(tmp_path / "json" / "objects")
+    output_files = read_output_files(tmp_path / "json" / "columnar")
+    assert sorted(output_files) == sorted(expected_files)
+    for name, path in expected_files.items():
+        if name.startswith("chats"):
+            # the order of the participants depends on set iteration
+            assert read_chat_json(output_files[name]) == read_chat_json(path), name
+        else:
+            assert filecmp.cmp(path, output_files[name], shallow=False), name
+
+
+def read_chat_json(path):
+    with open(path, encoding="utf-8") as file:
+        chat = json.load(file)
+    chat["participants"].sort(key=lambda contact: contact["raw_string_jid"])
+    return chat
+
+
+def test_main_with_sqlite_output(tmp_path, fixture_dbs):
+    run_main(tmp_path / "json", "json", dbs=fixture_dbs)
+    run_main(tmp_path / "sqlite", "sqlite", dbs=fixture_dbs)
+
+    assert sorted(os.listdir(tmp_path / "sqlite")) == ["whatsapp.db"]
+    json_files = read_output_files(tmp_path / "json")
+    calls = 0
+    for name, path in json_files.items():
+        if name.startswith("call_logs"):
+            with open(path, encoding="utf-8") as file:
+                calls += len([call for call in json.load(file)["calls"] if call])
+    db = sqlite3.connect(tmp_path / "sqlite" / "whatsapp.db")
+    try:
+        for name, path in json_files.items():
+            if not name.startswith("chats"):
+                continue
+            chat = read_chat_json(path)
+            messages = db.execute(
+                "SELECT message_id, key_id, chat_id, from_me, sender_jid, timestamp, text_data, reply_to "
+                "FROM messages WHERE chat_id=? ORDER BY message_id",
+                (chat["chat_id"],),
+            ).fetchall()
+            assert messages == sorted(
+                (
+                    message["message_id"], message["key_id"], message["chat_id"], message["from_me"],
+                    message["sender_contact"]["raw_string_jid"] if message["sender_contact"] else None,
+                    message["timestamp"], message["text_data"], message["reply_to"],
+                )
+                for message in chat["messages"]
+            ), name
+            participants = db.execute(
+                "SELECT contacts.raw_string_jid, contacts.name, contacts.number FROM participants "
+                "JOIN contacts ON participants.raw_string_jid=contacts.raw_string_jid WHERE chat_id=?",
+                (chat["chat_id"],),
+            ).fetchall()
+            assert sorted(participants, key=str) == sorted(
+                ((contact["raw_string_jid"], contact["name"], contact["number"]) for contact in chat["participants"]),
+                key=str,
+            ), name
+        assert db.execute("SELECT COUNT(*) FROM calls").fetchone()[0] == calls
+    finally:
+        db.close()
+
+
+def test_main_with_failing_sqlite_output(tmp_path, fixture_dbs, monkeypatch):
+    def add_chat(self, chat):
+        raise RuntimeError("failed export")
+
+    monkeypatch.setattr(main.SqliteExport, "add_chat", add_chat)
+    with pytest.raises(RuntimeError, match="failed export"):
+        run_main(tmp_path / "sqlite", "sqlite", dbs=fixture_dbs)
+    assert os.listdir(tmp_path / "sqlite") == []
+
+
+def test_main_with_compression(tmp_path, fixture_dbs):
+    run_main(tmp_path / "plain", "formatted_txt", dbs=fixture_dbs)
+    for compression, extension, module in [("gzip", ".gz", gzip), ("bz2", ".bz2", bz2), ("xz", ".xz", lzma)]:
+        for workers in [1, 2]:
+            output_dir = tmp_path / f"{compression}-{workers}"
+            run_main(
+                output_dir, "formatted_txt", compression=compression, compression_level=1, workers=workers,
+                dbs=fixture_dbs
+            )
+
+            expected_files = read_output_files(tmp_path / "plain")
+            output_files = read_output_files(output_dir)
+            assert sorted(output_files) == sorted(name + extension for name in expected_files)
+            for name, path in expected_files.items():
+                with open(path, "rb") as expected, module.open(output_files[name + extension], "rb") as output:
+                    assert output.read() == expected.read(), name
+
+
+def test_main_with_archive(tmp_path, fixture_dbs):
+    run_main(tmp_path / "files", "formatted_txt", dbs=fixture_dbs)
+    expected_files = {}
+    for name, path in read_output_files(tmp_path / "files").items():
+        with open(path, "rb") as file:
+            expected_files[name.replace(os.sep, "/")] = file.read()
+
+    run_main(tmp_path / "tar", "formatted_txt", archive="tar", compression="gzip", dbs=fixture_dbs)
+    assert os.listdir(tmp_path / "tar") == ["whatsapp.tar.gz"]
+    with tarfile.open(tmp_path / "tar" / "whatsapp.tar.gz") as archive:
+        assert {member.name: archive.extractfile(member).read() for member in archive} == expected_files
+
+    run_main(tmp_path / "zip", "formatted_txt", archive="zip", pipeline=True, dbs=fixture_dbs)
+    assert os.listdir(tmp_path / "zip") == ["whatsapp.zip"]
+    with zipfile.ZipFile(tmp_path / "zip" / "whatsapp.zip") as archive:
+        assert {name: archive.read(name) for name in archive.namelist()} == expected_files
+
+
+def test_main_with_incremental_export(tmp_path, fixture_dbs):
+    msgdb_path, wadb_path = fixture_dbs
+
+    def run_incremental(output_dir, **kwargs):
+        main.main(
+            msgdb_path=msgdb_path,
+            wadb_path=wadb_path,
+            output_dir=str(output_dir),
+            conversation_types=["call_logs", "chats"],
+            phone_numbers=[],
+            output_style="formatted_txt",
+            incremental=True,
+            **kwargs,
+        )
+
+    run_main(tmp_path / "expected", dbs=fixture_dbs)
+    run_incremental(tmp_path / "output")
+    assert os.path.exists(tmp_path / "output" / ".export_manifest.json")
+    os.remove(tmp_path / "expected" / "contacts.txt")
+    assert_same_output(tmp_path / "expected", tmp_path / "output")
+
+    # files of unchanged chats and call logs are left alone
+    output_files = read_output_files(tmp_path / "output")
+    for path in output_files.values():
+        os.utime(path, ns=(0, 0))
+    run_incremental(tmp_path / "output", workers=2)
+    assert all(os.stat(path).st_mtime_ns == 0 for path in output_files.values())
+
+    db = sqlite3.connect(msgdb_path)
+    chat_row_id = db.execute("SELECT chat._id FROM chat ORDER BY chat._id LIMIT 1").fetchone()[0]
+    db.execute(
+        "INSERT INTO message (chat_row_id, from_me, key_id, received_timestamp, text_data) "
+        "VALUES (?, 1, 'INCREMENTAL', 1700000000000, 'Donec sed odio dui.')",
+        (chat_row_id,),
+    )
+    db.commit()
+    db.close()
+    run_incremental(tmp_path / "output", pipeline=True)
+    changed_files = [name for name, path in output_files.items() if os.stat(path).st_mtime_ns != 0]
+    assert len(changed_files) == 1 and changed_files[0].startswith("chats")
+    with open(output_files[changed_files[0]], encoding="utf-8") as file:
+        assert "Donec sed odio dui." in file.read()
+
+
+def test_main_with_delta_export(tmp_path, fixture_dbs, monkeypatch):
+    msgdb_path, wadb_path = fixture_dbs
+
+    def run_delta(output_dir, **kwargs):
+        main.main(
+            msgdb_path=msgdb_path,
+            wadb_path=wadb_path,
+            output_dir=str(output_dir),
+            conversation_types=["chats"],
+            phone_numbers=[],
+            output_style="formatted_txt",
+            **kwargs,
+        )
+
+    run_delta(tmp_path / "output", delta=True)
+    db = sqlite3.connect(msgdb_path)
+    chat_row_id, key_id = db.execute(
+        "SELECT chat_row_id, key_id FROM message WHERE chat_row_id > 0 ORDER BY sort_id, _id LIMIT 1"
+    ).fetchone()
+    db.executescript(f"""
+        INSERT INTO message (_id, chat_row_id, from_me, key_id, timestamp, received_timestamp, text_data, sort_id)
+        VALUES (900001, {chat_row_id}, 1, 'DELTA1', 1700000000000, 1700000000000, 'Donec sed odio dui.', 900001);
+        INSERT INTO message_quoted (message_row_id, chat_row_id, parent_message_chat_row_id, from_me, key_id)
+        VALUES (900001, {chat_row_id}, {chat_row_id}, 0, '{key_id}');
+        INSERT INTO message (_id, chat_row_id, from_me, key_id, timestamp, received_timestamp, text_data, sort_id)
+        VALUES (900002, {chat_row_id}, 1, 'DELTA2', 1700000001000, 1700000001000, 'Nulla vitae elit libero.', 900002);
+    """)
+    db.commit()
+    db.close()
+
+    # the new messages are appended, no chat is exported as a whole
+    exported_chats = []
+    export_chat = main.export_chat
+    monkeypatch.setattr(main, "export_chat", lambda chat, **kwargs: (
+        exported_chats.append(chat.chat_id), export_chat(chat=chat, **kwargs)
+    ))
+    run_delta(tmp_path / "output", delta=True)
+    assert exported_chats == []
+
+    monkeypatch.setattr(main, "export_chat", export_chat)
+    run_delta(tmp_path / "expected")
+    assert_same_output(tmp_path / "expected", tmp_path / "output")
+
+
+def test_main_with_skip_unchanged(tmp_path, fixture_dbs):
+    run_main(tmp_path / "expected", dbs=fixture_dbs)
+    run_main(tmp_path / "output", skip_unchanged=True, dbs=fixture_dbs)
+    assert_same_output(tmp_path / "expected", tmp_path / "output")
+
+    # forget the chats and call logs, so everything is rendered again
+    manifest_path = tmp_path / "output" / ".export_manifest.json"
+    with open(manifest_path, encoding="utf-8") as file:
+        manifest = json.load(file)
+    manifest["chats"] = manifest["call_logs"] = {}
+    output_files = read_output_files(tmp_path / "output")
+    changed_name, edited_name = sorted(name for name in output_files if name.startswith("chats"))[:2]
+    manifest["files"][changed_name.replace(os.sep, "/")][0] = "0" * 64
+    with open(manifest_path, "w", encoding="utf-8") as file:
+        json.dump(manifest, file)
+    with open(output_files[edited_name], "a", encoding="utf-8") as file:
+        file.write("edited")
+    mtimes = {name: os.stat(path).st_mtime_ns for name, path in output_files.items()}
+
+    run_main(tmp_path / "output", skip_unchanged=True, workers=2, dbs=fixture_dbs)
+    assert_same_output(tmp_path / "expected", tmp_path / "output")
+    assert sorted(os.listdir(tmp_path / "output" / "chats")) == sorted(os.listdir(tmp_path / "expected" / "chats"))
+    # only the file with another stored hash and the edited one are written
+    changed_files = [name for name, path in output_files.items() if os.stat(path).st_mtime_ns != mtimes[name]]
+    assert sorted(changed_files) == sorted([changed_name, edited_name])
+
+
+def test_main_with_null_call_result(tmp_path, fixture_dbs):
+    msgdb_path, wadb_path = fixture_dbs
+    db = sqlite3.connect(msgdb_path)
+    db.execute("UPDATE call_log SET call_result = NULL WHERE _id = (SELECT MIN(_id) FROM call_log)")
+    db.commit()
+    db.close()
+
+    # the call results of every summary are written sorted, the calls without a call result last
+    for output_style in ("raw_txt", "formatted_txt", "json", "compact_json", "ndjson", "sqlite"):
+        main.main(
+            msgdb_path=msgdb_path,
+            wadb_path=wadb_path,
+            output_dir=str(tmp_path / output_style),
+            conversation_types=["call_log_summary"],
+            phone_numbers=[],
+            output_style=output_style,
+        )
+    with open(tmp_path / "formatted_txt" / "call_log_summary.txt", encoding="utf-8") as file:
+        assert "unknown: 1" in file.read()
+    with open(tmp_path / "json" / "call_log_summary.json", encoding="utf-8") as file:
+        assert any("null" in summary["call_results"] for summary in json.load(file))
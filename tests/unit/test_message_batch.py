@@ -0,0 +1,79 @@
+import sqlite3
+
+import pytest
+from attrs import asdict
+
+from src.chat_extractor import resolver as chat_resolver
+from src.chat_extractor.builder import build_message_from_row
+from src.contact_extractor import builder as contact_builder
+from src.common import ContactDirectory
+from src.exports.chat_to_txt_formatted import get_messages_strs
+from src.exports.to_txt_raw import RawMessageFormatter, batch_to_raw
+from src.message_batch import MessageBatch, StringColumn, numpy
+from src.models import Chat
+
+
+@pytest.fixture
+def msgdb_cursor():
+    msgdb = sqlite3.connect("tests/unit/data/test_msgstore.db")
+    yield msgdb.cursor()
+    msgdb.close()
+
+
+@pytest.fixture
+def contacts():
+    wadb = sqlite3.connect("tests/unit/data/test_wa.db")
+    yield contact_builder.build_all_contacts(wadb.cursor())
+    wadb.close()
+
+
+def test_message_batch_matches_messages(msgdb_cursor, contacts):
+    rows = list(chat_resolver.all_chat_messages_resolver(msgdb_cursor))
+    expected_messages = [build_message_from_row(contacts, row) for row in rows]
+
+    batch = MessageBatch.from_rows(contacts, rows)
+
+    assert len(batch) == len(rows)
+    assert list(batch) == expected_messages
+    assert list(batch.to_dicts()) == [asdict(message) for message in expected_messages]
+
+
+def test_message_batch_sender_jids_and_quoted_key_ids(msgdb_cursor, contacts):
+    rows = list(chat_resolver.chat_messages_resolver(msgdb_cursor, 545))
+    batch = MessageBatch.from_rows(contacts, rows)
+
+    assert sorted(batch.sender_jids()) == chat_resolver.chat_sender_jids_resolver(msgdb_cursor, 545)
+    assert batch.quoted_key_ids() == chat_resolver.chat_quoted_key_ids_resolver(msgdb_cursor, 545)
+
+
+def test_message_batch_renders_txt_like_messages(msgdb_cursor, contacts):
+    contact_directory = ContactDirectory(contacts)
+    for chat_id in [463, 545, 583]:
+        rows = list(chat_resolver.chat_messages_resolver(msgdb_cursor, chat_id))
+        messages = [build_message_from_row(contact_directory, row) for row in rows]
+        batch = MessageBatch.from_rows(contact_directory, rows)
+
+        assert list(batch_to_raw(batch)) == list(map(RawMessageFormatter(), messages))
+        assert list(get_messages_strs(Chat(chat_id, None, batch, []), {}, contact_directory)) == list(
+            get_messages_strs(Chat(chat_id, None, messages, []), {}, contact_directory)
+        )
+
+
+def test_string_column():
+    column = StringColumn()
+    for value in ["Hello", None, "", "Šimunović 👋"]:
+        column.append(value)
+
+    assert len(column) == 4
+    assert [column[idx] for idx in range(4)] == ["Hello", None, "", "Šimunović 👋"]
+
+
+@pytest.mark.skipif(numpy is None, reason="NumPy is not installed")
+def test_message_batch_to_numpy(msgdb_cursor, contacts):
+    rows = list(chat_resolver.all_chat_messages_resolver(msgdb_cursor))
+    batch = MessageBatch.from_rows(contacts, rows)
+
+    columns = batch.to_numpy()
+
+    assert columns["message_id"].tolist() == [row[0] for row in rows]
+    assert columns["timestamp"].tolist() == [row[5] for row in rows]
@@ -0,0 +1,105 @@
+import os
+import shutil
+import sqlite3
+
+from src import msgdb_cache
+
+
+def create_unindexed_msgdb(file_path):
+    db = sqlite3.connect(file_path)
+    db.execute("CREATE TABLE message (_id INTEGER PRIMARY KEY, chat_row_id INTEGER)")
+    db.execute("CREATE TABLE message_media (_id INTEGER PRIMARY KEY, message_row_id INTEGER)")
+    db.execute("CREATE TABLE call_log (_id INTEGER PRIMARY KEY, jid_row_id INTEGER)")
+    db.execute("CREATE INDEX call_log_jid_index ON call_log (jid_row_id, _id)")
+    db.executemany("INSERT INTO message VALUES (?, ?)", [(1, 10), (2, 10), (3, 11)])
+    db.commit()
+    db.close()
+
+
+def index_names(file_path):
+    db = sqlite3.connect(file_path)
+    names = {name for (name,) in db.execute("SELECT name FROM sqlite_master WHERE type='index'")}
+    db.close()
+    return names
+
+
+def test_create_missing_indexes_on_test_msgdb(tmp_path):
+    msgdb_path = tmp_path / "msgstore.db"
+    shutil.copy("tests/unit/data/test_msgstore.db", msgdb_path)
+    msgdb = sqlite3.connect(msgdb_path)
+
+    # every lookup column is already covered by an index or the primary key
+    assert msgdb_cache.create_missing_indexes(msgdb) == []
+
+    msgdb.close()
+
+
+def test_indexed_copy(tmp_path):
+    msgdb_path = str(tmp_path / "msgstore.db")
+    create_unindexed_msgdb(msgdb_path)
+    cache_dir = str(tmp_path / "cache")
+
+    copy_path = msgdb_cache.indexed_copy(msgdb_path, cache_dir)
+
+    assert copy_path != msgdb_path
+    assert index_names(copy_path) == {
+        "call_log_jid_index",
+        "message_chat_row_id_lookup_index",
+        "message_media_message_row_id_lookup_index",
+    }
+    assert index_names(msgdb_path) == {"call_log_jid_index"}
+    db = sqlite3.connect(copy_path)
+    assert db.execute("SELECT _id FROM message WHERE chat_row_id=10").fetchall() == [(1,), (2,)]
+    db.close()
+
+
+def test_indexed_copy_is_reused_until_source_changes(tmp_path):
+    msgdb_path = str(tmp_path / "msgstore.db")
+    create_unindexed_msgdb(msgdb_path)
+    cache_dir = str(tmp_path / "cache")
+
+    copy_path = msgdb_cache.indexed_copy(msgdb_path, cache_dir)
+    copy_inode = os.stat(copy_path).st_ino
+    source_mtime_ns = os.stat(msgdb_path).st_mtime_ns
+
+    # unchanged source
+    assert msgdb_cache.indexed_copy(msgdb_path, cache_dir) == copy_path
+    assert os.stat(copy_path).st_ino == copy_inode
+
+    # touched but identical source
+    os.utime(msgdb_path, ns=(source_mtime_ns + 10**9, source_mtime_ns + 10**9))
+    assert msgdb_cache.indexed_copy(msgdb_path, cache_dir) == copy_path
+    assert os.stat(copy_path).st_ino == copy_inode
+
+    # changed source
+    db = sqlite3.connect(msgdb_path)
+    db.execute("INSERT INTO message VALUES (4, 10)")
+    db.commit()
+    db.close()
+    msgdb_cache.indexed_copy(msgdb_path, cache_dir)
+    db = sqlite3.connect(copy_path)
+    assert db.execute("SELECT COUNT(*) FROM message").fetchone() == (4,)
+    db.close()
+    assert sorted(os.listdir(cache_dir)) == ["msgstore.indexed.db", "msgstore.indexed.json"]
+
+
+def test_indexed_copy_follows_write_ahead_log(tmp_path):
+    msgdb_path = str(tmp_path / "msgstore.db")
+    create_unindexed_msgdb(msgdb_path)
+    cache_dir = str(tmp_path / "cache")
+    # an open connection keeps the changes in the write-ahead log, the database file itself is unchanged
+    db = sqlite3.connect(msgdb_path)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA wal_autocheckpoint=0")
+
+    copy_path = msgdb_cache.indexed_copy(msgdb_path, cache_dir)
+    source_stat = os.stat(msgdb_path)
+    db.execute("INSERT INTO message VALUES (4, 10)")
+    db.commit()
+    assert (os.stat(msgdb_path).st_size, os.stat(msgdb_path).st_mtime_ns) == (source_stat.st_size, source_stat.st_mtime_ns)
+
+    assert msgdb_cache.indexed_copy(msgdb_path, cache_dir) == copy_path
+    copy = sqlite3.connect(copy_path)
+    assert copy.execute("SELECT COUNT(*) FROM message").fetchone() == (4,)
+    copy.close()
+    db.close()
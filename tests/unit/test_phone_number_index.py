@@ -0,0 +1,72 @@
+import sqlite3
+
+from src.call_log_extractor import resolver as call_log_resolver
+from src.chat_extractor import resolver as chat_resolver
+from src.phone_number_index import PhoneNumberIndex, normalise_phone_number
+
+
+def test_normalise_phone_number():
+    assert normalise_phone_number("41786319999") == "41786319999"
+    assert normalise_phone_number("+41 78 631 99 99") == "41786319999"
+    assert normalise_phone_number("0041786319999") == "41786319999"
+    assert normalise_phone_number("899167416177-1533072403") == "899167416177-1533072403"
+
+
+def test_phone_number_index_lookup():
+    index = PhoneNumberIndex()
+    index.add(1, "41786319999")
+    index.add(2, "899167416177-1533072403")
+    index.add(3, "4178631999")
+
+    assert index.jid_row_ids("+41786319999") == [1]
+    assert index.jid_row_ids("786319999") == [1]
+    assert index.jid_row_ids("0786319999") == [1]
+    assert index.jid_row_ids("899167416177-1533072403") == [2]
+    assert index.jid_row_ids("123") == []
+
+
+def test_phone_number_index_lookup_falls_back_to_suffix():
+    index = PhoneNumberIndex()
+    index.add(1, "41786319999")
+    index.add(2, "899167416177-1533072403")
+    index.add(3, "4178631999")
+    index.add(4, "4916319999")
+
+    assert index.jid_row_ids("319999") == [1, 4]
+    assert index.jid_row_ids("1999") == [3]
+    assert index.jid_row_ids("1533072403") == [2]
+    # a match without the country code wins over the suffixes
+    assert index.jid_row_ids("6319999") == [4]
+
+
+def test_resolvers_with_phone_number_index_match_like():
+    msgdb = sqlite3.connect("tests/unit/data/test_msgstore.db")
+    msgdb_cursor = msgdb.cursor()
+    index = PhoneNumberIndex.build(msgdb_cursor)
+
+    users = [user for (user,) in msgdb_cursor.execute("SELECT user FROM jid ORDER BY _id").fetchall()]
+    assert users
+    for user in users:
+        assert chat_resolver.chat_resolver(
+            msgdb_cursor, phone_number=user, phone_number_index=index
+        ) == chat_resolver.chat_resolver(msgdb_cursor, phone_number=user), user
+        assert call_log_resolver.call_jid_resolver(
+            msgdb_cursor, phone_number=user, phone_number_index=index
+        ) == call_log_resolver.call_jid_resolver(msgdb_cursor, phone_number=user), user
+        # shorter than MIN_NATIONAL_NUMBER_LENGTH, only matched as a suffix
+        suffix = user[-5:]
+        assert chat_resolver.chat_resolver(
+            msgdb_cursor, phone_number=suffix, phone_number_index=index
+        ) == chat_resolver.chat_resolver(msgdb_cursor, phone_number=suffix), suffix
+        assert call_log_resolver.call_jid_resolver(
+            msgdb_cursor, phone_number=suffix, phone_number_index=index
+        ) == call_log_resolver.call_jid_resolver(msgdb_cursor, phone_number=suffix), suffix
+
+    assert chat_resolver.chat_resolver(msgdb_cursor, phone_number="123", phone_number_index=index) == (
+        {"chat_id": None}, None
+    )
+    assert call_log_resolver.call_jid_resolver(msgdb_cursor, phone_number="123", phone_number_index=index) == (
+        {"jid_row_id": None}, None
+    )
+
+    msgdb.close()
@@ -0,0 +1,158 @@
+import sqlite3
+from typing import Callable, List
+
+import pytest
+
+from src.call_log_extractor import resolver as call_log_resolver
+from src.chat_extractor import resolver as chat_resolver
+
+# Queries that run once per message, chat or call. They must only use index or primary key lookups.
+HOT_PATH_QUERIES = {
+    "media_resolver": lambda cursor: chat_resolver.media_resolver(cursor, 158375),
+    "geo_position_resolver": lambda cursor: chat_resolver.geo_position_resolver(
+        cursor, 158394
+    ),
+    "message_resolver": lambda cursor: chat_resolver.message_resolver(cursor, 158375),
+    "chat_messages_resolver": lambda cursor: chat_resolver.chat_messages_resolver(
+        cursor, 545
+    ),
+    "chat_sender_jids_resolver": lambda cursor: chat_resolver.chat_sender_jids_resolver(
+        cursor, 545
+    ),
+    "chat_quoted_key_ids_resolver": lambda cursor: chat_resolver.chat_quoted_key_ids_resolver(
+        cursor, 545
+    ),
+    "chat_messages_after_resolver": lambda cursor: chat_resolver.chat_messages_after_resolver(
+        cursor, 545, 158375
+    ),
+    "chat_messages_by_key_ids_resolver": lambda cursor: chat_resolver.chat_messages_by_key_ids_resolver(
+        cursor, 545, ["3EB0C5A1E2F34D5B6C7D", "3EB0D6B2F3A45E6C7D8E"], 158375
+    ),
+    "chat_delta_bounds_resolver": lambda cursor: chat_resolver.chat_delta_bounds_resolver(
+        cursor, 545, 158375
+    ),
+    "chat_resolver_with_id": lambda cursor: chat_resolver.chat_resolver(
+        cursor, chat_row_id=545
+    ),
+    "group_chat_participant_jid_resolver": lambda cursor: chat_resolver.group_chat_participant_jid_resolver(
+        cursor, "899167416177-1533072403@g.us"
+    ),
+    "call_resolver": lambda cursor: call_log_resolver.call_resolver(cursor, 8),
+    "call_jid_resolver_with_id": lambda cursor: call_log_resolver.call_jid_resolver(
+        cursor, jid_row_id=16
+    ),
+}
+
+# Queries that run once per export or once per phone number filter. They may scan, but must not sort in a temporary B-tree.
+SCAN_QUERIES = {
+    "all_chat_messages_resolver": lambda cursor: chat_resolver.all_chat_messages_resolver(
+        cursor
+    ),
+    "all_chat_sender_jids_resolver": lambda cursor: chat_resolver.all_chat_sender_jids_resolver(
+        cursor
+    ),
+    "all_chat_quoted_key_ids_resolver": lambda cursor: chat_resolver.all_chat_quoted_key_ids_resolver(
+        cursor
+    ),
+    "all_chats_resolver": lambda cursor: chat_resolver.all_chats_resolver(cursor),
+    "all_calls_resolver": lambda cursor: list(call_log_resolver.all_calls_resolver(cursor)),
+    "all_chat_watermarks_resolver": lambda cursor: chat_resolver.all_chat_watermarks_resolver(
+        cursor
+    ),
+    "all_chat_message_counts_resolver": lambda cursor: chat_resolver.all_chat_message_counts_resolver(
+        cursor
+    ),
+    "all_group_chat_participant_jids_resolver": lambda cursor: chat_resolver.all_group_chat_participant_jids_resolver(
+        cursor
+    ),
+    "chat_resolver_with_phone_number": lambda cursor: chat_resolver.chat_resolver(
+        cursor, phone_number="972071704671"
+    ),
+    "call_jid_resolver_with_phone_number": lambda cursor: call_log_resolver.call_jid_resolver(
+        cursor, phone_number="669233817152"
+    ),
+    "all_call_watermarks_resolver": lambda cursor: call_log_resolver.all_call_watermarks_resolver(
+        cursor
+    ),
+    "all_call_counts_resolver": lambda cursor: call_log_resolver.all_call_counts_resolver(
+        cursor
+    ),
+    "all_call_jids_resolver": lambda cursor: call_log_resolver.all_call_jids_resolver(
+        cursor
+    ),
+    "call_log_summary_resolver": lambda cursor: call_log_resolver.call_log_summary_resolver(
+        cursor
+    ),
+    "call_result_counts_resolver": lambda cursor: call_log_resolver.call_result_counts_resolver(
+        cursor
+    ),
+}
+
+# Queries on the chats or calls of a filter. They may scan the temporary table of the filter, but must only search the
+# other tables and never sort in a temporary B-tree.
+FILTERED_QUERIES = {
+    "filtered_all_chat_messages_resolver": lambda cursor: (
+        chat_resolver.chat_ids_filter_resolver(cursor, [545, 100, 3]),
+        chat_resolver.all_chat_messages_resolver(cursor, filtered=True),
+    ),
+    "filtered_all_chat_sender_jids_resolver": lambda cursor: (
+        chat_resolver.chat_ids_filter_resolver(cursor, [545, 100, 3]),
+        chat_resolver.all_chat_sender_jids_resolver(cursor, filtered=True),
+    ),
+    "filtered_all_chat_quoted_key_ids_resolver": lambda cursor: (
+        chat_resolver.chat_ids_filter_resolver(cursor, [545, 100, 3]),
+        chat_resolver.all_chat_quoted_key_ids_resolver(cursor, filtered=True),
+    ),
+    "filtered_calls_resolver": lambda cursor: (
+        call_log_resolver.jid_row_ids_filter_resolver(cursor, [16, 3, 8]),
+        list(call_log_resolver.filtered_calls_resolver(cursor)),
+    ),
+}
+
+
+def query_plans(resolver_call: Callable[[sqlite3.Cursor], object]) -> List[List[str]]:
+    """Run a resolver and return the query plan of every SELECT statement it executed."""
+    msgdb = sqlite3.connect("tests/unit/data/test_msgstore.db")
+    statements = []
+    msgdb.set_trace_callback(statements.append)
+    resolver_call(msgdb.cursor())
+    msgdb.set_trace_callback(None)
+
+    plans = [
+        [row[3] for row in msgdb.execute(f"EXPLAIN QUERY PLAN {statement}")]
+        for statement in statements
+        # the temporary tables of the filters are already created and filled
+        if statement.lstrip().upper().startswith("SELECT")
+    ]
+    msgdb.close()
+    return plans
+
+
+@pytest.mark.parametrize("name", HOT_PATH_QUERIES)
+def test_hot_path_query_plans(name):
+    plans = query_plans(HOT_PATH_QUERIES[name])
+    assert plans
+    for plan in plans:
+        for detail in plan:
+            assert not detail.startswith("SCAN"), f"{name}: {plan}"
+            assert "TEMP B-TREE" not in detail, f"{name}: {plan}"
+            assert not detail.startswith("MULTI-INDEX OR"), f"{name}: {plan}"
+
+
+@pytest.mark.parametrize("name", SCAN_QUERIES)
+def test_scan_query_plans(name):
+    plans = query_plans(SCAN_QUERIES[name])
+    assert plans
+    for plan in plans:
+        for detail in plan:
+            assert "TEMP B-TREE FOR ORDER BY" not in detail, f"{name}: {plan}"
+
+
+@pytest.mark.parametrize("name", FILTERED_QUERIES)
+def test_filtered_query_plans(name):
+    plans = query_plans(FILTERED_QUERIES[name])
+    assert plans
+    for plan in plans:
+        for detail in plan:
+            assert not detail.startswith("SCAN") or detail.startswith("SCAN temp."), f"{name}: {plan}"
+            assert "TEMP B-TREE" not in detail, f"{name}: {plan}"
@@ -0,0 +1,33 @@
+import time
+from datetime import datetime, timezone
+
+from src.exports.timestamps import MAX_EXACT_TIMESTAMP, TimestampFormatter
+
+TIMESTAMPS = [0, 1, 999, 1000, 1543321289901, 1543321289000, -1, -86400001, 4102444799999, MAX_EXACT_TIMESTAMP + 1]
+
+
+def test_utc_timestamps():
+    timestamps = TimestampFormatter()
+    for timestamp in TIMESTAMPS:
+        date_time = datetime.fromtimestamp(timestamp / 1000, timezone.utc)
+        assert timestamps.chat_timestamp(timestamp) == str(date_time)
+        assert timestamps.chat_timestamp(str(timestamp)) == str(date_time)
+        assert timestamps.call_timestamp(timestamp) == date_time.strftime("%Y-%m-%d %H:%M:%S")
+    assert timestamps.chat_timestamps(TIMESTAMPS) == [timestamps.chat_timestamp(t) for t in TIMESTAMPS]
+
+
+def test_local_timestamps(monkeypatch):
+    monkeypatch.setenv("TZ", "Europe/Zurich")
+    time.tzset()
+    try:
+        timestamps = TimestampFormatter(local_timezone=True)
+        # around the switch to and from summer time in 2018
+        for timestamp in TIMESTAMPS + [1521939600000 + step * 600000 for step in range(-12, 12)] + [
+            1540688400000 + step * 600000 for step in range(-12, 12)
+        ]:
+            date_time = datetime.fromtimestamp(timestamp / 1000).astimezone()
+            assert timestamps.chat_timestamp(timestamp) == str(date_time)
+            assert timestamps.call_timestamp(timestamp) == date_time.strftime("%Y-%m-%d %H:%M:%S")
+    finally:
+        monkeypatch.undo()
+        time.tzset()